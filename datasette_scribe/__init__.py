@@ -4,16 +4,44 @@ from datasette_vite import vite_entry
 import os
 
 # Import route modules to trigger route registration on the shared router
-from .routes import pages, api_transcriptions, api_speakers, api_collections
+from .routes import (
+    pages,
+    api_transcriptions,
+    api_uploads,
+    api_speakers,
+    api_collections,
+    api_search,
+)
 from .router import router, SCRIBE_ACCESS_NAME
+from .jobs import get_job_queue
+from .metrics import instrument_route
+from .search import resume_search_indexes, stop_search_indexes
 from .cli import scribe_cli
 
-_ = (pages, api_transcriptions, api_speakers, api_collections)
+_ = (pages, api_transcriptions, api_uploads, api_speakers, api_collections, api_search)
 
 
 @hookimpl
 def register_routes():
-    return router.routes()
+    return [(path, instrument_route(path, view)) for path, view in router.routes()]
+
+
+@hookimpl
+def startup(datasette):
+    async def inner():
+        await get_job_queue(datasette).start()
+        await resume_search_indexes(datasette)
+
+    return inner
+
+
+@hookimpl
+def shutdown(datasette):
+    async def inner():
+        await get_job_queue(datasette).stop()
+        await stop_search_indexes(datasette)
+
+    return inner
 
 
 @hookimpl
@@ -0,0 +1,93 @@
+"""Cache of raw transcription API responses.
+
+Entries are keyed by the SHA-256 of the audio plus the parameters that
+change the output, so transcribing the same recording again — a re-upload,
+a retry, ``scribe add`` run twice — reuses the earlier response instead of
+paying for another API call. Like ``ingest``, these functions take a
+``sqlite3`` connection and don't commit; ``cache_get`` writes (it records
+the hit), so call it on the write connection.
+"""
+
+import hashlib
+from dataclasses import dataclass
+
+from .voxtral_api import TranscriptionResponse, TranscriptionUsage
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 180
+
+
+@dataclass
+class CachePolicy:
+    enabled: bool = True
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    max_age_days: float = DEFAULT_MAX_AGE_DAYS
+
+
+def cache_policy(config) -> CachePolicy:
+    """From the ``cache`` plugin setting: ``false`` or ``{max_entries, max_age_days}``."""
+    if config is False:
+        return CachePolicy(enabled=False)
+    config = config or {}
+    return CachePolicy(
+        max_entries=int(config.get("max_entries", DEFAULT_MAX_ENTRIES)),
+        max_age_days=float(config.get("max_age_days", DEFAULT_MAX_AGE_DAYS)),
+    )
+
+
+def audio_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_get(
+    conn, sha256: str, *, model: str, granularity: str, diarize: bool = True
+) -> TranscriptionResponse | None:
+    key = [sha256, model, int(diarize), granularity]
+    row = conn.execute(
+        "select response from datasette_scribe_response_cache"
+        " where audio_sha256 = ? and model = ? and diarize = ? and granularity = ?",
+        key,
+    ).fetchone()
+    if row is None:
+        return None
+    conn.execute(
+        "update datasette_scribe_response_cache set hits = hits + 1,"
+        " last_used_at = datetime('now', 'subsec')"
+        " where audio_sha256 = ? and model = ? and diarize = ? and granularity = ?",
+        key,
+    )
+    response = TranscriptionResponse.model_validate_json(row[0])
+    usage = response.usage or TranscriptionUsage()
+    return response.model_copy(
+        update={"usage": usage.model_copy(update={"cached": True})}
+    )
+
+
+def cache_put(
+    conn,
+    sha256: str,
+    response: TranscriptionResponse,
+    *,
+    model: str,
+    granularity: str,
+    diarize: bool = True,
+    policy: CachePolicy = CachePolicy(),
+):
+    """Store a response, then evict entries past the policy's age or count."""
+    if not policy.enabled or (response.usage and response.usage.cached):
+        return
+    conn.execute(
+        "insert or replace into datasette_scribe_response_cache"
+        " (audio_sha256, model, diarize, granularity, response) values (?, ?, ?, ?, ?)",
+        [sha256, model, int(diarize), granularity, response.model_dump_json()],
+    )
+    conn.execute(
+        "delete from datasette_scribe_response_cache where last_used_at < datetime('now', ?)",
+        [f"-{policy.max_age_days} days"],
+    )
+    conn.execute(
+        "delete from datasette_scribe_response_cache where rowid in ("
+        " select rowid from datasette_scribe_response_cache"
+        " order by last_used_at desc limit -1 offset ?)",
+        [policy.max_entries],
+    )
@@ -0,0 +1,238 @@
+"""Transcribe long recordings as overlapping windows cut at silences.
+
+The recording is cut near every ``window`` seconds, at the silence closest
+to the ideal cut point, and each piece is padded with ``overlap`` seconds of
+audio from either side. The pieces are transcribed concurrently and then
+stitched back together:
+
+- timestamps are shifted by the offset each piece was cut at
+- every segment belongs to the piece whose unpadded span contains its
+  midpoint, so speech in an overlap is kept exactly once
+- diarized speaker labels, which each request numbers independently, are
+  matched across pieces by how much they talk over the same overlap audio
+"""
+
+import asyncio
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+
+from . import ffmpeg
+from .voxtral_api import (
+    TranscriptionResponse,
+    TranscriptionSegment,
+    TranscriptionUsage,
+    transcribe,
+)
+
+DEFAULT_WINDOW = 600.0
+DEFAULT_OVERLAP = 5.0
+DEFAULT_CONCURRENCY = 4
+# How far before the ideal cut point to look for a silence
+SILENCE_SEARCH = 60.0
+
+
+@dataclass
+class Window:
+    # The stretch of the recording this piece is responsible for
+    start: float
+    end: float
+    # The padded stretch actually sent for transcription
+    audio_start: float
+    audio_end: float
+
+
+def plan_windows(
+    duration: float,
+    silences: list[tuple[float, float]],
+    *,
+    window: float = DEFAULT_WINDOW,
+    overlap: float = DEFAULT_OVERLAP,
+) -> list[Window]:
+    midpoints = [(start + end) / 2 for start, end in silences]
+    cuts = [0.0]
+    while duration - cuts[-1] > window:
+        ideal = cuts[-1] + window
+        earliest = max(ideal - SILENCE_SEARCH, cuts[-1] + window / 2)
+        candidates = [m for m in midpoints if earliest <= m <= ideal]
+        cuts.append(max(candidates) if candidates else ideal)
+    cuts.append(duration)
+    return [
+        Window(
+            start=start,
+            end=end,
+            audio_start=max(start - overlap, 0.0),
+            audio_end=min(end + overlap, duration),
+        )
+        for start, end in zip(cuts, cuts[1:])
+    ]
+
+
+def chunking_options(config) -> dict | None:
+    """Keyword arguments for ``transcribe_chunked()`` from the ``chunking``
+    plugin setting, which is either ``true`` or an object of overrides."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    return {
+        "window": float(config.get("window", DEFAULT_WINDOW)),
+        "overlap": float(config.get("overlap", DEFAULT_OVERLAP)),
+        "concurrency": int(config.get("concurrency", DEFAULT_CONCURRENCY)),
+    }
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def _match_speakers(
+    previous: list[TranscriptionSegment], current: list[TranscriptionSegment]
+) -> dict[str, str]:
+    """Map the next piece's speaker labels onto already stitched labels.
+
+    ``previous`` are stitched segments and ``current`` the shifted segments
+    of the next piece, both within the overlap. Pairs of labels are scored by
+    how long they speak at the same time and matched greedily, one to one.
+    """
+    scores: dict[tuple[str, str], float] = {}
+    for a in previous:
+        for b in current:
+            if not a.speaker_id or not b.speaker_id:
+                continue
+            shared = min(a.end, b.end) - max(a.start, b.start)
+            if shared > 0:
+                key = (b.speaker_id, a.speaker_id)
+                scores[key] = scores.get(key, 0.0) + shared
+    mapping: dict[str, str] = {}
+    taken: set[str] = set()
+    for (local, stitched), _ in sorted(scores.items(), key=lambda item: -item[1]):
+        if local not in mapping and stitched not in taken:
+            mapping[local] = stitched
+            taken.add(stitched)
+    return mapping
+
+
+def stitch(
+    windows: list[Window], responses: list[TranscriptionResponse]
+) -> TranscriptionResponse:
+    """Combine per-window responses into one response for the whole recording."""
+    stitched: list[TranscriptionSegment] = []
+    # The previous piece's segments, relabelled, including those it didn't keep
+    previous: list[TranscriptionSegment] = []
+    speaker_count = 0
+    usage = TranscriptionUsage()
+    for index, (window, response) in enumerate(zip(windows, responses)):
+        shifted = [
+            segment.model_copy(
+                update={
+                    "start": segment.start + window.audio_start,
+                    "end": segment.end + window.audio_start,
+                }
+            )
+            for segment in response.segments
+        ]
+        mapping = {}
+        if index > 0:
+            overlap_start, overlap_end = (
+                window.audio_start,
+                windows[index - 1].audio_end,
+            )
+            mapping = _match_speakers(
+                [s for s in previous if s.end > overlap_start],
+                [s for s in shifted if s.start < overlap_end],
+            )
+        for segment in shifted:
+            if segment.speaker_id and segment.speaker_id not in mapping:
+                # Nobody in the overlap matched them, so a new speaker
+                mapping[segment.speaker_id] = f"speaker_{speaker_count}"
+                speaker_count += 1
+
+        previous = [
+            segment.model_copy(
+                update={"speaker_id": mapping.get(segment.speaker_id or "")}
+            )
+            for segment in shifted
+        ]
+        last = index == len(windows) - 1
+        for segment in previous:
+            midpoint = (segment.start + segment.end) / 2
+            if midpoint < window.start or (midpoint >= window.end and not last):
+                continue
+            if (
+                stitched
+                and segment.start < stitched[-1].end
+                and _normalize(segment.text) == _normalize(stitched[-1].text)
+            ):
+                # The same words heard from both sides of a cut
+                continue
+            stitched.append(segment)
+
+        if response.usage:
+            for field in TranscriptionUsage.model_fields:
+                value = getattr(response.usage, field)
+                if value is not None:
+                    setattr(usage, field, (getattr(usage, field) or 0) + value)
+
+    first = responses[0]
+    return TranscriptionResponse(
+        model=first.model,
+        text=" ".join(segment.text.strip() for segment in stitched),
+        language=first.language,
+        segments=stitched,
+        usage=usage,
+        finish_reason=responses[-1].finish_reason,
+    )
+
+
+async def transcribe_chunked(
+    source: str,
+    *,
+    filename: str | None = None,
+    window: float = DEFAULT_WINDOW,
+    overlap: float = DEFAULT_OVERLAP,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    transcribe_fn=transcribe,
+) -> TranscriptionResponse:
+    """Transcribe ``source`` — a file path or an http(s) URL ffmpeg can read.
+
+    Retries are left to ``transcribe_fn``: ``VoxtralClient`` retries each
+    piece's request with backoff on its own, so a transient failure costs
+    one piece rather than the whole recording.
+    """
+    duration = await ffmpeg.probe_duration(source)
+    silences = await ffmpeg.detect_silences(source) if duration > window else []
+    windows = plan_windows(duration, silences, window=window, overlap=overlap)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stem = os.path.splitext(filename or "audio")[0]
+
+    async def run(index: int, piece: Window, tmp: str) -> TranscriptionResponse:
+        async with semaphore:
+            path = os.path.join(tmp, f"{index:04d}.mp3")
+            await ffmpeg.extract(
+                source, piece.audio_start, piece.audio_end - piece.audio_start, path
+            )
+            with open(path, "rb") as f:
+                data = f.read()
+            os.unlink(path)
+            return await transcribe_fn(
+                file_data=data,
+                filename=f"{stem}-{index:04d}.mp3",
+                audio_seconds=piece.audio_end - piece.audio_start,
+            )
+
+    with tempfile.TemporaryDirectory(prefix="datasette-scribe-chunks-") as tmp:
+        tasks = [
+            asyncio.ensure_future(run(index, piece, tmp))
+            for index, piece in enumerate(windows)
+        ]
+        try:
+            responses = await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave the other pieces running once one has failed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    return stitch(windows, list(responses))
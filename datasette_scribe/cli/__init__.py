@@ -1,7 +1,13 @@
 import click
 
 from .add import scribe_add
+from .export import scribe_export
+from .hash_audio import scribe_hash_audio
+from .move_audio import scribe_move_audio
+from .refresh_stats import scribe_refresh_stats
 from .serve import scribe_serve
+from .transcode import scribe_transcode
+from .waveforms import scribe_waveforms
 
 
 @click.group(name="scribe")
@@ -11,3 +17,9 @@ def scribe_cli():
 
 scribe_cli.add_command(scribe_add)
 scribe_cli.add_command(scribe_serve)
+scribe_cli.add_command(scribe_move_audio)
+scribe_cli.add_command(scribe_hash_audio)
+scribe_cli.add_command(scribe_refresh_stats)
+scribe_cli.add_command(scribe_export)
+scribe_cli.add_command(scribe_waveforms)
+scribe_cli.add_command(scribe_transcode)
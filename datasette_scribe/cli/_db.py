@@ -1,70 +1,115 @@
 import sqlite3
+from dataclasses import dataclass
 from pathlib import Path
 
-from ..router import SCHEMA_SQL
+from ..cache import audio_sha256, cache_get, cache_put
+from ..ingest import ingest_transcription
+from ..migrations import migrate
+from ..storage import audio_store_from_config
+from ..voxtral_api import DEFAULT_MODEL, TranscriptionResponse
+from ..waveform import store_peaks
 
 
 def apply_schema(db_path: Path):
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        conn.execute("begin immediate")
+        migrate(conn)
+        conn.execute("commit")
+    except Exception:
+        conn.execute("rollback")
+        raise
+    finally:
+        conn.close()
+
+
+def cached_response(db_path: Path, sha256: str):
     conn = sqlite3.connect(str(db_path))
-    conn.executescript(SCHEMA_SQL)
-    conn.close()
+    try:
+        with conn:
+            return cache_get(conn, sha256, model=DEFAULT_MODEL, granularity="segment")
+    finally:
+        conn.close()
+
+
+@dataclass
+class Transcribed:
+    filename: str
+    file_bytes: bytes
+    content_type: str
+    response: TranscriptionResponse
+    url: str | None
+    sha256: str
+    peaks: bytes | None = None
 
 
-def store_transcription(db_path: Path, filename: str, file_bytes: bytes, content_type: str, response, *, url=None):
+def existing_sources(db_path: Path) -> tuple[set[str], set[str]]:
+    """URLs and audio hashes of transcriptions already completed in the database."""
     conn = sqlite3.connect(str(db_path))
-    cursor = conn.cursor()
+    try:
+        urls, hashes = set(), set()
+        for url, sha256 in conn.execute(
+            "select url, audio_sha256 from datasette_scribe_transcriptions where completed_at is not null"
+        ):
+            if url:
+                urls.add(url)
+            if sha256:
+                hashes.add(sha256)
+        return urls, hashes
+    finally:
+        conn.close()
 
-    input_type = "url" if url else "file"
-    cursor.execute(
-        """
-        insert into datasette_scribe_transcriptions (url, input_type, filename, model, granularity, submitted_at, completed_at, usage)
-        values (?, ?, ?, ?, 'segment', datetime('now', 'subsec'), datetime('now', 'subsec'), ?)
-        """,
-        [
-            url,
-            input_type,
-            filename,
-            response.model,
-            response.usage.model_dump_json() if response.usage else None,
-        ],
-    )
-    transcription_id = cursor.lastrowid
 
-    cursor.execute(
-        "insert into datasette_scribe_audio_blobs (transcription_id, data, content_type) values (?, ?, ?)",
-        [transcription_id, file_bytes, content_type],
-    )
+def store_transcriptions(
+    db_path: Path, items: list[Transcribed], *, audio_storage=None
+) -> list[tuple[int, int]]:
+    """Write several finished transcriptions in one transaction."""
+    store = audio_store_from_config(audio_storage)
+    audios = [
+        store.put(item.file_bytes, item.content_type) if store else None
+        for item in items
+    ]
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            results = []
+            for item, audio in zip(items, audios):
+                cache_put(
+                    conn,
+                    item.sha256,
+                    item.response,
+                    model=DEFAULT_MODEL,
+                    granularity="segment",
+                )
+                transcription_id, entries_count = ingest_transcription(
+                    conn,
+                    item.response,
+                    url=item.url,
+                    filename=item.filename,
+                    file_bytes=None if audio else item.file_bytes,
+                    content_type=item.content_type,
+                    audio=audio,
+                    audio_sha256=item.sha256,
+                )
+                if item.peaks is not None:
+                    store_peaks(conn, transcription_id, item.peaks)
+                results.append((transcription_id, entries_count))
+            return results
+    finally:
+        conn.close()
 
-    seen_speakers = set()
-    for segment in response.segments:
-        scoped_speaker = (
-            f"t{transcription_id}_{segment.speaker_id}"
-            if segment.speaker_id
-            else None
-        )
-        cursor.execute(
-            """
-            insert into datasette_scribe_transcription_entries
-                (transcription_id, start, end, speaker_id, text, original_text, original_speaker_id)
-            values (?, ?, ?, ?, ?, ?, ?)
-            """,
-            [
-                transcription_id,
-                segment.start,
-                segment.end,
-                scoped_speaker,
-                segment.text,
-                segment.text,
-                segment.speaker_id,
-            ],
-        )
-        if scoped_speaker and scoped_speaker not in seen_speakers:
-            seen_speakers.add(scoped_speaker)
-            cursor.execute(
-                "insert or ignore into datasette_scribe_speakers (name, is_original) values (?, 1)",
-                [scoped_speaker],
-            )
 
-    conn.commit()
-    conn.close()
-    return transcription_id, len(response.segments)
+def store_transcription(
+    db_path: Path,
+    filename: str,
+    file_bytes: bytes,
+    content_type: str,
+    response,
+    *,
+    url=None,
+    audio_storage=None,
+):
+    item = Transcribed(
+        filename, file_bytes, content_type, response, url, audio_sha256(file_bytes)
+    )
+    return store_transcriptions(db_path, [item], audio_storage=audio_storage)[0]
@@ -0,0 +1,40 @@
+import functools
+
+import click
+
+
+def audio_storage_options(fn):
+    """Options selecting where audio files are kept, shared by several commands."""
+
+    @click.option(
+        "--audio-dir",
+        type=click.Path(file_okay=False),
+        default=None,
+        help="Store audio files in this directory",
+    )
+    @click.option(
+        "--s3-bucket", default=None, help="Store audio files in this S3 bucket"
+    )
+    @click.option("--s3-prefix", default="", help="Key prefix within the S3 bucket")
+    @click.option(
+        "--s3-endpoint-url",
+        default=None,
+        help="S3-compatible endpoint, e.g. http://localhost:9000 for MinIO",
+    )
+    @functools.wraps(fn)
+    def wrapper(*args, audio_dir, s3_bucket, s3_prefix, s3_endpoint_url, **kwargs):
+        if audio_dir and s3_bucket:
+            raise click.UsageError("Use either --audio-dir or --s3-bucket, not both")
+        storage = None
+        if audio_dir:
+            storage = {"type": "local", "path": audio_dir}
+        elif s3_bucket:
+            storage = {
+                "type": "s3",
+                "bucket": s3_bucket,
+                "prefix": s3_prefix,
+                "endpoint_url": s3_endpoint_url,
+            }
+        return fn(*args, audio_storage=storage, **kwargs)
+
+    return wrapper
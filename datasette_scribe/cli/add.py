@@ -1,107 +1,198 @@
 import asyncio
-import mimetypes
+import glob
+import os
 import re
-import tempfile
 from pathlib import Path
 
 import click
 
-from ..voxtral_api import transcribe
-from ._db import apply_schema, store_transcription
+from ..chunking import DEFAULT_CONCURRENCY
+from ..preprocess import preprocess_options
+from ._db import apply_schema
+from ._storage import audio_storage_options
+from .batch import BatchOptions, run_batch
 
 _URL_RE = re.compile(r"https?://")
 
+AUDIO_EXTENSIONS = {
+    ".aac",
+    ".flac",
+    ".m4a",
+    ".mp3",
+    ".mp4",
+    ".oga",
+    ".ogg",
+    ".opus",
+    ".wav",
+    ".webm",
+}
+
 
 def _is_url(s: str) -> bool:
     return bool(_URL_RE.match(s))
 
 
-def _download_audio_from_url(url: str) -> tuple[Path, str]:
-    """Download audio from a URL using yt-dlp. Returns (temp_path, title)."""
-    try:
-        import yt_dlp
-    except ImportError:
-        raise click.ClickException(
-            "yt-dlp is required for URL support. Install it with: "
-            "uv pip install 'datasette-scribe[yt]'"
-        )
-
-    tmp_dir = tempfile.mkdtemp()
-    output_path = Path(tmp_dir) / "audio.mp3"
-
-    ydl_opts = {
-        "format": "bestaudio/best",
-        "outtmpl": str(output_path.with_suffix("")),
-        "postprocessors": [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "mp3",
-                "preferredquality": "192",
-            }
-        ],
-        "quiet": True,
-        "no_warnings": True,
-    }
-
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
-        title = info.get("title", "audio")
-
-    # yt-dlp may add the extension itself
-    if not output_path.exists():
-        files = list(Path(tmp_dir).glob("audio.*"))
-        if files:
-            output_path = files[0]
-        else:
-            raise click.ClickException("yt-dlp download failed: no output file found")
-
-    return output_path, title
+def _expand_source(source: str) -> list[tuple[str, bool]]:
+    """A URL, file, directory of audio files or glob pattern as (source, is_url) pairs."""
+    if _is_url(source):
+        return [(source, True)]
+    path = Path(source)
+    if path.is_dir():
+        return [
+            (str(p), False)
+            for p in sorted(path.rglob("*"))
+            if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS
+        ]
+    if path.exists():
+        return [(source, False)]
+    if glob.has_magic(source):
+        return [
+            (p, False)
+            for p in sorted(glob.glob(source, recursive=True))
+            if os.path.isfile(p)
+        ]
+    raise click.ClickException(f"File not found: {source}")
+
+
+def _read_source_list(path: str) -> list[str]:
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
 
 
 @click.command(name="add")
-@click.argument("source")
-@click.option("-d", "--database", "db_path_str", type=click.Path(), default=None, help="Database path (default: derived from source)")
-def scribe_add(source, db_path_str):
-    "Transcribe an audio file or URL and add it to a database"
-
-    if _is_url(source):
-        click.echo(f"Downloading audio from {source}...")
-        audio_path, title = _download_audio_from_url(source)
-        filename = f"{title}.mp3"
-        url = source
-        default_db_name = re.sub(r"[^\w\s-]", "", title).strip().replace(" ", "-")
-        if not default_db_name:
-            default_db_name = "scribe"
-    else:
-        audio_path = Path(source)
-        if not audio_path.exists():
-            raise click.ClickException(f"File not found: {source}")
-        filename = audio_path.name
-        url = None
-        default_db_name = audio_path.name
-
-    if db_path_str is None:
-        db_path = Path(f"{default_db_name}.db")
-    else:
+@click.argument("sources", nargs=-1)
+@click.option(
+    "-d",
+    "--database",
+    "db_path_str",
+    type=click.Path(),
+    default=None,
+    help="Database path (default: derived from a single file, otherwise scribe.db)",
+)
+@click.option(
+    "--from-file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Read sources from this file, one per line",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=DEFAULT_CONCURRENCY,
+    show_default=True,
+    help="Transcriptions to run at once",
+)
+@click.option(
+    "--downloads",
+    type=int,
+    default=2,
+    show_default=True,
+    help="URLs to download at once",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=20,
+    show_default=True,
+    help="Transcriptions to save per database transaction",
+)
+@click.option(
+    "--chunk",
+    is_flag=True,
+    help="Split long audio at silences and transcribe the pieces concurrently (needs ffmpeg)",
+)
+@click.option(
+    "--chunk-minutes",
+    type=float,
+    default=10,
+    show_default=True,
+    help="Target length of each piece with --chunk",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Call the API even if this audio has been transcribed before",
+)
+@click.option(
+    "--no-preprocess",
+    is_flag=True,
+    help="Upload files as they are, rather than as 16 kHz mono (needs ffmpeg)",
+)
+@audio_storage_options
+def scribe_add(
+    sources,
+    db_path_str,
+    from_file,
+    concurrency,
+    downloads,
+    batch_size,
+    chunk,
+    chunk_minutes,
+    no_cache,
+    no_preprocess,
+    audio_storage,
+):
+    """Transcribe audio files or URLs and add them to a database
+
+    SOURCES can be files, directories (searched for audio files), glob
+    patterns or URLs. Sources already in the database are skipped, so an
+    interrupted run can be started again with the same arguments.
+    """
+    raw_sources = list(sources)
+    if from_file:
+        raw_sources.extend(_read_source_list(from_file))
+    if not raw_sources:
+        raise click.UsageError("Give at least one source, or --from-file")
+
+    expanded = []
+    seen = set()
+    for raw in raw_sources:
+        for source, is_url in _expand_source(raw):
+            if source not in seen:
+                seen.add(source)
+                expanded.append((source, is_url))
+    if not expanded:
+        raise click.ClickException("No audio files found")
+
+    if db_path_str is not None:
         db_path = Path(db_path_str)
-
-    content_type, _ = mimetypes.guess_type(str(audio_path))
-    if content_type is None:
-        content_type = "audio/mpeg"
-
-    click.echo(f"Transcribing {filename}...")
-
-    file_bytes = audio_path.read_bytes()
+    elif len(expanded) == 1 and not expanded[0][1]:
+        db_path = Path(f"{Path(expanded[0][0]).name}.db")
+    else:
+        db_path = Path("scribe.db")
 
     apply_schema(db_path)
-
-    try:
-        response = asyncio.run(transcribe(file_data=file_bytes, filename=filename))
-    except Exception as e:
-        raise click.ClickException(f"Transcription failed: {e}")
-
-    transcription_id, entries_count = store_transcription(
-        db_path, filename, file_bytes, content_type, response, url=url
+    options = BatchOptions(
+        concurrency=concurrency,
+        downloads=downloads,
+        batch_size=max(1, batch_size),
+        chunk=chunk,
+        chunk_minutes=chunk_minutes,
+        no_cache=no_cache,
+        audio_storage=audio_storage,
+        preprocess=None if no_preprocess else preprocess_options(None),
     )
+    with click.progressbar(length=len(expanded), label="Transcribing") as bar:
+        result = asyncio.run(run_batch(expanded, db_path, options, bar))
 
-    click.echo(f"Saved transcription ({entries_count} segments) to {db_path}")
+    entries_count = sum(count for _, count in result.added)
+    click.echo(
+        f"Saved {len(result.added)} transcription(s) ({entries_count} segments) to {db_path}"
+    )
+    if result.skipped:
+        click.echo(f"Skipped {len(result.skipped)} already in the database")
+    stats = result.preprocess
+    if stats.files:
+        message = (
+            f"Preprocessing shrank uploads from {stats.input_bytes / 1e6:.1f} MB"
+            f" to {stats.output_bytes / 1e6:.1f} MB in {stats.seconds:.1f}s"
+        )
+        saved = stats.upload_seconds_saved(result.upload_bytes, result.upload_seconds)
+        if saved is not None:
+            message += f", saving about {saved:.1f}s of upload time"
+        click.echo(message)
+    for source, error in result.failed:
+        click.echo(f"Failed: {source}: {error}", err=True)
+    if result.failed:
+        raise click.ClickException(f"{len(result.failed)} source(s) failed")
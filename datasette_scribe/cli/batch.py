@@ -0,0 +1,262 @@
+"""The ``scribe add`` pipeline: download, transcribe and store many sources.
+
+URLs are downloaded by yt-dlp in a process pool, transcriptions run
+concurrently on one pooled API client, and finished transcriptions are
+written to the database in batches by a single writer. Every batch is
+committed on its own and sources already in the database are skipped, so an
+interrupted run picks up where it stopped when started again.
+"""
+
+import asyncio
+import mimetypes
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import click
+
+from ..cache import audio_sha256
+from ..chunking import transcribe_chunked
+from ..ffmpeg import FFmpegError, estimate_duration
+from ..preprocess import PreprocessOptions, PreprocessStats, compact_audio
+from ..voxtral_api import VoxtralClient
+from ..waveform import compute_peaks, waveform_available
+from ._db import Transcribed, cached_response, existing_sources, store_transcriptions
+
+# Wait at most this long to fill a batch before writing what there is
+BATCH_INTERVAL = 5.0
+
+
+def download_audio_from_url(url: str) -> tuple[Path, str]:
+    """Download audio from a URL using yt-dlp. Returns (temp_path, title)."""
+    try:
+        import yt_dlp
+    except ImportError:
+        raise click.ClickException(
+            "yt-dlp is required for URL support. Install it with: "
+            "uv pip install 'datasette-scribe[yt]'"
+        )
+
+    tmp_dir = tempfile.mkdtemp()
+    output_path = Path(tmp_dir) / "audio.mp3"
+
+    ydl_opts = {
+        "format": "bestaudio/best",
+        "outtmpl": str(output_path.with_suffix("")),
+        "postprocessors": [
+            {
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": "mp3",
+                "preferredquality": "192",
+            }
+        ],
+        "quiet": True,
+        "no_warnings": True,
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+        title = info.get("title", "audio")
+
+    # yt-dlp may add the extension itself
+    if not output_path.exists():
+        files = list(Path(tmp_dir).glob("audio.*"))
+        if files:
+            output_path = files[0]
+        else:
+            raise click.ClickException("yt-dlp download failed: no output file found")
+
+    return output_path, title
+
+
+@dataclass
+class BatchOptions:
+    concurrency: int
+    downloads: int
+    batch_size: int
+    chunk: bool = False
+    chunk_minutes: float = 10
+    no_cache: bool = False
+    audio_storage: dict | None = None
+    preprocess: PreprocessOptions | None = None
+
+
+@dataclass
+class BatchResult:
+    added: list[tuple[str, int]] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: list[tuple[str, str]] = field(default_factory=list)
+    preprocess: PreprocessStats = field(default_factory=PreprocessStats)
+    upload_bytes: int = 0
+    upload_seconds: float = 0.0
+
+
+async def run_batch(
+    sources: list[tuple[str, bool]], db_path: Path, options: BatchOptions, bar
+) -> BatchResult:
+    """Process ``(source, is_url)`` pairs, advancing the click progress ``bar``."""
+    result = BatchResult()
+    done_urls, done_hashes = existing_sources(db_path)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, options.concurrency))
+    # Bounds how many sources are downloaded or read ahead of the API, so a
+    # long list doesn't pile every file up in memory
+    in_flight = asyncio.Semaphore(
+        max(1, options.concurrency) + max(1, options.downloads)
+    )
+    writes: asyncio.Queue = asyncio.Queue()
+    needs_downloads = any(is_url for _, is_url in sources)
+    pool = (
+        ProcessPoolExecutor(max_workers=max(1, options.downloads))
+        if needs_downloads
+        else None
+    )
+    waveforms = waveform_available()
+
+    async def transcribe(client, path: Path, file_bytes: bytes, filename: str):
+        async with semaphore:
+            if options.chunk:
+                return await transcribe_chunked(
+                    str(path),
+                    filename=filename,
+                    window=options.chunk_minutes * 60,
+                    concurrency=options.concurrency,
+                    transcribe_fn=client.transcribe,
+                )
+            if options.preprocess is not None:
+                try:
+                    compact = await compact_audio(
+                        str(path), filename, options.preprocess, result.preprocess
+                    )
+                except FFmpegError:
+                    # The API may still read what ffmpeg couldn't, so send the original
+                    compact = None
+                if compact is not None:
+                    file_bytes, filename = compact
+            # For the audio rate limit; the response settles it
+            audio_seconds = (
+                await estimate_duration(str(path)) if client.audio_limit else None
+            )
+            return await client.transcribe(
+                file_data=file_bytes, filename=filename, audio_seconds=audio_seconds
+            )
+
+    async def process(client, source: str, is_url: bool):
+        tmp_dir = None
+        try:
+            if is_url:
+                if source in done_urls:
+                    result.skipped.append(source)
+                    bar.update(1)
+                    return
+                path, title = await loop.run_in_executor(
+                    pool, download_audio_from_url, source
+                )
+                tmp_dir = path.parent
+                filename = f"{title}.mp3"
+            else:
+                path = Path(source)
+                filename = path.name
+            file_bytes = await asyncio.to_thread(path.read_bytes)
+            sha256 = audio_sha256(file_bytes)
+            if sha256 in done_hashes:
+                result.skipped.append(source)
+                bar.update(1)
+                return
+            # Claim the hash, so duplicates within one run are transcribed once
+            done_hashes.add(sha256)
+            response = None
+            if not options.no_cache:
+                response = await asyncio.to_thread(cached_response, db_path, sha256)
+            if response is None:
+                response = await transcribe(client, path, file_bytes, filename)
+            peaks = None
+            if waveforms:
+                try:
+                    peaks = await compute_peaks(str(path))
+                except Exception as e:
+                    # The player works without a waveform, so this isn't a failure
+                    click.echo(
+                        f"\nCould not compute waveform for {source}: {e}", err=True
+                    )
+            content_type = mimetypes.guess_type(filename)[0] or "audio/mpeg"
+            await writes.put(
+                (
+                    source,
+                    Transcribed(
+                        filename,
+                        file_bytes,
+                        content_type,
+                        response,
+                        source if is_url else None,
+                        sha256,
+                        peaks,
+                    ),
+                )
+            )
+        except Exception as e:
+            result.failed.append((source, str(e)))
+            bar.update(1)
+        finally:
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    async def writer():
+        finished = False
+        while not finished:
+            batch = []
+            deadline = time.monotonic() + BATCH_INTERVAL
+            while len(batch) < options.batch_size:
+                try:
+                    item = await asyncio.wait_for(
+                        writes.get(), max(deadline - time.monotonic(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+            try:
+                stored = await asyncio.to_thread(
+                    store_transcriptions,
+                    db_path,
+                    [item for _, item in batch],
+                    audio_storage=options.audio_storage,
+                )
+            except Exception as e:
+                result.failed.extend(
+                    (source, f"Could not save: {e}") for source, _ in batch
+                )
+            else:
+                result.added.extend(
+                    (source, entries_count)
+                    for (source, _), (_, entries_count) in zip(batch, stored)
+                )
+            bar.update(len(batch))
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        async with VoxtralClient(max_connections=max(1, options.concurrency)) as client:
+
+            async def bounded(source, is_url):
+                async with in_flight:
+                    await process(client, source, is_url)
+
+            await asyncio.gather(
+                *(bounded(source, is_url) for source, is_url in sources)
+            )
+            result.upload_bytes = client.stats.upload_bytes
+            result.upload_seconds = client.stats.upload_seconds
+        await writes.put(None)
+        await writer_task
+    finally:
+        writer_task.cancel()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return result
@@ -0,0 +1,152 @@
+import asyncio
+import sqlite3
+import sys
+from pathlib import Path
+
+import click
+
+from ..export import (
+    FORMATS,
+    collection_transcription_ids,
+    export_filename,
+    export_transcription,
+    export_transcriptions,
+    transcription_title,
+)
+from ._db import apply_schema
+
+
+async def _ids(conn, transcription_ids, collection_id):
+    if transcription_ids:
+        for transcription_id in transcription_ids:
+            yield transcription_id
+    elif collection_id is not None:
+        async for transcription_id in collection_transcription_ids(
+            _query(conn), collection_id
+        ):
+            yield transcription_id
+    else:
+        after = 0
+        while True:
+            rows = conn.execute(
+                "select id from datasette_scribe_transcriptions where id > ? order by id limit 1000",
+                [after],
+            ).fetchall()
+            for row in rows:
+                yield row["id"]
+            if not rows:
+                return
+            after = rows[-1]["id"]
+
+
+def _query(conn):
+    async def query(sql, params):
+        return conn.execute(sql, params).fetchall()
+
+    return query
+
+
+async def _write(chunks, out):
+    async for chunk in chunks:
+        out.write(chunk)
+
+
+async def _export(conn, transcription_ids, collection_id, fmt, original, output):
+    query = _query(conn)
+    ids = _ids(conn, transcription_ids, collection_id)
+    per_file = FORMATS[fmt].per_file and len(transcription_ids) != 1
+    if per_file:
+        # SubRip and WebVTT hold one transcription per file
+        if output is None:
+            raise click.UsageError(
+                f"Exporting several transcriptions as {fmt} needs --output, a directory"
+            )
+        output.mkdir(parents=True, exist_ok=True)
+        count = 0
+        async for transcription_id in ids:
+            title = await transcription_title(query, transcription_id)
+            path = output / export_filename(transcription_id, title, fmt)
+            with path.open("w", encoding="utf-8") as out:
+                await _write(
+                    export_transcription(
+                        query, transcription_id, fmt, original=original
+                    ),
+                    out,
+                )
+            count += 1
+        click.echo(f"Exported {count} transcriptions to {output}", err=True)
+        return
+    if len(transcription_ids) == 1:
+        if await transcription_title(query, transcription_ids[0]) is None:
+            raise click.ClickException(
+                f"Transcription {transcription_ids[0]} not found"
+            )
+        chunks = export_transcription(
+            query, transcription_ids[0], fmt, original=original
+        )
+    else:
+        chunks = export_transcriptions(query, ids, fmt, original=original)
+    if output is None:
+        await _write(chunks, sys.stdout)
+    else:
+        with output.open("w", encoding="utf-8") as out:
+            await _write(chunks, out)
+
+
+@click.command(name="export")
+@click.argument("db_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "transcription_ids",
+    "-t",
+    "--transcription",
+    type=int,
+    multiple=True,
+    help="Transcription to export, can be repeated",
+)
+@click.option(
+    "collection_id",
+    "-c",
+    "--collection",
+    type=int,
+    help="Export every transcription in this collection",
+)
+@click.option(
+    "fmt",
+    "-f",
+    "--format",
+    type=click.Choice(list(FORMATS)),
+    default="txt",
+    show_default=True,
+    help="Output format",
+)
+@click.option(
+    "--original", is_flag=True, help="Export the model's original text and speakers"
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(path_type=Path),
+    help="File to write, or directory for srt and vtt with several transcriptions. Defaults to stdout",
+)
+def scribe_export(db_path, transcription_ids, collection_id, fmt, original, output):
+    "Export transcripts as SubRip, WebVTT, JSON Lines or plain text"
+    if transcription_ids and collection_id is not None:
+        raise click.UsageError("Use either --transcription or --collection")
+    apply_schema(db_path)
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    try:
+        if (
+            collection_id is not None
+            and conn.execute(
+                "select 1 from datasette_scribe_collections where id = ?",
+                [collection_id],
+            ).fetchone()
+            is None
+        ):
+            raise click.ClickException(f"Collection {collection_id} not found")
+        asyncio.run(
+            _export(conn, list(transcription_ids), collection_id, fmt, original, output)
+        )
+    finally:
+        conn.close()
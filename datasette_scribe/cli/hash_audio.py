@@ -0,0 +1,34 @@
+import sqlite3
+
+import click
+
+from ..storage import blob_sha256
+from ._db import apply_schema
+
+
+@click.command(name="hash-audio")
+@click.argument("db_path", type=click.Path(exists=True, dir_okay=False))
+def scribe_hash_audio(db_path):
+    "Record the hash of audio stored in the database, so repeat uploads are recognised"
+    apply_schema(db_path)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            "select t.id, b.id, length(b.data) from datasette_scribe_transcriptions t"
+            " join datasette_scribe_audio_blobs b on b.transcription_id = t.id"
+            " where t.audio_sha256 is null order by t.id"
+        ).fetchall()
+        with click.progressbar(rows, label="Hashing audio") as bar:
+            for transcription_id, blob_id, size in bar:
+                sha256 = blob_sha256(
+                    conn, "datasette_scribe_audio_blobs", blob_id, size
+                )
+                # Commit per file, so an interrupted run keeps its progress
+                with conn:
+                    conn.execute(
+                        "update datasette_scribe_transcriptions set audio_sha256 = ? where id = ?",
+                        [sha256, transcription_id],
+                    )
+    finally:
+        conn.close()
+    click.echo(f"Hashed audio for {len(rows)} transcriptions")
@@ -0,0 +1,49 @@
+import sqlite3
+
+import click
+
+from ..storage import audio_store_from_config, move_blob
+from ._db import apply_schema
+from ._storage import audio_storage_options
+
+
+@click.command(name="move-audio")
+@click.argument("db_path", type=click.Path(exists=True, dir_okay=False))
+@audio_storage_options
+@click.option(
+    "--vacuum", is_flag=True, help="VACUUM afterwards to shrink the database file"
+)
+def scribe_move_audio(db_path, audio_storage, vacuum):
+    "Move audio stored inside the database to external storage"
+    try:
+        store = audio_store_from_config(audio_storage)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    if store is None:
+        raise click.UsageError("Specify a destination with --audio-dir or --s3-bucket")
+
+    apply_schema(db_path)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        blob_ids = [
+            row[0]
+            for row in conn.execute(
+                "select id from datasette_scribe_audio_blobs order by id"
+            )
+        ]
+        moved_bytes = 0
+        with click.progressbar(blob_ids, label="Moving audio") as bar:
+            for blob_id in bar:
+                # Commit per file, so an interrupted run keeps its progress
+                with conn:
+                    moved_bytes += move_blob(conn, store, blob_id).size
+        if vacuum and blob_ids:
+            conn.execute("vacuum")
+    finally:
+        conn.close()
+
+    click.echo(
+        f"Moved {len(blob_ids)} audio files ({moved_bytes / 1e6:.1f} MB) to {store.name} storage"
+    )
+    if blob_ids and not vacuum:
+        click.echo("Run with --vacuum to reclaim the space in the database file")
@@ -0,0 +1,20 @@
+import sqlite3
+
+import click
+
+from ..stats import refresh_all_stats
+from ._db import apply_schema
+
+
+@click.command(name="refresh-stats")
+@click.argument("db_path", type=click.Path(exists=True, dir_okay=False))
+def scribe_refresh_stats(db_path):
+    "Recompute transcription stats and speaker usage from the entries"
+    apply_schema(db_path)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            count = refresh_all_stats(conn)
+    finally:
+        conn.close()
+    click.echo(f"Refreshed stats for {count} transcriptions")
@@ -5,7 +5,8 @@ from pathlib import Path
 
 import click
 
-from ..router import SCRIBE_ACCESS_NAME
+from ..router import PLUGIN_NAME, SCRIBE_ACCESS_NAME
+from ._storage import audio_storage_options
 
 
 @click.command(name="serve")
@@ -13,7 +14,8 @@ from ..router import SCRIBE_ACCESS_NAME
 @click.option("-p", "--port", type=int, default=8001, help="Port to serve on")
 @click.option("--host", default="127.0.0.1", help="Host to serve on")
 @click.option("--no-open", is_flag=True, help="Don't open browser automatically")
-def scribe_serve(db_path, port, host, no_open):
+@audio_storage_options
+def scribe_serve(db_path, port, host, no_open, audio_storage):
     "Start Datasette serving a scribe database"
     import uvicorn
     from datasette.app import Datasette
@@ -24,7 +26,10 @@ def scribe_serve(db_path, port, host, no_open):
     ds = Datasette(
         files=[str(db_path)],
         settings={"default_allow_sql": False},
-        config={"permissions": {SCRIBE_ACCESS_NAME: True}},
+        config={
+            "permissions": {SCRIBE_ACCESS_NAME: True},
+            "plugins": {PLUGIN_NAME: {"audio_storage": audio_storage}},
+        },
     )
 
     if not no_open:
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+from ..ffmpeg import FFmpegError, require
+from ..storage import audio_path, audio_store_from_config
+from ..transcode import (
+    CODECS,
+    DEFAULT_BITRATE,
+    DEFAULT_CODEC,
+    DEFAULT_WORKERS,
+    TranscodeOptions,
+    save_playback,
+    transcode_audio,
+)
+from ._db import apply_schema
+from ._storage import audio_storage_options
+
+
+async def _transcode_all(conn, store, rows, options, bar):
+    totals = {"transcoded": 0, "skipped": 0, "original": 0, "playback": 0}
+    failed = []
+    # Bounds how many originals are read ahead of the pool
+    in_flight = asyncio.Semaphore(options.workers * 2)
+
+    with ProcessPoolExecutor(max_workers=options.workers) as pool:
+
+        async def transcode(transcription_id, filename):
+            suffix = os.path.splitext(filename or "")[1]
+            with audio_path(conn, store, transcription_id, suffix) as path:
+                if path is None:
+                    return
+                original_size = os.path.getsize(path)
+                result = await transcode_audio(pool, path, options, store)
+            if result is None:
+                totals["skipped"] += 1
+                return
+            playback, data = result
+            # Commit per file, so an interrupted run keeps its progress
+            with conn:
+                unreferenced = save_playback(
+                    conn,
+                    transcription_id,
+                    playback,
+                    data,
+                    original_size=original_size,
+                    keep_original=options.keep_original,
+                )
+            if unreferenced:
+                await asyncio.to_thread(store.delete, unreferenced)
+            totals["transcoded"] += 1
+            totals["original"] += original_size
+            totals["playback"] += playback.size
+
+        async def one(transcription_id, filename):
+            async with in_flight:
+                try:
+                    await transcode(transcription_id, filename)
+                except FFmpegError as e:
+                    failed.append((transcription_id, str(e)))
+                bar.update(1)
+
+        await asyncio.gather(*(one(*row) for row in rows))
+    return totals, failed
+
+
+@click.command(name="transcode")
+@click.argument("db_path", type=click.Path(exists=True, dir_okay=False))
+@audio_storage_options
+@click.option(
+    "--codec",
+    type=click.Choice(list(CODECS)),
+    default=DEFAULT_CODEC,
+    show_default=True,
+    help="Playback codec",
+)
+@click.option(
+    "--bitrate", default=DEFAULT_BITRATE, show_default=True, help="Playback bitrate"
+)
+@click.option(
+    "--drop-original",
+    is_flag=True,
+    help="Delete each original once its playback copy is stored",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=DEFAULT_WORKERS,
+    show_default=True,
+    help="ffmpeg processes to run at once",
+)
+@click.option(
+    "--vacuum", is_flag=True, help="VACUUM afterwards to shrink the database file"
+)
+def scribe_transcode(
+    db_path, audio_storage, codec, bitrate, drop_original, workers, vacuum
+):
+    "Make speech-quality playback copies of uploaded audio"
+    try:
+        require("ffmpeg")
+        store = audio_store_from_config(audio_storage)
+    except (RuntimeError, FFmpegError) as e:
+        raise click.ClickException(str(e))
+    options = TranscodeOptions(
+        codec=codec,
+        bitrate=bitrate,
+        keep_original=not drop_original,
+        workers=max(1, workers),
+    )
+
+    apply_schema(db_path)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            "select t.id, t.filename from datasette_scribe_transcriptions t"
+            " where t.input_type = 'file' and not exists ("
+            "   select 1 from datasette_scribe_playback_audio p where p.transcription_id = t.id"
+            " ) order by t.id"
+        ).fetchall()
+        with click.progressbar(length=len(rows), label="Transcoding audio") as bar:
+            try:
+                totals, failed = asyncio.run(
+                    _transcode_all(conn, store, rows, options, bar)
+                )
+            except ValueError as e:
+                raise click.ClickException(str(e))
+        if vacuum and drop_original and totals["transcoded"]:
+            conn.execute("vacuum")
+    finally:
+        conn.close()
+
+    for transcription_id, error in failed:
+        click.echo(f"Transcription {transcription_id}: {error}", err=True)
+    original, playback = totals["original"], totals["playback"]
+    message = f"Transcoded {totals['transcoded']} files from {original / 1e6:.1f} MB to {playback / 1e6:.1f} MB"
+    if original:
+        message += f" ({1 - playback / original:.0%} smaller)"
+    click.echo(message)
+    if totals["skipped"]:
+        click.echo(
+            f"Kept {totals['skipped']} files that were already no larger than a playback copy"
+        )
+    if drop_original and totals["transcoded"]:
+        click.echo(
+            f"Freed {(original - playback) / 1e6:.1f} MB by dropping the originals"
+        )
+        if not vacuum and store is None:
+            click.echo("Run with --vacuum to reclaim the space in the database file")
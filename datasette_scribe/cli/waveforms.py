@@ -0,0 +1,70 @@
+import asyncio
+import os
+import sqlite3
+
+import click
+
+from ..ffmpeg import FFmpegError, require
+from ..storage import audio_path, audio_store_from_config
+from ..waveform import compute_peaks, require_numpy, store_peaks
+from ._db import apply_schema
+from ._storage import audio_storage_options
+
+
+async def _peaks(conn, store, transcription_id, input_type, url, filename):
+    if input_type == "file":
+        with audio_path(
+            conn, store, transcription_id, os.path.splitext(filename or "")[1]
+        ) as path:
+            if path is None:
+                return None
+            return await compute_peaks(path)
+    return await compute_peaks(url)
+
+
+@click.command(name="waveforms")
+@click.argument("db_path", type=click.Path(exists=True, dir_okay=False))
+@audio_storage_options
+@click.option(
+    "--all", "recompute", is_flag=True, help="Recompute waveforms that already exist"
+)
+def scribe_waveforms(db_path, audio_storage, recompute):
+    "Compute waveform peaks for transcriptions that don't have them yet"
+    try:
+        require_numpy()
+        require("ffmpeg")
+        store = audio_store_from_config(audio_storage)
+    except (RuntimeError, FFmpegError) as e:
+        raise click.ClickException(str(e))
+
+    apply_schema(db_path)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            "select t.id, t.input_type, t.url, t.filename from datasette_scribe_transcriptions t"
+            " where ? or not exists ("
+            "   select 1 from datasette_scribe_waveforms w where w.transcription_id = t.id"
+            " ) order by t.id",
+            [recompute],
+        ).fetchall()
+        computed = 0
+        failed = []
+        with click.progressbar(rows, label="Computing waveforms") as bar:
+            for row in bar:
+                try:
+                    peaks = asyncio.run(_peaks(conn, store, *row))
+                except (FFmpegError, ValueError) as e:
+                    failed.append((row[0], str(e)))
+                    continue
+                if peaks is None:
+                    continue
+                # Commit per transcription, so an interrupted run keeps its progress
+                with conn:
+                    store_peaks(conn, row[0], peaks)
+                computed += 1
+    finally:
+        conn.close()
+
+    for transcription_id, error in failed:
+        click.echo(f"Transcription {transcription_id}: {error}", err=True)
+    click.echo(f"Computed waveforms for {computed} transcriptions")
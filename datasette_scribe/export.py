@@ -0,0 +1,244 @@
+"""Transcript exports as SubRip, WebVTT, JSON Lines or plain text.
+
+Everything here is an async generator. Entries are read ``EXPORT_BATCH`` at
+a time with a keyset cursor on (start, id), and a collection's
+transcriptions the same way on their ids, so memory stays flat however big
+the export is. ``query`` is any ``async (sql, params) -> rows`` function
+whose rows can be indexed by column name: ``Database.execute`` for the
+endpoints, a ``sqlite3`` connection for the CLI.
+
+SubRip and WebVTT hold one transcription per file, so exporting several in
+those formats makes a zip, streamed as it's written.
+"""
+
+import io
+import json
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable
+
+EXPORT_BATCH = 1000
+
+Query = Callable[[str, list], Awaitable[list]]
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    content_type: str
+    extension: str
+    # One transcription per file
+    per_file: bool
+
+
+FORMATS = {
+    "srt": ExportFormat("application/x-subrip; charset=utf-8", ".srt", per_file=True),
+    "vtt": ExportFormat("text/vtt; charset=utf-8", ".vtt", per_file=True),
+    "jsonl": ExportFormat(
+        "application/x-ndjson; charset=utf-8", ".jsonl", per_file=False
+    ),
+    "txt": ExportFormat("text/plain; charset=utf-8", ".txt", per_file=False),
+}
+
+TITLE_SQL = "coalesce(filename, url, 'Transcription ' || id)"
+
+
+@dataclass
+class ExportEntry:
+    transcription_id: int
+    entry_id: int
+    start: float
+    end: float
+    speaker: str | None
+    text: str
+
+
+async def transcription_title(query: Query, transcription_id: int) -> str | None:
+    rows = await query(
+        f"select {TITLE_SQL} as title from datasette_scribe_transcriptions where id = ?",
+        [transcription_id],
+    )
+    return rows[0]["title"] if rows else None
+
+
+async def collection_transcription_ids(
+    query: Query, collection_id: int
+) -> AsyncIterator[int]:
+    after = 0
+    while True:
+        rows = await query(
+            "select transcription_id from datasette_scribe_collection_transcriptions"
+            " where collection_id = ? and transcription_id > ? order by transcription_id limit ?",
+            [collection_id, after, EXPORT_BATCH],
+        )
+        for row in rows:
+            yield row["transcription_id"]
+        if len(rows) < EXPORT_BATCH:
+            return
+        after = rows[-1]["transcription_id"]
+
+
+async def transcription_entries(
+    query: Query, transcription_id: int, *, original: bool = False
+) -> AsyncIterator[ExportEntry]:
+    """Entries in (start, id) order, with current speaker names or, with ``original``, the model's."""
+    if original:
+        # Entries from before originals were recorded only have the current values
+        columns = "coalesce(e.original_speaker_id, s.name) as speaker, coalesce(e.original_text, e.text) as text"
+    else:
+        columns = "s.name as speaker, e.text"
+    sql = (
+        f"select e.id, e.start, e.end, {columns}"
+        " from datasette_scribe_transcription_entries e"
+        " left join datasette_scribe_speakers s on s.id = e.speaker_ref"
+        " where e.transcription_id = ? and e.start >= ? and (e.start > ? or e.id > ?)"
+        " order by e.start, e.id limit ?"
+    )
+    after_start, after_id = float("-inf"), 0
+    while True:
+        rows = await query(
+            sql, [transcription_id, after_start, after_start, after_id, EXPORT_BATCH]
+        )
+        for row in rows:
+            yield ExportEntry(
+                transcription_id,
+                row["id"],
+                row["start"],
+                row["end"],
+                row["speaker"],
+                row["text"],
+            )
+        if len(rows) < EXPORT_BATCH:
+            return
+        after_start, after_id = rows[-1]["start"], rows[-1]["id"]
+
+
+def timestamp(seconds: float, separator: str) -> str:
+    ms = max(round(seconds * 1000), 0)
+    hours, ms = divmod(ms, 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{ms:03d}"
+
+
+def _vtt_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+async def export_transcription(
+    query: Query, transcription_id: int, fmt: str, *, original: bool = False
+) -> AsyncIterator[str]:
+    """One transcription in ``fmt``, as chunks of text."""
+    entries = transcription_entries(query, transcription_id, original=original)
+    if fmt == "vtt":
+        yield "WEBVTT\n\n"
+    number = 0
+    async for entry in entries:
+        number += 1
+        if fmt == "srt":
+            speaker = f"{entry.speaker}: " if entry.speaker else ""
+            yield (
+                f"{number}\n{timestamp(entry.start, ',')} --> {timestamp(entry.end, ',')}\n"
+                f"{speaker}{entry.text}\n\n"
+            )
+        elif fmt == "vtt":
+            speaker = f"<v {_vtt_escape(entry.speaker)}>" if entry.speaker else ""
+            yield (
+                f"{timestamp(entry.start, '.')} --> {timestamp(entry.end, '.')}\n"
+                f"{speaker}{_vtt_escape(entry.text)}\n\n"
+            )
+        elif fmt == "jsonl":
+            yield (
+                json.dumps(
+                    {
+                        "transcription_id": entry.transcription_id,
+                        "entry_id": entry.entry_id,
+                        "start": entry.start,
+                        "end": entry.end,
+                        "speaker": entry.speaker,
+                        "text": entry.text,
+                    }
+                )
+                + "\n"
+            )
+        else:
+            # The same layout as the detail page's Copy button
+            speaker = f"{entry.speaker}: " if entry.speaker else ""
+            yield f"{speaker}{entry.text}\n"
+
+
+async def export_transcriptions(
+    query: Query,
+    transcription_ids: AsyncIterable[int],
+    fmt: str,
+    *,
+    original: bool = False,
+) -> AsyncIterator[str]:
+    """Several transcriptions as one JSON Lines or plain text document."""
+    first = True
+    async for transcription_id in transcription_ids:
+        if fmt == "txt":
+            title = await transcription_title(query, transcription_id)
+            yield ("" if first else "\n") + f"# {title}\n\n"
+        first = False
+        async for chunk in export_transcription(
+            query, transcription_id, fmt, original=original
+        ):
+            yield chunk
+
+
+def export_filename(transcription_id: int, title: str | None, fmt: str) -> str:
+    stem = PurePosixPath(title.split("?")[0]).stem if title else ""
+    stem = re.sub(r"[^\w.-]+", "-", stem).strip("-.")
+    return (
+        f"{transcription_id}-{stem}{FORMATS[fmt].extension}"
+        if stem
+        else f"{transcription_id}{FORMATS[fmt].extension}"
+    )
+
+
+class _Sink(io.RawIOBase):
+    """A write-only, unseekable file for ZipFile, emptied after every write."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def export_zip(
+    query: Query,
+    transcription_ids: AsyncIterable[int],
+    fmt: str,
+    *,
+    original: bool = False,
+) -> AsyncIterator[bytes]:
+    """A zip of one ``fmt`` file per transcription."""
+    sink = _Sink()
+    # Without tell() or seek(), ZipFile writes sizes after each file's data
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async for transcription_id in transcription_ids:
+            title = await transcription_title(query, transcription_id)
+            with archive.open(
+                export_filename(transcription_id, title, fmt), "w"
+            ) as member:
+                async for chunk in export_transcription(
+                    query, transcription_id, fmt, original=original
+                ):
+                    member.write(chunk.encode("utf-8"))
+                    if data := sink.drain():
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,175 @@
+"""Thin async wrappers around the ffmpeg and ffprobe command line tools."""
+
+import asyncio
+import re
+import shutil
+
+# What ffmpeg may open for a URL input. Without this an HTTP response, such
+# as an HLS playlist, could point it at file:, concat: or other protocols
+URL_PROTOCOLS = "http,https,tcp,tls,crypto"
+URL_SCHEMES = ("http://", "https://")
+
+_SILENCE_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+class FFmpegError(Exception):
+    pass
+
+
+def require(tool: str = "ffmpeg") -> str:
+    path = shutil.which(tool)
+    if path is None:
+        raise FFmpegError(
+            f"{tool} was not found on PATH; install ffmpeg to use this feature"
+        )
+    return path
+
+
+def is_url(source: str) -> bool:
+    return source.lower().startswith(URL_SCHEMES)
+
+
+def input_args(source: str) -> list[str]:
+    """``-i source``, limited to network protocols when ``source`` is a URL."""
+    if is_url(source):
+        return ["-protocol_whitelist", URL_PROTOCOLS, "-i", source]
+    return ["-i", source]
+
+
+async def run(tool: str, *args: str) -> tuple[bytes, bytes]:
+    """Run ffmpeg or ffprobe, returning (stdout, stderr). Raises FFmpegError on failure."""
+    process = await asyncio.create_subprocess_exec(
+        require(tool),
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        message = stderr.decode(errors="replace").strip().splitlines()
+        raise FFmpegError(
+            f"{tool} failed: {message[-1] if message else process.returncode}"
+        )
+    return stdout, stderr
+
+
+async def stream(tool: str, *args: str, chunk_size: int = 1024 * 1024):
+    """Run ffmpeg or ffprobe, yielding stdout in chunks of up to ``chunk_size`` bytes.
+
+    For output too large to hold in memory at once; pass ``-loglevel error``
+    so stderr, which is only read at the end, stays small.
+    """
+    process = await asyncio.create_subprocess_exec(
+        require(tool),
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    assert process.stdout is not None and process.stderr is not None
+    try:
+        while chunk := await process.stdout.read(chunk_size):
+            yield chunk
+        stderr = await process.stderr.read()
+        await process.wait()
+    except BaseException:
+        # Cancelled, or the caller stopped iterating
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        message = stderr.decode(errors="replace").strip().splitlines()
+        raise FFmpegError(
+            f"{tool} failed: {message[-1] if message else process.returncode}"
+        )
+
+
+async def probe_duration(source: str) -> float:
+    stdout, _ = await run(
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        *input_args(source),
+    )
+    return float(stdout.strip())
+
+
+async def estimate_duration(source: str) -> float | None:
+    """``probe_duration()``, or None when ffprobe is missing or can't tell."""
+    try:
+        return await probe_duration(source)
+    except (FFmpegError, ValueError):
+        return None
+
+
+async def detect_silences(
+    source: str, *, noise_db: float = -35.0, min_duration: float = 0.5
+) -> list[tuple[float, float]]:
+    """(start, end) of every stretch quieter than ``noise_db`` for at least ``min_duration`` seconds."""
+    _, stderr = await run(
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        *input_args(source),
+        "-af",
+        f"silencedetect=noise={noise_db}dB:d={min_duration}",
+        "-f",
+        "null",
+        "-",
+    )
+    silences = []
+    start = None
+    for line in stderr.decode(errors="replace").splitlines():
+        if match := _SILENCE_START_RE.search(line):
+            start = max(float(match.group(1)), 0.0)
+        elif (match := _SILENCE_END_RE.search(line)) and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+async def extract(
+    source: str, start: float, duration: float, output: str, *, sample_rate: int = 16000
+):
+    """Re-encode ``duration`` seconds from ``start`` as mono MP3.
+
+    Re-encoding rather than stream copying makes the cut sample accurate, so
+    timestamps in the piece line up with the offset it was cut at. Pieces
+    only go to the API, so they are resampled to what speech recognition
+    needs, which keeps the uploads small.
+    """
+    await run(
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-loglevel",
+        "error",
+        "-ss",
+        f"{start:.3f}",
+        "-t",
+        f"{duration:.3f}",
+        *input_args(source),
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "-c:a",
+        "libmp3lame",
+        "-q:a",
+        "4",
+        "-y",
+        output,
+    )
@@ -0,0 +1,161 @@
+"""Write transcriptions and their segments to the database.
+
+These functions take a plain ``sqlite3`` connection so the same code runs
+inside ``db.execute_write_fn()`` for the web routes and the job queue, and
+against a direct connection in the CLI. None of them commit: callers run
+them inside a single transaction, so a transcription's entries and speakers
+become visible all at once.
+"""
+
+from pathlib import Path
+
+from .speakers import speaker_ref
+from .stats import refresh_transcription_stats
+from .storage import StoredAudio, record_audio
+
+BLOB_WRITE_CHUNK = 1024 * 1024
+
+
+def insert_transcription(
+    conn,
+    *,
+    url: str | None,
+    input_type: str,
+    filename: str | None,
+    model: str,
+    granularity: str,
+    file_bytes: bytes | None = None,
+    content_type: str | None = None,
+    audio: StoredAudio | None = None,
+    audio_path: Path | None = None,
+    audio_sha256: str | None = None,
+) -> int:
+    """Insert a transcription row with its audio.
+
+    Pass ``audio`` for a file already written to an external store, or
+    ``file_bytes`` or ``audio_path`` to keep the audio in the database.
+    """
+    cursor = conn.execute(
+        """
+        insert into datasette_scribe_transcriptions (url, input_type, filename, model, granularity, audio_sha256, submitted_at)
+        values (?, ?, ?, ?, ?, ?, datetime('now', 'subsec'))
+        """,
+        [
+            url,
+            input_type,
+            filename,
+            model,
+            granularity,
+            audio.sha256 if audio else audio_sha256,
+        ],
+    )
+    transcription_id = cursor.lastrowid
+    if audio is not None:
+        record_audio(conn, transcription_id, audio)
+    elif file_bytes is not None:
+        conn.execute(
+            "insert into datasette_scribe_audio_blobs (transcription_id, data, content_type) values (?, ?, ?)",
+            [transcription_id, file_bytes, content_type],
+        )
+    elif audio_path is not None:
+        insert_audio_blob_from_file(conn, transcription_id, audio_path, content_type)
+    return transcription_id
+
+
+def insert_audio_blob_from_file(
+    conn, transcription_id: int, path: Path, content_type: str | None
+):
+    """Copy a file into an audio blob without holding all of it in memory."""
+    if not hasattr(conn, "blobopen"):
+        # Python 3.10 and pysqlite3 have no incremental blob I/O
+        conn.execute(
+            "insert into datasette_scribe_audio_blobs (transcription_id, data, content_type) values (?, ?, ?)",
+            [transcription_id, path.read_bytes(), content_type],
+        )
+        return
+    blob_id = conn.execute(
+        "insert into datasette_scribe_audio_blobs (transcription_id, data, content_type) values (?, zeroblob(?), ?)",
+        [transcription_id, path.stat().st_size, content_type],
+    ).lastrowid
+    with (
+        open(path, "rb") as f,
+        conn.blobopen("datasette_scribe_audio_blobs", "data", blob_id) as blob,
+    ):
+        while chunk := f.read(BLOB_WRITE_CHUNK):
+            blob.write(chunk)
+
+
+def store_response(conn, transcription_id: int, response) -> int:
+    """Mark a transcription completed and bulk insert its segments and speakers."""
+    conn.execute(
+        """
+        update datasette_scribe_transcriptions set completed_at = datetime('now', 'subsec'), usage = ?, error = null
+        where id = ?
+        """,
+        [
+            response.usage.model_dump_json() if response.usage else None,
+            transcription_id,
+        ],
+    )
+
+    entries = []
+    refs: dict[str, int | None] = {}
+    for segment in response.segments:
+        # Prefix speaker IDs to keep them unique per transcription — the model
+        # reuses generic names like "Speaker 1" across different audio files.
+        # original_speaker_id preserves the raw value from the model.
+        scoped_speaker = (
+            f"t{transcription_id}_{segment.speaker_id}" if segment.speaker_id else None
+        )
+        if scoped_speaker and scoped_speaker not in refs:
+            refs[scoped_speaker] = speaker_ref(conn, scoped_speaker, is_original=True)
+        entries.append(
+            (
+                transcription_id,
+                segment.start,
+                segment.end,
+                refs.get(scoped_speaker) if scoped_speaker else None,
+                segment.text,
+                segment.text,
+                segment.speaker_id,
+            )
+        )
+
+    conn.executemany(
+        """
+        insert into datasette_scribe_transcription_entries
+            (transcription_id, start, end, speaker_ref, text, original_text, original_speaker_id)
+        values (?, ?, ?, ?, ?, ?, ?)
+        """,
+        entries,
+    )
+    refresh_transcription_stats(conn, [transcription_id])
+    return len(entries)
+
+
+def ingest_transcription(
+    conn,
+    response,
+    *,
+    url: str | None,
+    filename: str | None,
+    file_bytes: bytes | None,
+    content_type: str | None,
+    granularity: str = "segment",
+    audio: StoredAudio | None = None,
+    audio_sha256: str | None = None,
+) -> tuple[int, int]:
+    """Insert a finished transcription in one go. Returns (transcription_id, entries_count)."""
+    transcription_id = insert_transcription(
+        conn,
+        url=url,
+        input_type="url" if url else "file",
+        filename=filename,
+        model=response.model,
+        granularity=granularity,
+        file_bytes=file_bytes,
+        content_type=content_type,
+        audio=audio,
+        audio_sha256=audio_sha256,
+    )
+    return transcription_id, store_response(conn, transcription_id, response)
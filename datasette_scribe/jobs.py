@@ -0,0 +1,468 @@
+import asyncio
+import contextlib
+import logging
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .cache import CachePolicy, cache_get, cache_policy, cache_put
+from .chunking import chunking_options, transcribe_chunked
+from .ffmpeg import FFmpegError, estimate_duration, is_url
+from .ingest import store_response
+from .metrics import JOBS
+from .preprocess import (
+    PreprocessOptions,
+    PreprocessStats,
+    compact_audio,
+    preprocess_options,
+)
+from .router import get_config
+from .storage import audio_file, file_sha256, get_audio_store
+from .transcode import (
+    TranscodeOptions,
+    save_playback,
+    transcode_audio,
+    transcode_options,
+)
+from .voxtral_api import (
+    TranscriptionResponse,
+    VoxtralClient,
+    voxtral_client_from_config,
+)
+from .waveform import compute_peaks_for_audio, store_peaks, waveform_available
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 2
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30.0
+
+# Transcriptions submitted before the job queue existed have no job row, so
+# their status is derived from completed_at/error instead.
+TRANSCRIPTION_STATUS = (
+    "coalesce((select j.status from datasette_scribe_jobs j where j.transcription_id = t.id),"
+    " case when t.error is not null then 'failed'"
+    " when t.completed_at is not null then 'completed' else 'queued' end)"
+)
+
+_queues: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class JobQueue:
+    """Runs queued transcription jobs on a bounded pool of asyncio workers.
+
+    Job state lives in the ``datasette_scribe_jobs`` table of each database, so
+    jobs that were queued or running when the server stopped are picked up
+    again by ``start()``. The in-memory queue only carries ``(database, job_id)``
+    pairs.
+    """
+
+    def __init__(
+        self,
+        datasette,
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        chunking: dict | None = None,
+        client_config: dict | None = None,
+        cache: CachePolicy | None = None,
+        waveforms: bool = True,
+        transcode: TranscodeOptions | None = None,
+        preprocess: PreprocessOptions | None = None,
+    ):
+        self.datasette = datasette
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        # Keyword arguments for transcribe_chunked(), or None to send
+        # each recording in a single request
+        self.chunking = chunking
+        self.client_config = client_config
+        self.cache = cache or CachePolicy()
+        # Compute waveform peaks after each transcription, where ffmpeg and
+        # NumPy are installed
+        self.waveforms = waveforms and waveform_available()
+        # Playback copies of uploaded audio, or None to serve the originals
+        self.transcode = transcode
+        self._transcode_pool: ProcessPoolExecutor | None = None
+        # Downmix and resample uploads before sending them, or None to send
+        # them as stored
+        self.preprocess = preprocess
+        self.preprocess_stats = PreprocessStats()
+        # Shared by every worker so connections are pooled and the rate
+        # limits apply across jobs; created by start(), closed by stop()
+        self.client: VoxtralClient | None = None
+        self._queue: asyncio.Queue[tuple[str, int]] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+        # Waveforms and transcodes for transcriptions served from the cache
+        self._followups: set[asyncio.Task] = set()
+
+    async def start(self):
+        if self._workers:
+            return
+        self.client = voxtral_client_from_config(self.client_config)
+        if self.transcode is not None:
+            self._transcode_pool = ProcessPoolExecutor(
+                max_workers=self.transcode.workers
+            )
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+        await self.recover()
+
+    async def stop(self):
+        for task in [*self._workers, *self._retries, *self._followups]:
+            task.cancel()
+        await asyncio.gather(
+            *self._workers, *self._retries, *self._followups, return_exceptions=True
+        )
+        self._workers = []
+        self._retries = set()
+        self._followups = set()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self._transcode_pool is not None:
+            self._transcode_pool.shutdown(wait=False, cancel_futures=True)
+            self._transcode_pool = None
+
+    def _client(self) -> VoxtralClient:
+        # Created by start(), before any worker runs
+        assert self.client is not None
+        return self.client
+
+    async def recover(self):
+        """Re-queue jobs left queued or running by a previous process."""
+        for name, db in self.datasette.databases.items():
+            if not db.is_mutable or not await db.table_exists("datasette_scribe_jobs"):
+                continue
+            rows = await db.execute(
+                "select id, status,"
+                " max((julianday(next_attempt_at) - julianday('now')) * 86400, 0) as wait"
+                " from datasette_scribe_jobs"
+                " where status in ('queued', 'running') order by id"
+            )
+            if any(row["status"] == "running" for row in rows.rows):
+                await db.execute_write(
+                    "update datasette_scribe_jobs set status = 'queued' where status = 'running'"
+                )
+            for row in rows.rows:
+                if row["wait"]:
+                    # Still backing off from a failed attempt
+                    self._schedule_retry(name, row["id"], row["wait"])
+                else:
+                    self.submit(name, row["id"])
+
+    def submit(self, database: str, job_id: int):
+        self._queue.put_nowait((database, job_id))
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def join(self):
+        """Wait until every submitted job, including scheduled retries and
+        the follow-up steps of cached ones, has finished."""
+        while True:
+            await self._queue.join()
+            if not self._retries and not self._followups:
+                return
+            await asyncio.gather(
+                *self._retries, *self._followups, return_exceptions=True
+            )
+
+    async def _worker(self):
+        while True:
+            database, job_id = await self._queue.get()
+            try:
+                await self._run(database, job_id)
+            except Exception:
+                logger.exception("Transcription job %s in %s crashed", job_id, database)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, database: str, job_id: int):
+        db = self.datasette.get_database(database)
+
+        def claim(conn):
+            cursor = conn.execute(
+                "update datasette_scribe_jobs set status = 'running', attempts = attempts + 1,"
+                " started_at = datetime('now', 'subsec'), next_attempt_at = null"
+                " where id = ? and status = 'queued'",
+                [job_id],
+            )
+            if cursor.rowcount == 0:
+                return None
+            return conn.execute(
+                "select j.transcription_id, j.attempts, j.max_attempts, j.use_cache,"
+                " t.url, t.input_type, t.filename, t.model, t.granularity, t.audio_sha256"
+                " from datasette_scribe_jobs j"
+                " join datasette_scribe_transcriptions t on t.id = j.transcription_id"
+                " where j.id = ?",
+                [job_id],
+            ).fetchone()
+
+        claimed = await db.execute_write_fn(claim)
+        if claimed is None:
+            # Already claimed by another worker, or no longer queued
+            return
+        (
+            transcription_id,
+            attempts,
+            max_attempts,
+            use_cache,
+            url,
+            input_type,
+            filename,
+            model,
+            granularity,
+            sha256,
+        ) = claimed
+
+        def complete(conn, response: TranscriptionResponse):
+            store_response(conn, transcription_id, response)
+            if sha256:
+                conn.execute(
+                    "update datasette_scribe_transcriptions set audio_sha256 = ?"
+                    " where id = ? and audio_sha256 is null",
+                    [sha256, transcription_id],
+                )
+                cache_put(
+                    conn,
+                    sha256,
+                    response,
+                    model=model,
+                    granularity=granularity,
+                    policy=self.cache,
+                )
+            conn.execute(
+                "update datasette_scribe_jobs set status = 'completed', error = null,"
+                " finished_at = datetime('now', 'subsec') where id = ?",
+                [job_id],
+            )
+
+        path = None
+        async with contextlib.AsyncExitStack() as stack:
+            try:
+                if input_type == "file":
+                    path = await stack.enter_async_context(
+                        audio_file(
+                            self.datasette, db, transcription_id, _suffix(filename)
+                        )
+                    )
+                    if path is None:
+                        raise ValueError("Audio for this transcription is missing")
+                    if sha256 is None:
+                        # Not backfilled yet; complete() records it
+                        sha256 = await asyncio.to_thread(file_sha256, Path(path))
+                response = None
+                if sha256 and use_cache and self.cache.enabled:
+                    response = await db.execute_write_fn(
+                        lambda conn: cache_get(
+                            conn, sha256, model=model, granularity=granularity
+                        )
+                    )
+                if response is None:
+                    if self.chunking is not None:
+                        response = await self._transcribe_chunked(url, path, filename)
+                    elif path is not None:
+                        response = await self._transcribe_file(path, filename, model)
+                    else:
+                        response = await self._client().transcribe(url, model=model)
+                # Segments, speakers and the job status land in one transaction,
+                # so a failed write leaves nothing behind to clean up on retry
+                await db.execute_write_fn(lambda conn: complete(conn, response))
+            except Exception as e:
+                await self._fail(
+                    db, job_id, transcription_id, attempts, max_attempts, str(e)
+                )
+                return
+            JOBS.inc(outcome="completed")
+            await self._after_transcription(db, transcription_id, path, url)
+
+    async def _after_transcription(self, db, transcription_id, path, url):
+        if self.waveforms:
+            await self._store_waveform(db, transcription_id, path, url)
+        if self._transcode_pool is not None and path is not None:
+            await self._transcode(db, transcription_id, path)
+
+    def finish_cached(self, database: str, transcription_id: int):
+        """Run the steps that follow a transcription for one completed from
+        the response cache when it was submitted."""
+        task = asyncio.create_task(self._finish_cached(database, transcription_id))
+        self._followups.add(task)
+        task.add_done_callback(self._followups.discard)
+
+    async def _finish_cached(self, database: str, transcription_id: int):
+        db = self.datasette.get_database(database)
+        JOBS.inc(outcome="completed")
+        try:
+            row = (
+                await db.execute(
+                    "select url, input_type, filename from datasette_scribe_transcriptions where id = ?",
+                    [transcription_id],
+                )
+            ).first()
+            if row["input_type"] != "file":
+                await self._after_transcription(db, transcription_id, None, row["url"])
+                return
+            async with audio_file(
+                self.datasette, db, transcription_id, _suffix(row["filename"])
+            ) as path:
+                if path is not None:
+                    await self._after_transcription(db, transcription_id, path, None)
+        except Exception:
+            logger.exception(
+                "Follow-up steps for transcription %s in %s crashed",
+                transcription_id,
+                database,
+            )
+
+    async def _store_waveform(self, db, transcription_id, path, url):
+        # The player works without peaks, so a failure here never fails the job
+        try:
+            peaks = await compute_peaks_for_audio(path, url)
+            await db.execute_write_fn(
+                lambda conn: store_peaks(conn, transcription_id, peaks)
+            )
+        except Exception:
+            logger.warning(
+                "Could not compute waveform for transcription %s",
+                transcription_id,
+                exc_info=True,
+            )
+
+    async def _transcode(self, db, transcription_id, path):
+        # Like the waveform, the original still plays if this fails
+        assert self.transcode is not None
+        options = self.transcode
+        store = get_audio_store(self.datasette)
+        try:
+            existing = await db.execute(
+                "select 1 from datasette_scribe_playback_audio where transcription_id = ?",
+                [transcription_id],
+            )
+            if existing.first() is not None:
+                # A retried job, whose audio may already be the copy
+                return
+            result = await transcode_audio(self._transcode_pool, path, options, store)
+            if result is None:
+                return
+            playback, data = result
+            original_size = os.path.getsize(path)
+            unreferenced = await db.execute_write_fn(
+                lambda conn: save_playback(
+                    conn,
+                    transcription_id,
+                    playback,
+                    data,
+                    original_size=original_size,
+                    keep_original=options.keep_original,
+                )
+            )
+            # Only an original in the store can be left unreferenced
+            if unreferenced and store is not None:
+                await asyncio.to_thread(store.delete, unreferenced)
+        except Exception:
+            logger.warning(
+                "Could not transcode audio for transcription %s",
+                transcription_id,
+                exc_info=True,
+            )
+
+    async def _transcribe_file(self, path, filename, model):
+        compact = None
+        if self.preprocess is not None:
+            try:
+                compact = await compact_audio(
+                    path, filename, self.preprocess, self.preprocess_stats
+                )
+            except FFmpegError:
+                # The API may still read what ffmpeg couldn't, so send the original
+                logger.warning("Could not preprocess %s", filename, exc_info=True)
+        if compact is not None:
+            audio, filename = compact
+        else:
+            audio = await asyncio.to_thread(Path(path).read_bytes)
+        # For the audio rate limit; the response settles it
+        client = self._client()
+        audio_seconds = await estimate_duration(path) if client.audio_limit else None
+        return await client.transcribe(
+            file_data=audio, filename=filename, model=model, audio_seconds=audio_seconds
+        )
+
+    async def _transcribe_chunked(self, url, path, filename):
+        assert self.chunking is not None
+        if path is None and not is_url(url or ""):
+            raise ValueError("Only http(s) URLs can be transcribed")
+        # ffmpeg reads http(s) URLs itself
+        return await transcribe_chunked(
+            path if path is not None else url,
+            filename=filename,
+            transcribe_fn=self._client().transcribe,
+            **self.chunking,
+        )
+
+    async def _fail(self, db, job_id, transcription_id, attempts, max_attempts, error):
+        retry = attempts < max_attempts
+        delay = self.retry_delay * 2 ** (attempts - 1)
+
+        def record(conn):
+            if retry:
+                conn.execute(
+                    "update datasette_scribe_jobs set status = 'queued', error = ?,"
+                    " next_attempt_at = datetime('now', 'subsec', ?) where id = ?",
+                    [error, f"+{delay} seconds", job_id],
+                )
+                return
+            conn.execute(
+                "update datasette_scribe_jobs set status = 'failed', error = ?,"
+                " finished_at = datetime('now', 'subsec') where id = ?",
+                [error, job_id],
+            )
+            conn.execute(
+                "update datasette_scribe_transcriptions set error = ? where id = ?",
+                [error, transcription_id],
+            )
+
+        await db.execute_write_fn(record)
+        if retry:
+            self._schedule_retry(db.name, job_id, delay)
+            JOBS.inc(outcome="retried")
+        else:
+            JOBS.inc(outcome="failed")
+
+    def _schedule_retry(self, database: str, job_id: int, delay: float):
+        task = asyncio.create_task(self._retry_later(database, job_id, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _retry_later(self, database: str, job_id: int, delay: float):
+        await asyncio.sleep(delay)
+        self.submit(database, job_id)
+
+
+def _suffix(filename: str | None) -> str:
+    return os.path.splitext(filename or "")[1]
+
+
+def get_job_queue(datasette) -> JobQueue:
+    queue = _queues.get(datasette)
+    if queue is None:
+        config = get_config(datasette)
+        queue = JobQueue(
+            datasette,
+            concurrency=int(config.get("concurrency", DEFAULT_CONCURRENCY)),
+            max_attempts=int(config.get("max_attempts", DEFAULT_MAX_ATTEMPTS)),
+            retry_delay=float(config.get("retry_delay", DEFAULT_RETRY_DELAY)),
+            chunking=chunking_options(config.get("chunking")),
+            client_config=config.get("voxtral"),
+            cache=cache_policy(config.get("cache")),
+            waveforms=bool(config.get("waveforms", True)),
+            transcode=transcode_options(config.get("transcode")),
+            preprocess=preprocess_options(config.get("preprocess")),
+        )
+        _queues[datasette] = queue
+    return queue
@@ -0,0 +1,310 @@
+"""Prometheus metrics for the routes, the transcription API and the job queue.
+
+A small in-process registry rather than a dependency on prometheus_client:
+counters, gauges and histograms with labels, rendered in the Prometheus
+text format by the ``/-/scribe/metrics`` route. Recording one is a dict
+lookup and a few additions, and everything is updated from the event loop,
+so there are no locks and it can stay on in production.
+
+Routes are wrapped by ``instrument_route()`` when they are registered, and
+``VoxtralClient.transcribe()`` by ``instrument_transcribe()``.
+"""
+
+import bisect
+import re
+import time
+from dataclasses import dataclass
+from functools import wraps
+
+from datasette.tracer import capture_traces, get_task_id, tracers
+
+REGISTRY: list["_Metric"] = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Transcription requests run for up to the client's 300 second timeout
+TRANSCRIBE_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 180.0, 240.0, 300.0)
+
+_GROUP_RE = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class _Value(_Metric):
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Value):
+    type = "counter"
+
+
+class Gauge(_Value):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+@dataclass
+class _HistogramState:
+    # Per-bucket counts, the last for +Inf
+    counts: list[int]
+    total: float = 0.0
+    count: int = 0
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), *, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._states: dict[tuple, _HistogramState] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _HistogramState(
+                counts=[0] * (len(self.buckets) + 1)
+            )
+        state.counts[bisect.bisect_left(self.buckets, value)] += 1
+        state.total += value
+        state.count += 1
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, state in sorted(self._states.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), state.counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            lines.append(
+                f"{self.name}_sum{_labels(self.labelnames, key)} {_number(state.total)}"
+            )
+            lines.append(
+                f"{self.name}_count{_labels(self.labelnames, key)} {state.count}"
+            )
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter(
+    "scribe_http_requests_total",
+    "Requests to scribe routes",
+    ("route", "method", "status"),
+)
+HTTP_DURATION = Histogram(
+    "scribe_http_request_duration_seconds",
+    "Time to build the response to a scribe route, excluding streaming the body",
+    ("route",),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "scribe_http_requests_in_flight", "Scribe route requests being handled", ("route",)
+)
+SQL_DURATION = Histogram(
+    "scribe_sql_duration_seconds",
+    "Total time in SQL queries per scribe request",
+    ("route",),
+)
+SQL_QUERIES = Counter(
+    "scribe_sql_queries_total", "SQL queries run by scribe routes", ("route",)
+)
+AUDIO_BYTES = Counter("scribe_audio_bytes_served_total", "Audio bytes sent to clients")
+
+TRANSCRIBE_REQUESTS = Counter(
+    "scribe_transcribe_requests_total",
+    "Calls to the transcription API, after retries",
+    ("model", "outcome"),
+)
+TRANSCRIBE_DURATION = Histogram(
+    "scribe_transcribe_duration_seconds",
+    "Time for a transcription API call, including retries",
+    ("model",),
+    buckets=TRANSCRIBE_BUCKETS,
+)
+TRANSCRIBE_IN_FLIGHT = Gauge(
+    "scribe_transcribe_in_flight", "Transcription API calls in progress"
+)
+TRANSCRIBE_UPLOAD_BYTES = Counter(
+    "scribe_transcribe_upload_bytes_total",
+    "Audio bytes uploaded to the transcription API",
+)
+AUDIO_SECONDS = Counter(
+    "scribe_transcribed_audio_seconds_total", "Seconds of audio transcribed", ("model",)
+)
+TOKENS = Counter(
+    "scribe_transcribe_tokens_total",
+    "Tokens reported by the transcription API",
+    ("model", "kind"),
+)
+
+JOBS = Counter(
+    "scribe_jobs_total",
+    "Transcription job attempts by outcome; failed ones are written to the error column",
+    ("outcome",),
+)
+QUEUE_DEPTH = Gauge("scribe_job_queue_depth", "Transcription jobs waiting for a worker")
+
+
+def route_label(path: str) -> str:
+    """``/(?P<database>[^/]+)/-/scribe$`` as ``/{database}/-/scribe``."""
+    return _GROUP_RE.sub(r"{\1}", path).lstrip("^").rstrip("$").replace("\\", "")
+
+
+class _SqlTimer(list):
+    """Stands in for a tracer list, keeping only the time spent in SQL."""
+
+    def __init__(self):
+        super().__init__()
+        self.seconds = 0.0
+        self.queries = 0
+
+    def append(self, trace):
+        if trace["type"] == "sql":
+            self.seconds += trace["end"] - trace["start"]
+            self.queries += 1
+
+
+def instrument_route(path: str, view):
+    route = route_label(path)
+
+    async def instrumented(
+        request, datasette=None, scope=None, receive=None, send=None
+    ):
+        kwargs = dict(
+            request=request,
+            datasette=datasette,
+            scope=scope,
+            receive=receive,
+            send=send,
+        )
+        HTTP_IN_FLIGHT.inc(route=route)
+        start = time.perf_counter()
+        status = "500"
+        sql = _SqlTimer()
+        # Leave a ?_trace=1 tracer alone; its request just goes without SQL time
+        traced = get_task_id() in tracers
+        try:
+            if traced:
+                response = await view(**kwargs)
+            else:
+                with capture_traces(sql):
+                    response = await view(**kwargs)
+            status = str(getattr(response, "status", 200))
+            return response
+        except Exception as e:
+            # Forbidden and NotFound carry their own status
+            status = str(getattr(e, "status", 500))
+            raise
+        finally:
+            HTTP_IN_FLIGHT.dec(route=route)
+            HTTP_DURATION.observe(time.perf_counter() - start, route=route)
+            HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+            if not traced:
+                SQL_DURATION.observe(sql.seconds, route=route)
+                SQL_QUERIES.inc(sql.queries, route=route)
+
+    return instrumented
+
+
+def count_audio_bytes(read):
+    """Wraps a ``range_response()`` reader so what it reads counts as audio served."""
+
+    async def counted(offset: int, length: int) -> bytes:
+        chunk = await read(offset, length)
+        AUDIO_BYTES.inc(len(chunk))
+        return chunk
+
+    return counted
+
+
+def instrument_transcribe(fn):
+    """Wraps ``VoxtralClient.transcribe()``."""
+
+    @wraps(fn)
+    async def instrumented(self, *args, **kwargs):
+        from .voxtral_api import DEFAULT_MODEL
+
+        model = kwargs.get("model") or DEFAULT_MODEL
+        uploaded = self.stats.upload_bytes
+        TRANSCRIBE_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await fn(self, *args, **kwargs)
+            outcome = "ok"
+        finally:
+            TRANSCRIBE_IN_FLIGHT.dec()
+            TRANSCRIBE_DURATION.observe(time.perf_counter() - start, model=model)
+            TRANSCRIBE_REQUESTS.inc(model=model, outcome=outcome)
+            TRANSCRIBE_UPLOAD_BYTES.inc(self.stats.upload_bytes - uploaded)
+        usage = result.usage
+        if usage is not None:
+            if usage.prompt_audio_seconds:
+                AUDIO_SECONDS.inc(usage.prompt_audio_seconds, model=model)
+            for kind, value in (
+                ("prompt", usage.prompt_tokens),
+                ("completion", usage.completion_tokens),
+                ("total", usage.total_tokens),
+                ("cached", usage.num_cached_tokens),
+            ):
+                if value:
+                    TOKENS.inc(value, model=model, kind=kind)
+        return result
+
+    return instrumented
@@ -0,0 +1,335 @@
+"""Versioned schema migrations.
+
+Each migration is a function that takes a ``sqlite3`` connection. Applied
+migrations are recorded by name in ``datasette_scribe_migrations`` rather than
+in ``PRAGMA user_version``, because scribe shares the database with whatever
+else the user keeps in it and ``user_version`` belongs to them.
+
+``migrate()`` does not commit — run it inside one transaction, e.g. with
+``db.execute_write_fn(migrate)`` — so a failing migration leaves the
+database untouched.
+"""
+
+import sqlite3
+from pathlib import Path
+
+INITIAL_SQL = (Path(__file__).parent / "schema.sql").read_text()
+
+MIGRATIONS = []
+
+
+def migration(fn):
+    MIGRATIONS.append(fn)
+    return fn
+
+
+def execute_statements(conn, sql: str):
+    # conn.executescript() would COMMIT first, so run statements one at a time
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+@migration
+def m001_initial(conn):
+    execute_statements(conn, INITIAL_SQL)
+
+
+@migration
+def m002_indexes(conn):
+    execute_statements(
+        conn,
+        """
+        -- Covers the per-transcription entry count, duration and speaker count
+        create index if not exists datasette_scribe_entries_transcription
+            on datasette_scribe_transcription_entries (transcription_id, start, end, speaker_id);
+        create index if not exists datasette_scribe_entries_speaker
+            on datasette_scribe_transcription_entries (speaker_id, transcription_id);
+        create index if not exists datasette_scribe_edits_transcription
+            on datasette_scribe_transcription_edits (transcription_id);
+        create index if not exists datasette_scribe_jobs_status
+            on datasette_scribe_jobs (status);
+        """,
+    )
+
+
+@migration
+def m003_audio_files(conn):
+    execute_statements(
+        conn,
+        """
+        -- Audio kept in an external store, addressed by content hash
+        create table if not exists datasette_scribe_audio_files (
+            transcription_id integer primary key references datasette_scribe_transcriptions(id),
+            sha256 text not null,
+            size integer not null,
+            content_type text not null,
+            storage text not null
+        );
+        create index if not exists datasette_scribe_audio_files_sha256
+            on datasette_scribe_audio_files (sha256);
+        """,
+    )
+
+
+@migration
+def m004_response_cache(conn):
+    execute_statements(
+        conn,
+        """
+        -- Raw API responses, reused when the same audio is transcribed again
+        create table if not exists datasette_scribe_response_cache (
+            audio_sha256 text not null,
+            model text not null,
+            diarize integer not null,
+            granularity text not null,
+            response text not null,
+            created_at text not null default (datetime('now', 'subsec')),
+            last_used_at text not null default (datetime('now', 'subsec')),
+            hits integer not null default 0,
+            primary key (audio_sha256, model, diarize, granularity)
+        );
+        create index if not exists datasette_scribe_response_cache_last_used
+            on datasette_scribe_response_cache (last_used_at);
+        alter table datasette_scribe_jobs add column use_cache integer not null default 1;
+        """,
+    )
+
+
+@migration
+def m005_transcription_sources(conn):
+    # Lets callers find an existing transcription of the same URL or audio
+    conn.execute(
+        "alter table datasette_scribe_transcriptions add column audio_sha256 text"
+    )
+    execute_statements(
+        conn,
+        """
+        create index if not exists datasette_scribe_transcriptions_audio_sha256
+            on datasette_scribe_transcriptions (audio_sha256);
+        create index if not exists datasette_scribe_transcriptions_url
+            on datasette_scribe_transcriptions (url);
+        update datasette_scribe_transcriptions set audio_sha256 = (
+            select f.sha256 from datasette_scribe_audio_files f
+            where f.transcription_id = datasette_scribe_transcriptions.id
+        );
+        """,
+    )
+    # Audio still in the database is left unhashed: reading all of it here
+    # would hold the write lock for as long as that takes. Jobs record the
+    # hash when they run, and the hash-audio and move-audio commands fill
+    # in the rest
+
+
+@migration
+def m006_search_index(conn):
+    # The index starts empty: rows up to backfill_until are added in batches
+    # by search.index_batch(), so enabling search on a large database doesn't
+    # hold the write lock for one long rebuild. A row is in the index when
+    # id <= indexed_through or id > backfill_until, and the triggers only
+    # touch the index for such rows.
+    (max_id,) = conn.execute(
+        "select coalesce(max(id), 0) from datasette_scribe_transcription_entries"
+    ).fetchone()
+    execute_statements(
+        conn,
+        """
+        create virtual table if not exists datasette_scribe_entries_fts using fts5 (
+            text,
+            content = 'datasette_scribe_transcription_entries',
+            content_rowid = 'id',
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        );
+        create table if not exists datasette_scribe_search_state (
+            id integer primary key check (id = 1),
+            indexed_through integer not null,
+            backfill_until integer not null
+        );
+        create trigger if not exists datasette_scribe_entries_fts_insert
+        after insert on datasette_scribe_transcription_entries
+        when new.id > (select backfill_until from datasette_scribe_search_state)
+            or new.id <= (select indexed_through from datasette_scribe_search_state)
+        begin
+            insert into datasette_scribe_entries_fts (rowid, text) values (new.id, new.text);
+        end;
+        create trigger if not exists datasette_scribe_entries_fts_delete
+        after delete on datasette_scribe_transcription_entries
+        when old.id > (select backfill_until from datasette_scribe_search_state)
+            or old.id <= (select indexed_through from datasette_scribe_search_state)
+        begin
+            insert into datasette_scribe_entries_fts (datasette_scribe_entries_fts, rowid, text)
+                values ('delete', old.id, old.text);
+        end;
+        create trigger if not exists datasette_scribe_entries_fts_update
+        after update of text on datasette_scribe_transcription_entries
+        when old.id > (select backfill_until from datasette_scribe_search_state)
+            or old.id <= (select indexed_through from datasette_scribe_search_state)
+        begin
+            insert into datasette_scribe_entries_fts (datasette_scribe_entries_fts, rowid, text)
+                values ('delete', old.id, old.text);
+            insert into datasette_scribe_entries_fts (rowid, text) values (new.id, new.text);
+        end;
+        """,
+    )
+    conn.execute(
+        "insert into datasette_scribe_search_state (id, indexed_through, backfill_until) values (1, 0, ?)",
+        [max_id],
+    )
+
+
+@migration
+def m007_transcription_stats(conn):
+    # Filled from the covering index in one pass; kept current afterwards by
+    # stats.refresh_transcription_stats()
+    execute_statements(
+        conn,
+        """
+        create table if not exists datasette_scribe_transcription_stats (
+            transcription_id integer primary key references datasette_scribe_transcriptions(id),
+            entries_count integer not null default 0,
+            duration float,
+            speakers_count integer not null default 0
+        );
+        insert or replace into datasette_scribe_transcription_stats
+            (transcription_id, entries_count, duration, speakers_count)
+        select transcription_id, count(*), max(end), count(distinct speaker_id)
+        from datasette_scribe_transcription_entries group by transcription_id;
+        """,
+    )
+
+
+@migration
+def m008_speaker_refs(conn):
+    # Entries point at speakers by id rather than by name, so renaming a
+    # speaker updates one row instead of every entry that mentions them.
+    # Names only ever set on entries get a speakers row first.
+    execute_statements(
+        conn,
+        """
+        insert or ignore into datasette_scribe_speakers (name, is_original)
+            select distinct speaker_id, 0 from datasette_scribe_transcription_entries
+            where speaker_id is not null and speaker_id != '';
+        alter table datasette_scribe_transcription_entries
+            add column speaker_ref integer references datasette_scribe_speakers(id);
+        update datasette_scribe_transcription_entries set speaker_ref = (
+            select s.id from datasette_scribe_speakers s
+            where s.name = datasette_scribe_transcription_entries.speaker_id
+        ) where speaker_id is not null and speaker_id != '';
+        drop index if exists datasette_scribe_entries_transcription;
+        drop index if exists datasette_scribe_entries_speaker;
+        alter table datasette_scribe_transcription_entries drop column speaker_id;
+        create index if not exists datasette_scribe_entries_transcription
+            on datasette_scribe_transcription_entries (transcription_id, start, end, speaker_ref);
+        create index if not exists datasette_scribe_entries_speaker
+            on datasette_scribe_transcription_entries (speaker_ref, transcription_id);
+        """,
+    )
+
+
+@migration
+def m009_speaker_usage(conn):
+    # Which speakers each transcription uses and how often, so speaker
+    # lists and checks don't aggregate the entries table; kept current by
+    # stats.refresh_transcription_stats()
+    execute_statements(
+        conn,
+        """
+        create table if not exists datasette_scribe_speaker_usage (
+            speaker_ref integer not null references datasette_scribe_speakers(id),
+            transcription_id integer not null references datasette_scribe_transcriptions(id),
+            entries_count integer not null,
+            primary key (speaker_ref, transcription_id)
+        ) without rowid;
+        create index if not exists datasette_scribe_speaker_usage_transcription
+            on datasette_scribe_speaker_usage (transcription_id, speaker_ref);
+        insert or replace into datasette_scribe_speaker_usage (speaker_ref, transcription_id, entries_count)
+        select speaker_ref, transcription_id, count(*) from datasette_scribe_transcription_entries
+        where speaker_ref is not null group by speaker_ref, transcription_id;
+        """,
+    )
+
+
+@migration
+def m010_waveforms(conn):
+    # Packed min/max peaks for the audio player, see waveform.py
+    execute_statements(
+        conn,
+        """
+        create table if not exists datasette_scribe_waveforms (
+            transcription_id integer primary key references datasette_scribe_transcriptions(id),
+            data blob not null,
+            created_at text not null
+        );
+        """,
+    )
+
+
+@migration
+def m011_playback_audio(conn):
+    # Speech-quality copies served to the player, see transcode.py
+    execute_statements(
+        conn,
+        """
+        create table if not exists datasette_scribe_playback_audio (
+            transcription_id integer primary key references datasette_scribe_transcriptions(id),
+            sha256 text not null,
+            size integer not null,
+            content_type text not null,
+            storage text not null,
+            -- The audio itself when storage is 'database'
+            data blob,
+            original_size integer not null,
+            created_at text not null
+        );
+        create index if not exists datasette_scribe_playback_audio_sha256
+            on datasette_scribe_playback_audio (sha256);
+        """,
+    )
+
+
+@migration
+def m012_job_retry_times(conn):
+    # When a job waiting to be retried is due, so recover() can keep to the
+    # backoff across a restart
+    conn.execute("alter table datasette_scribe_jobs add column next_attempt_at text")
+
+
+def latest_version() -> str:
+    return MIGRATIONS[-1].__name__
+
+
+def applied_migrations(conn) -> set[str]:
+    exists = conn.execute(
+        "select 1 from sqlite_master where type = 'table' and name = 'datasette_scribe_migrations'"
+    ).fetchone()
+    if not exists:
+        return set()
+    return {
+        row[0] for row in conn.execute("select name from datasette_scribe_migrations")
+    }
+
+
+def migrate(conn) -> list[str]:
+    """Apply pending migrations in order. Returns the names that were applied."""
+    conn.execute(
+        "create table if not exists datasette_scribe_migrations ("
+        " name text primary key,"
+        " applied_at text not null default (datetime('now', 'subsec'))"
+        ")"
+    )
+    applied = applied_migrations(conn)
+    newly_applied = []
+    for fn in MIGRATIONS:
+        if fn.__name__ in applied:
+            continue
+        fn(conn)
+        conn.execute(
+            "insert into datasette_scribe_migrations (name) values (?)", [fn.__name__]
+        )
+        newly_applied.append(fn.__name__)
+    return newly_applied
@@ -0,0 +1,343 @@
+"""Transcript, speaker and collection edits, each run as one write transaction.
+
+Every mutation endpoint calls one of these inside ``db.execute_write_fn()``,
+so the checks it makes read the same snapshot as the writes that follow,
+and a concurrent request can't change what it's about to write between the
+two. Nothing here commits, and an ``EditError`` rolls back the whole
+function, with ``status`` for the HTTP response.
+
+``apply_edits()`` takes the operations of a batch edit, runs them in order
+and writes their edit-log rows with one ``executemany``. Every operation is
+scoped to one transcription. Speaker usage for other transcriptions is
+therefore accurate throughout a batch, and this transcription's stats are
+refreshed once at the end.
+"""
+
+import json
+from dataclasses import dataclass
+
+from .page_data import EditOperation
+from .speakers import find_speaker, speaker_ref
+from .stats import refresh_transcription_stats
+
+MAX_BATCH_OPERATIONS = 1000
+
+EDIT_LOG_SQL = (
+    "insert into datasette_scribe_transcription_edits (transcription_id, entry_id, operation, detail, created_at)"
+    " values (?, ?, ?, ?, datetime('now', 'subsec'))"
+)
+
+
+class EditError(Exception):
+    def __init__(self, message: str, index: int | None = None, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+        self.status = status
+
+
+@dataclass
+class EditResult:
+    affected_entries: int = 0
+    # Set by create_speaker
+    speaker_id: int | None = None
+
+
+class _Batch:
+    def __init__(self, conn, transcription_id: int):
+        self.conn = conn
+        self.transcription_id = transcription_id
+        self.log: list[tuple] = []
+        self.speakers_changed = False
+
+    def record(self, operation: str, detail: dict, entry_id: int | None = None):
+        self.log.append(
+            (self.transcription_id, entry_id, operation, json.dumps(detail))
+        )
+
+    def entry(self, entry_id: int | None):
+        row = self.conn.execute(
+            "select e.text, s.name from datasette_scribe_transcription_entries e"
+            " left join datasette_scribe_speakers s on s.id = e.speaker_ref"
+            " where e.id = ? and e.transcription_id = ?",
+            [entry_id, self.transcription_id],
+        ).fetchone()
+        if row is None:
+            raise EditError("Entry not found")
+        return row
+
+    def count_entries(self, ref: int | None) -> int:
+        return self.conn.execute(
+            "select count(*) from datasette_scribe_transcription_entries"
+            " where speaker_ref = ? and transcription_id = ?",
+            [ref, self.transcription_id],
+        ).fetchone()[0]
+
+    def used_elsewhere(self, ref: int | None) -> bool:
+        return bool(
+            self.conn.execute(
+                "select exists(select 1 from datasette_scribe_speaker_usage"
+                " where speaker_ref = ? and transcription_id != ?)",
+                [ref, self.transcription_id],
+            ).fetchone()[0]
+        )
+
+
+def _edit_text(batch: _Batch, op) -> EditResult:
+    if op.text is None:
+        raise EditError("edit_text needs text")
+    old_text, _ = batch.entry(op.entry_id)
+    if op.text != old_text:
+        batch.conn.execute(
+            "update datasette_scribe_transcription_entries set text = ? where id = ?",
+            [op.text, op.entry_id],
+        )
+        batch.record("edit_text", {"old": old_text, "new": op.text}, op.entry_id)
+    return EditResult()
+
+
+def _reassign_speaker(batch: _Batch, op) -> EditResult:
+    if op.speaker_id is None:
+        raise EditError("reassign_speaker needs speaker_id")
+    _, old_speaker = batch.entry(op.entry_id)
+    if op.speaker_id != old_speaker:
+        # An empty name unassigns the entry
+        batch.conn.execute(
+            "update datasette_scribe_transcription_entries set speaker_ref = ? where id = ?",
+            [speaker_ref(batch.conn, op.speaker_id), op.entry_id],
+        )
+        batch.speakers_changed = True
+        batch.record(
+            "reassign_speaker", {"old": old_speaker, "new": op.speaker_id}, op.entry_id
+        )
+    return EditResult()
+
+
+def _create_speaker(batch: _Batch, op) -> EditResult:
+    if not op.name:
+        raise EditError("create_speaker needs a name")
+    if find_speaker(batch.conn, op.name) is not None:
+        raise EditError("Speaker already exists")
+    speaker_id = batch.conn.execute(
+        "insert into datasette_scribe_speakers (name, is_original) values (?, 0)",
+        [op.name],
+    ).lastrowid
+    # The id lets other pages showing this transcription add the speaker
+    batch.record("create_speaker", {"name": op.name, "speaker_id": speaker_id})
+    return EditResult(speaker_id=speaker_id)
+
+
+def _combine_speakers(batch: _Batch, op) -> EditResult:
+    if not op.from_speaker or not op.to_speaker:
+        raise EditError("combine_speakers needs from_speaker and to_speaker")
+    from_ref = find_speaker(batch.conn, op.from_speaker)
+    affected = batch.count_entries(from_ref)
+    batch.conn.execute(
+        "update datasette_scribe_transcription_entries set speaker_ref = ?"
+        " where transcription_id = ? and speaker_ref = ?",
+        [speaker_ref(batch.conn, op.to_speaker), batch.transcription_id, from_ref],
+    )
+    batch.speakers_changed = True
+    # Clean up from global speakers table if no entries remain globally
+    if (
+        from_ref is not None
+        and not batch.used_elsewhere(from_ref)
+        and not batch.count_entries(from_ref)
+    ):
+        batch.conn.execute(
+            "delete from datasette_scribe_speakers where id = ?", [from_ref]
+        )
+    batch.record(
+        "combine_speakers",
+        {"from": op.from_speaker, "to": op.to_speaker, "affected_entries": affected},
+    )
+    return EditResult(affected_entries=affected)
+
+
+def _delete_speaker(batch: _Batch, op) -> EditResult:
+    if not op.name:
+        raise EditError("delete_speaker needs a name")
+    ref = find_speaker(batch.conn, op.name)
+    if batch.used_elsewhere(ref):
+        raise EditError(
+            "Speaker is used in other transcriptions. Use unassign instead."
+        )
+    affected = batch.count_entries(ref)
+    batch.conn.execute(
+        "update datasette_scribe_transcription_entries set speaker_ref = null"
+        " where transcription_id = ? and speaker_ref = ?",
+        [batch.transcription_id, ref],
+    )
+    batch.conn.execute("delete from datasette_scribe_speakers where id = ?", [ref])
+    batch.speakers_changed = True
+    batch.record("delete_speaker", {"name": op.name, "affected_entries": affected})
+    return EditResult(affected_entries=affected)
+
+
+OPERATIONS = {
+    "edit_text": _edit_text,
+    "reassign_speaker": _reassign_speaker,
+    "create_speaker": _create_speaker,
+    "combine_speakers": _combine_speakers,
+    "delete_speaker": _delete_speaker,
+}
+
+
+def apply_edits(conn, transcription_id: int, operations) -> list[EditResult]:
+    """Apply ``operations`` in order. Raises EditError, with the failing index, if one is invalid."""
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise EditError(f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+    if (
+        conn.execute(
+            "select 1 from datasette_scribe_transcriptions where id = ?",
+            [transcription_id],
+        ).fetchone()
+        is None
+    ):
+        raise EditError("Transcription not found", status=404)
+    batch = _Batch(conn, transcription_id)
+    results = []
+    for index, op in enumerate(operations):
+        fn = OPERATIONS.get(op.op)
+        try:
+            if fn is None:
+                raise EditError(f"Unknown operation: {op.op}")
+            results.append(fn(batch, op))
+        except EditError as e:
+            e.index = index
+            raise
+    conn.executemany(EDIT_LOG_SQL, batch.log)
+    if batch.speakers_changed:
+        refresh_transcription_stats(conn, [transcription_id])
+    return results
+
+
+def edit_entry(
+    conn, entry_id: int, *, text: str | None = None, speaker_id: str | None = None
+):
+    """Edit one entry's text and/or speaker, whichever is given."""
+    row = conn.execute(
+        "select transcription_id from datasette_scribe_transcription_entries where id = ?",
+        [entry_id],
+    ).fetchone()
+    if row is None:
+        raise EditError("Entry not found", status=404)
+    operations = []
+    if text is not None:
+        operations.append(EditOperation(op="edit_text", entry_id=entry_id, text=text))
+    if speaker_id is not None:
+        operations.append(
+            EditOperation(
+                op="reassign_speaker", entry_id=entry_id, speaker_id=speaker_id
+            )
+        )
+    apply_edits(conn, row[0], operations)
+
+
+def rename_speaker(conn, speaker_id: int, new_name: str):
+    row = conn.execute(
+        "select name from datasette_scribe_speakers where id = ?", [speaker_id]
+    ).fetchone()
+    if row is None:
+        raise EditError("Speaker not found", status=404)
+    old_name = row[0]
+    new_name = new_name.strip()
+    if not new_name:
+        raise EditError("Name cannot be empty")
+    if old_name == new_name:
+        return
+    if find_speaker(conn, new_name) is not None:
+        raise EditError("A speaker with that name already exists")
+    # Entries refer to the speaker by id, so this renames it everywhere;
+    # original_speaker_id keeps the model's name
+    conn.execute(
+        "update datasette_scribe_speakers set name = ? where id = ?",
+        [new_name, speaker_id],
+    )
+    conn.execute(
+        EDIT_LOG_SQL,
+        [
+            None,
+            None,
+            "rename_speaker",
+            json.dumps({"old_name": old_name, "new_name": new_name}),
+        ],
+    )
+
+
+def _collection_exists(conn, collection_id: int):
+    if (
+        conn.execute(
+            "select 1 from datasette_scribe_collections where id = ?", [collection_id]
+        ).fetchone()
+        is None
+    ):
+        raise EditError("Collection not found", status=404)
+
+
+def _check_collection_name(conn, name: str, collection_id: int | None = None):
+    taken = conn.execute(
+        "select 1 from datasette_scribe_collections where name = ? and id is not ?",
+        [name, collection_id],
+    ).fetchone()
+    if taken:
+        raise EditError("A collection with that name already exists")
+
+
+def create_collection(conn, name: str, description: str) -> int:
+    name = name.strip()
+    _check_collection_name(conn, name)
+    return conn.execute(
+        "insert into datasette_scribe_collections (name, description) values (?, ?)",
+        [name, description],
+    ).lastrowid
+
+
+def update_collection(conn, collection_id: int, name: str, description: str):
+    _collection_exists(conn, collection_id)
+    name = name.strip()
+    _check_collection_name(conn, name, collection_id)
+    conn.execute(
+        "update datasette_scribe_collections set name = ?, description = ? where id = ?",
+        [name, description, collection_id],
+    )
+
+
+def delete_collection(conn, collection_id: int):
+    _collection_exists(conn, collection_id)
+    # The on delete cascade only applies when foreign keys are enforced
+    conn.execute(
+        "delete from datasette_scribe_collection_transcriptions where collection_id = ?",
+        [collection_id],
+    )
+    conn.execute(
+        "delete from datasette_scribe_collections where id = ?", [collection_id]
+    )
+
+
+def add_to_collection(conn, collection_id: int, transcription_id: int):
+    _collection_exists(conn, collection_id)
+    if (
+        conn.execute(
+            "select 1 from datasette_scribe_transcriptions where id = ?",
+            [transcription_id],
+        ).fetchone()
+        is None
+    ):
+        raise EditError("Transcription not found", status=404)
+    if conn.execute(
+        "select 1 from datasette_scribe_collection_transcriptions where transcription_id = ?",
+        [transcription_id],
+    ).fetchone():
+        raise EditError("Transcription is already in a collection")
+    conn.execute(
+        "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (?, ?)",
+        [collection_id, transcription_id],
+    )
+
+
+def remove_from_collection(conn, collection_id: int, transcription_id: int):
+    conn.execute(
+        "delete from datasette_scribe_collection_transcriptions where collection_id = ? and transcription_id = ?",
+        [collection_id, transcription_id],
+    )
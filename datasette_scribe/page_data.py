@@ -11,6 +11,7 @@ class TranscriptionSummary(BaseModel):
     submitted_at: str
     completed_at: str | None = None
     error: str | None = None
+    status: str = "completed"  # queued, running, completed or failed
     entries_count: int = 0
     duration: float | None = None
     speakers_count: int = 0
@@ -28,7 +29,10 @@ class CollectionWithTranscriptions(BaseModel):
     name: str
     description: str = ""
     created_at: str = ""
+    # The most recent transcriptions; fetch the rest from the transcriptions API
     transcriptions: list[TranscriptionSummary] = []
+    transcriptions_count: int = 0
+    transcriptions_next_cursor: str | None = None
 
 
 # /$db/-/scribe — main listing page showing all transcriptions for a database
@@ -36,6 +40,8 @@ class ScribePageData(BaseModel):
     database_name: str
     collections: list[CollectionWithTranscriptions] = []
     uncollected_transcriptions: list[TranscriptionSummary] = []
+    uncollected_count: int = 0
+    uncollected_next_cursor: str | None = None
 
 
 class TranscriptionEntry(BaseModel):
@@ -53,6 +59,8 @@ class TranscriptionSpeaker(BaseModel):
     name: str
     is_original: bool = True
     used_in_other_transcriptions: bool = False
+    # Entries in this transcription, including ones not loaded yet
+    entries_count: int = 0
 
 
 class TranscriptionEdit(BaseModel):
@@ -68,12 +76,18 @@ class TranscriptionDetailPageData(BaseModel):
     database_name: str
     transcription: TranscriptionSummary
     audio_url: str | None = None
+    # Precomputed peaks for the player's waveform, when they have been computed
+    peaks_url: str | None = None
+    # The first window of entries; fetch the rest from the entries API
     entries: list[TranscriptionEntry] = []
+    entries_next_cursor: str | None = None
     speakers: list[TranscriptionSpeaker] = []
     all_speakers: list[TranscriptionSpeaker] = []
     edits: list[TranscriptionEdit] = []
     collection: CollectionSummary | None = None
     all_collections: list[CollectionSummary] = []
+    # The change version this page reflects; pass it to the changes API as since
+    version: int = 0
 
 
 # /$db/-/scribe/new — form to submit a new audio URL for transcription
@@ -93,27 +107,168 @@ class CollectionDetailPageData(BaseModel):
     database_name: str
     collection: CollectionSummary
     transcriptions: list[TranscriptionSummary] = []
+    # The most recent uncollected transcriptions
     available_transcriptions: list[TranscriptionSummary] = []
+    available_next_cursor: str | None = None
     speakers: list[CollectionSpeakerStat] = []
 
 
+# /$db/-/scribe/search — full-text search across every transcription
+class SearchPageData(BaseModel):
+    database_name: str
+    collections: list[CollectionSummary] = []
+    # False while entries from before search was enabled are being indexed
+    index_ready: bool = True
+
+
+class SearchHit(BaseModel):
+    entry_id: int
+    transcription_id: int
+    transcription_title: str
+    start: float
+    end: float
+    speaker_id: str | None = None
+    # HTML-escaped entry text around the match, with matches in <mark>
+    snippet_html: str
+
+
+# GET /$db/-/api/scribe/search?q=&collection_id=&speaker=&limit=&offset=
+class SearchResponse(BaseModel):
+    ok: bool
+    hits: list[SearchHit] = []
+    has_more: bool = False
+    # False when too many entries match to rank them, so the newest come first
+    ranked: bool = True
+    index_ready: bool = True
+    error: str | None = None
+
+
 # POST /-/api/scribe/new — submit a new audio URL for transcription
 class NewTranscriptionRequest(BaseModel):
     database: str
     url: str | None = None
-    file_data: str | None = None  # base64-encoded audio
+    file_data: str | None = None  # base64-encoded audio; prefer the uploads API
     filename: str | None = None
     content_type: str | None = None
     collection_id: int | None = None
+    # Call the API even if this audio has been transcribed before
+    no_cache: bool = False
+
+
+# POST /-/api/scribe/uploads — start a resumable chunked audio upload.
+# Chunks are then POSTed as raw bytes to /-/api/scribe/uploads/$id/chunk with
+# an Upload-Offset header, and the upload is finished with .../finish.
+class StartUploadRequest(BaseModel):
+    database: str
+    filename: str
+    content_type: str | None = None
+    size: int
+
+
+class UploadResponse(BaseModel):
+    ok: bool
+    upload_id: str | None = None
+    offset: int = 0
+    size: int | None = None
+    chunk_size: int | None = None
+    error: str | None = None
+
+
+class FinishUploadRequest(BaseModel):
+    collection_id: int | None = None
+    no_cache: bool = False
 
 
 class NewTranscriptionResponse(BaseModel):
     ok: bool
     id: int | None = None
+    status: str | None = None
+    # True when the response cache completed the transcription immediately
+    cached: bool = False
     entries_count: int | None = None
     error: str | None = None
 
 
+# GET /$db/-/api/scribe/transcription/$id/status — poll a queued transcription
+class TranscriptionStatusResponse(BaseModel):
+    id: int
+    status: str
+    error: str | None = None
+    attempts: int = 0
+
+
+class ApiClientStats(BaseModel):
+    requests: int
+    retries: int
+    throttled: int
+    rate_limit_waits: int
+    rate_limit_wait_seconds: float
+    failures: int
+    upload_bytes: int = 0
+    upload_seconds: float = 0.0
+
+
+class ApiPreprocessStats(BaseModel):
+    files: int
+    unchanged: int
+    input_bytes: int
+    output_bytes: int
+    seconds: float
+    bytes_saved: int
+    # At the upload rate measured so far, less the time spent preprocessing
+    upload_seconds_saved: float | None = None
+
+
+# GET /-/api/scribe/status — job queue and transcription API client counters
+class ScribeStatusResponse(BaseModel):
+    queue_depth: int
+    api: ApiClientStats | None = None
+    preprocess: ApiPreprocessStats | None = None
+
+
+# GET /$db/-/api/scribe/transcription/$id/entries?cursor=&limit=&start_time=&end_time=
+# Entries in (start, id) order. Pass next_cursor back as cursor for the next
+# window; start_time and end_time limit it to entries starting in that range.
+class TranscriptionEntriesResponse(BaseModel):
+    ok: bool
+    entries: list[TranscriptionEntry] = []
+    next_cursor: str | None = None
+    error: str | None = None
+
+
+# GET /$db/-/api/scribe/transcription/$id/changes?since=
+# What changed after version since. The version is the id of the latest
+# edit-log row for this transcription, or for all of them, like a rename.
+class TranscriptionChangesResponse(BaseModel):
+    ok: bool
+    version: int = 0
+    # Oldest first. Combine, delete and rename change entries in bulk, so
+    # apply those from their detail to the entries already loaded
+    edits: list[TranscriptionEdit] = []
+    # The current state of every entry edited on its own
+    entries: list[TranscriptionEntry] = []
+    # The transcription's speakers, when an edit changed them
+    speakers: list[TranscriptionSpeaker] | None = None
+    # Too much changed to send: reload the page instead
+    reset: bool = False
+    error: str | None = None
+
+
+# GET /$db/-/api/scribe/transcriptions?collection_id=&cursor=&limit=
+# Transcriptions newest first, from one collection or, without
+# collection_id, the uncollected ones. Pass next_cursor back as cursor.
+class TranscriptionListResponse(BaseModel):
+    ok: bool
+    transcriptions: list[TranscriptionSummary] = []
+    next_cursor: str | None = None
+    error: str | None = None
+
+
+# POST /-/api/scribe/transcription/$id/retry — re-queue a failed transcription
+class RetryTranscriptionRequest(BaseModel):
+    database: str
+
+
 # Edit API request/response models
 class EditEntryRequest(BaseModel):
     database: str
@@ -147,6 +302,43 @@ class EditResponse(BaseModel):
     error: str | None = None
 
 
+# One operation in a batch edit. Which fields apply depends on op:
+#   edit_text: entry_id, text
+#   reassign_speaker: entry_id, speaker_id (a speaker name, "" to unassign)
+#   create_speaker: name
+#   combine_speakers: from_speaker, to_speaker
+#   delete_speaker: name
+class EditOperation(BaseModel):
+    op: str
+    entry_id: int | None = None
+    text: str | None = None
+    speaker_id: str | None = None
+    name: str | None = None
+    from_speaker: str | None = None
+    to_speaker: str | None = None
+
+
+# POST /-/api/scribe/transcription/$id/edits — apply many edits in one transaction
+class BatchEditRequest(BaseModel):
+    database: str
+    operations: list[EditOperation]
+
+
+class EditOperationResult(BaseModel):
+    ok: bool
+    affected_entries: int = 0
+    # The id of the speaker a create_speaker operation added
+    speaker_id: int | None = None
+    error: str | None = None
+
+
+# Either every operation was applied or, if one failed, none were
+class BatchEditResponse(BaseModel):
+    ok: bool
+    results: list[EditOperationResult] = []
+    error: str | None = None
+
+
 # Collection API request models
 class CreateCollectionRequest(BaseModel):
     database: str
@@ -170,4 +362,5 @@ __exports__ = [
     TranscriptionDetailPageData,
     NewTranscriptionPageData,
     CollectionDetailPageData,
+    SearchPageData,
 ]
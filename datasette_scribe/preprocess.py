@@ -0,0 +1,128 @@
+"""Shrink audio before it is uploaded for transcription.
+
+Speech recognition needs no more than 16 kHz mono, but uploads arrive as
+48 kHz stereo WAV or 192 kbps MP3, and for long recordings sending them is a
+large part of the time a transcription takes. ``compact_audio()`` has ffmpeg
+read the file from disk and stream back a downmixed, resampled encoding,
+which is all that is held in memory; files that are already smaller are
+sent as they are.
+
+``PreprocessStats`` counts the bytes in and out and the seconds spent in
+ffmpeg. With the upload rate the API client measures, that gives an
+estimate of the upload time saved.
+"""
+
+import contextlib
+import os
+import time
+from dataclasses import dataclass
+
+from . import ffmpeg
+
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_FORMAT = "mp3"
+DEFAULT_BITRATE = "32k"
+
+# ffmpeg arguments and the extension the API is told, per format
+FORMATS = {
+    "mp3": (("-c:a", "libmp3lame", "-f", "mp3"), ".mp3"),
+    "flac": (("-c:a", "flac", "-f", "flac"), ".flac"),
+}
+
+
+@dataclass
+class PreprocessOptions:
+    format: str = DEFAULT_FORMAT
+    sample_rate: int = DEFAULT_SAMPLE_RATE
+    bitrate: str = DEFAULT_BITRATE
+
+
+def preprocess_options(config) -> PreprocessOptions | None:
+    """From the ``preprocess`` plugin setting: on unless ``false``, or an
+    object of overrides. None when ffmpeg isn't installed."""
+    if config is False:
+        return None
+    try:
+        ffmpeg.require()
+    except ffmpeg.FFmpegError:
+        return None
+    config = config if isinstance(config, dict) else {}
+    fmt = config.get("format", DEFAULT_FORMAT)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown preprocess format: {fmt}")
+    return PreprocessOptions(
+        format=fmt,
+        sample_rate=int(config.get("sample_rate", DEFAULT_SAMPLE_RATE)),
+        bitrate=str(config.get("bitrate", DEFAULT_BITRATE)),
+    )
+
+
+@dataclass
+class PreprocessStats:
+    files: int = 0
+    # Files already no larger than their compact encoding, sent as they were
+    unchanged: int = 0
+    input_bytes: int = 0
+    # What was uploaded instead, including unchanged files
+    output_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.input_bytes - self.output_bytes
+
+    def upload_seconds_saved(
+        self, upload_bytes: int, upload_seconds: float
+    ) -> float | None:
+        """Upload time saved at the measured upload rate, less the time spent in ffmpeg."""
+        if not upload_bytes or not upload_seconds:
+            return None
+        return self.bytes_saved * upload_seconds / upload_bytes - self.seconds
+
+
+async def compact_audio(
+    path: str, filename: str | None, options: PreprocessOptions, stats: PreprocessStats
+) -> tuple[bytes, str] | None:
+    """The compact encoding of the file at ``path`` and a filename for it, or
+    None when the original is already as small."""
+    args, extension = FORMATS[options.format]
+    size = os.path.getsize(path)
+    start = time.monotonic()
+    chunks = []
+    total = 0
+    output = ffmpeg.stream(
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-loglevel",
+        "error",
+        "-i",
+        path,
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(options.sample_rate),
+        "-b:a",
+        options.bitrate,
+        *args,
+        "-",
+    )
+    # aclosing() stops ffmpeg straight away when the loop breaks
+    async with contextlib.aclosing(output):
+        async for chunk in output:
+            total += len(chunk)
+            if total >= size:
+                # No smaller than the original, so there's no point going on
+                break
+            chunks.append(chunk)
+    stats.seconds += time.monotonic() - start
+    stats.files += 1
+    stats.input_bytes += size
+    if total >= size:
+        stats.unchanged += 1
+        stats.output_bytes += size
+        return None
+    stats.output_bytes += total
+    stem = os.path.splitext(filename or "audio")[0]
+    return b"".join(chunks), stem + extension
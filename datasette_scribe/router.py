@@ -1,14 +1,23 @@
-from pathlib import Path
+import weakref
 from functools import wraps
 
-from datasette import Forbidden
+from datasette import Forbidden, Response
 from datasette_plugin_router import Router
 
+from .migrations import MIGRATIONS, applied_migrations, migrate
+from .mutations import EditError
+from .page_data import EditResponse
+from .search import search_index_ready, start_search_index
+
 router = Router()
 
 SCRIBE_ACCESS_NAME = "datasette_scribe_scribe"
 
-SCHEMA_SQL = (Path(__file__).parent / "schema.sql").read_text()
+PLUGIN_NAME = "datasette-scribe"
+
+# Databases whose schema is known to be current. Keyed on the Database object
+# itself, so a database that is attached again or replaced is checked afresh.
+_schema_ready: "weakref.WeakSet" = weakref.WeakSet()
 
 
 def check_permission():
@@ -29,6 +38,35 @@ def check_permission():
     return decorator
 
 
+def get_config(datasette) -> dict:
+    return datasette.plugin_config(PLUGIN_NAME) or {}
+
+
 async def ensure_schema(datasette, database: str):
+    """Bring the scribe tables up to date, checking each database only once.
+
+    The check runs on a read connection, so once a database has been migrated
+    read-only routes never queue anything on the write thread.
+    """
     db = datasette.get_database(database)
-    await db.execute_write_script(SCHEMA_SQL)
+    if db in _schema_ready:
+        return
+    applied = await db.execute_fn(applied_migrations)
+    if any(fn.__name__ not in applied for fn in MIGRATIONS):
+        await db.execute_write_fn(migrate)
+        # Entries from before the search index are indexed in the
+        # background; databases migrated before startup are resumed there
+        if not await db.execute_fn(search_index_ready):
+            start_search_index(db)
+    _schema_ready.add(db)
+
+
+async def run_edit(db, fn) -> Response:
+    """Run ``fn(conn)`` from ``mutations`` as one write transaction and respond with its outcome."""
+    try:
+        await db.execute_write_fn(fn)
+    except EditError as e:
+        return Response.json(
+            EditResponse(ok=False, error=e.message).model_dump(), status=e.status
+        )
+    return Response.json(EditResponse(ok=True).model_dump())
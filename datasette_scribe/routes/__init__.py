@@ -1,3 +1,19 @@
-from . import pages, api_transcriptions, api_speakers, api_collections
+from . import (
+    pages,
+    api_transcriptions,
+    api_uploads,
+    api_speakers,
+    api_collections,
+    api_search,
+    api_exports,
+)
 
-__all__ = ["pages", "api_transcriptions", "api_speakers", "api_collections"]
+__all__ = [
+    "pages",
+    "api_transcriptions",
+    "api_uploads",
+    "api_speakers",
+    "api_collections",
+    "api_search",
+    "api_exports",
+]
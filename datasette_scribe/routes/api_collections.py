@@ -1,15 +1,21 @@
 from typing import Annotated
 
-from datasette import Response
 from datasette_plugin_router import Body
 
+from ..mutations import (
+    add_to_collection,
+    create_collection,
+    delete_collection,
+    remove_from_collection,
+    update_collection,
+)
 from ..page_data import (
     CollectionTranscriptionRequest,
     CreateCollectionRequest,
     EditResponse,
     UpdateCollectionRequest,
 )
-from ..router import router, check_permission, ensure_schema
+from ..router import router, check_permission, ensure_schema, run_edit
 
 
 @router.POST("/-/api/scribe/collections/create$", output=EditResponse)
@@ -19,19 +25,9 @@ async def api_create_collection(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-
-    try:
-        await db.execute_write(
-            "insert into datasette_scribe_collections (name, description) values (?, ?)",
-            [body.name.strip(), body.description],
-        )
-    except Exception:
-        return Response.json(
-            EditResponse(ok=False, error="A collection with that name already exists").model_dump(),
-            status=400,
-        )
-
-    return Response.json(EditResponse(ok=True).model_dump())
+    return await run_edit(
+        db, lambda conn: create_collection(conn, body.name, body.description)
+    )
 
 
 @router.POST(
@@ -46,27 +42,12 @@ async def api_update_collection(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    cid = int(collection_id)
-
-    row = (await db.execute("select id from datasette_scribe_collections where id = ?", [cid])).first()
-    if row is None:
-        return Response.json(
-            EditResponse(ok=False, error="Collection not found").model_dump(),
-            status=404,
-        )
-
-    try:
-        await db.execute_write(
-            "update datasette_scribe_collections set name = ?, description = ? where id = ?",
-            [body.name.strip(), body.description, cid],
-        )
-    except Exception:
-        return Response.json(
-            EditResponse(ok=False, error="A collection with that name already exists").model_dump(),
-            status=400,
-        )
-
-    return Response.json(EditResponse(ok=True).model_dump())
+    return await run_edit(
+        db,
+        lambda conn: update_collection(
+            conn, int(collection_id), body.name, body.description
+        ),
+    )
 
 
 @router.POST(
@@ -81,17 +62,7 @@ async def api_delete_collection(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    cid = int(collection_id)
-
-    row = (await db.execute("select id from datasette_scribe_collections where id = ?", [cid])).first()
-    if row is None:
-        return Response.json(
-            EditResponse(ok=False, error="Collection not found").model_dump(),
-            status=404,
-        )
-
-    await db.execute_write("delete from datasette_scribe_collections where id = ?", [cid])
-    return Response.json(EditResponse(ok=True).model_dump())
+    return await run_edit(db, lambda conn: delete_collection(conn, int(collection_id)))
 
 
 @router.POST(
@@ -107,29 +78,10 @@ async def api_add_transcription_to_collection(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    cid = int(collection_id)
-
-    row = (await db.execute("select id from datasette_scribe_collections where id = ?", [cid])).first()
-    if row is None:
-        return Response.json(
-            EditResponse(ok=False, error="Collection not found").model_dump(),
-            status=404,
-        )
-
-    try:
-        await db.execute_write(
-            "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (?, ?)",
-            [cid, body.transcription_id],
-        )
-    except Exception:
-        return Response.json(
-            EditResponse(
-                ok=False, error="Transcription is already in a collection"
-            ).model_dump(),
-            status=400,
-        )
-
-    return Response.json(EditResponse(ok=True).model_dump())
+    return await run_edit(
+        db,
+        lambda conn: add_to_collection(conn, int(collection_id), body.transcription_id),
+    )
 
 
 @router.POST(
@@ -145,11 +97,9 @@ async def api_remove_transcription_from_collection(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    cid = int(collection_id)
-
-    await db.execute_write(
-        "delete from datasette_scribe_collection_transcriptions where collection_id = ? and transcription_id = ?",
-        [cid, body.transcription_id],
+    return await run_edit(
+        db,
+        lambda conn: remove_from_collection(
+            conn, int(collection_id), body.transcription_id
+        ),
     )
-
-    return Response.json(EditResponse(ok=True).model_dump())
@@ -0,0 +1,93 @@
+from datasette import Response
+
+from ..export import (
+    FORMATS,
+    collection_transcription_ids,
+    export_filename,
+    export_transcription,
+    export_transcriptions,
+    export_zip,
+    transcription_title,
+)
+from ..router import router, check_permission, ensure_schema
+from ..streaming import ChunkedResponse
+
+
+def export_options(request) -> tuple[str, bool]:
+    """The format and whether to export the original text and speakers. Raises ValueError."""
+    fmt = request.args.get("format") or "txt"
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return fmt, request.args.get("original") in ("1", "true")
+
+
+def attachment(filename: str) -> dict:
+    return {"content-disposition": f'attachment; filename="{filename}"'}
+
+
+# GET /$db/-/api/scribe/transcription/$id/export?format=srt|vtt|jsonl|txt&original=1
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/transcription/(?P<transcription_id>\\d+)/export$"
+)
+@check_permission()
+async def api_export_transcription(
+    datasette, request, database: str, transcription_id: str
+):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+    tid = int(transcription_id)
+    try:
+        fmt, original = export_options(request)
+    except ValueError as e:
+        return Response.text(str(e), status=400)
+
+    async def query(sql, params):
+        return (await db.execute(sql, params)).rows
+
+    title = await transcription_title(query, tid)
+    if title is None:
+        return Response.text("Transcription not found", status=404)
+    return ChunkedResponse(
+        export_transcription(query, tid, fmt, original=original),
+        headers=attachment(export_filename(tid, title, fmt)),
+        content_type=FORMATS[fmt].content_type,
+    )
+
+
+# GET /$db/-/api/scribe/collections/$id/export?format=srt|vtt|jsonl|txt&original=1
+# SubRip and WebVTT come as a zip of one file per transcription
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/collections/(?P<collection_id>\\d+)/export$"
+)
+@check_permission()
+async def api_export_collection(datasette, request, database: str, collection_id: str):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+    cid = int(collection_id)
+    try:
+        fmt, original = export_options(request)
+    except ValueError as e:
+        return Response.text(str(e), status=400)
+
+    async def query(sql, params):
+        return (await db.execute(sql, params)).rows
+
+    exists = (
+        await db.execute(
+            "select 1 from datasette_scribe_collections where id = ?", [cid]
+        )
+    ).first()
+    if exists is None:
+        return Response.text("Collection not found", status=404)
+    transcription_ids = collection_transcription_ids(query, cid)
+    if FORMATS[fmt].per_file:
+        return ChunkedResponse(
+            export_zip(query, transcription_ids, fmt, original=original),
+            headers=attachment(f"collection-{cid}-{fmt}.zip"),
+            content_type="application/zip",
+        )
+    return ChunkedResponse(
+        export_transcriptions(query, transcription_ids, fmt, original=original),
+        headers=attachment(f"collection-{cid}{FORMATS[fmt].extension}"),
+        content_type=FORMATS[fmt].content_type,
+    )
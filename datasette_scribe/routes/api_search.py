@@ -0,0 +1,96 @@
+from typing import TypeVar
+
+from datasette import Response
+from datasette.database import QueryInterrupted
+
+from ..page_data import SearchHit, SearchResponse
+from ..router import router, check_permission, ensure_schema
+from ..search import (
+    DEFAULT_SEARCH_LIMIT,
+    MAX_RANKED_MATCHES,
+    MAX_SEARCH_LIMIT,
+    fts_query,
+    match_count_sql,
+    search_index_ready,
+    search_sql,
+    snippet_html,
+)
+
+T = TypeVar("T", int, None)
+
+
+def _int_arg(request, name: str, default: T) -> int | T:
+    value = request.args.get(name)
+    if not value:
+        return default
+    return int(value)
+
+
+@router.GET("/(?P<database>[^/]+)/-/api/scribe/search$", output=SearchResponse)
+@check_permission()
+async def api_search(datasette, request, database: str):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+
+    try:
+        collection_id = _int_arg(request, "collection_id", None)
+        limit = min(
+            max(_int_arg(request, "limit", DEFAULT_SEARCH_LIMIT), 1), MAX_SEARCH_LIMIT
+        )
+        offset = max(_int_arg(request, "offset", 0), 0)
+    except ValueError:
+        return Response.json(
+            SearchResponse(
+                ok=False, error="collection_id, limit and offset must be integers"
+            ).model_dump(),
+            status=400,
+        )
+
+    index_ready = await db.execute_fn(search_index_ready)
+    match = fts_query(request.args.get("q", ""))
+    if match is None:
+        return Response.json(
+            SearchResponse(ok=True, index_ready=index_ready).model_dump()
+        )
+
+    try:
+        match_count = (await db.execute(*match_count_sql(match))).single_value()
+        ranked = match_count <= MAX_RANKED_MATCHES
+        sql, params = search_sql(
+            match,
+            collection_id=collection_id,
+            speaker=request.args.get("speaker") or None,
+            ranked=ranked,
+            limit=limit,
+            offset=offset,
+        )
+        rows = (await db.execute(sql, params)).rows
+    except QueryInterrupted:
+        return Response.json(
+            SearchResponse(
+                ok=False, error="Search took too long; try more specific terms"
+            ).model_dump(),
+            status=400,
+        )
+
+    hits = [
+        SearchHit(
+            entry_id=row["entry_id"],
+            transcription_id=row["transcription_id"],
+            transcription_title=row["transcription_title"],
+            start=row["start"],
+            end=row["end"],
+            speaker_id=row["speaker_id"],
+            snippet_html=snippet_html(row["snippet"]),
+        )
+        for row in rows[:limit]
+    ]
+    return Response.json(
+        SearchResponse(
+            ok=True,
+            hits=hits,
+            has_more=len(rows) > limit,
+            ranked=ranked,
+            index_ready=index_ready,
+        ).model_dump()
+    )
@@ -1,17 +1,17 @@
-import json
 from typing import Annotated
 
-from datasette import Response
 from datasette_plugin_router import Body
 
+from ..mutations import apply_edits, rename_speaker
 from ..page_data import (
     CombineSpeakersRequest,
     CreateSpeakerRequest,
     DeleteSpeakerRequest,
+    EditOperation,
     EditResponse,
     RenameSpeakerRequest,
 )
-from ..router import router, check_permission, ensure_schema
+from ..router import router, check_permission, ensure_schema, run_edit
 
 
 @router.POST(
@@ -27,27 +27,11 @@ async def api_create_speaker(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    tid = int(transcription_id)
-
-    try:
-        await db.execute_write(
-            "insert into datasette_scribe_speakers (name, is_original) values (?, 0)",
-            [body.name],
-        )
-    except Exception:
-        return Response.json(
-            EditResponse(ok=False, error="Speaker already exists").model_dump(),
-            status=400,
-        )
-
-    await db.execute_write(
-        "insert into datasette_scribe_transcription_edits (transcription_id, entry_id, operation, detail, created_at)"
-        " values (?, null, ?, ?, datetime('now', 'subsec'))",
-        [tid, "create_speaker", json.dumps({"name": body.name})],
+    operation = EditOperation(op="create_speaker", name=body.name)
+    return await run_edit(
+        db, lambda conn: apply_edits(conn, int(transcription_id), [operation])
     )
 
-    return Response.json(EditResponse(ok=True).model_dump())
-
 
 @router.POST(
     "/-/api/scribe/transcription/(?P<transcription_id>\\d+)/speakers/combine$",
@@ -62,54 +46,15 @@ async def api_combine_speakers(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    tid = int(transcription_id)
-
-    count_row = (
-        await db.execute(
-            "select count(*) as cnt from datasette_scribe_transcription_entries"
-            " where transcription_id = ? and speaker_id = ?",
-            [tid, body.from_speaker],
-        )
-    ).first()
-    affected = count_row["cnt"] if count_row else 0
-
-    await db.execute_write(
-        "update datasette_scribe_transcription_entries set speaker_id = ?"
-        " where transcription_id = ? and speaker_id = ?",
-        [body.to_speaker, tid, body.from_speaker],
+    operation = EditOperation(
+        op="combine_speakers",
+        from_speaker=body.from_speaker,
+        to_speaker=body.to_speaker,
     )
-
-    # Clean up from global speakers table if no entries remain globally
-    global_count_row = (
-        await db.execute(
-            "select count(*) as cnt from datasette_scribe_transcription_entries where speaker_id = ?",
-            [body.from_speaker],
-        )
-    ).first()
-    if global_count_row and global_count_row["cnt"] == 0:
-        await db.execute_write(
-            "delete from datasette_scribe_speakers where name = ?",
-            [body.from_speaker],
-        )
-
-    await db.execute_write(
-        "insert into datasette_scribe_transcription_edits (transcription_id, entry_id, operation, detail, created_at)"
-        " values (?, null, ?, ?, datetime('now', 'subsec'))",
-        [
-            tid,
-            "combine_speakers",
-            json.dumps(
-                {
-                    "from": body.from_speaker,
-                    "to": body.to_speaker,
-                    "affected_entries": affected,
-                }
-            ),
-        ],
+    return await run_edit(
+        db, lambda conn: apply_edits(conn, int(transcription_id), [operation])
     )
 
-    return Response.json(EditResponse(ok=True).model_dump())
-
 
 @router.POST(
     "/-/api/scribe/transcription/(?P<transcription_id>\\d+)/speakers/delete$",
@@ -124,63 +69,11 @@ async def api_delete_speaker(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    tid = int(transcription_id)
-
-    # Check if speaker is used in other transcriptions
-    used_row = (
-        await db.execute(
-            "select exists("
-            " select 1 from datasette_scribe_transcription_entries"
-            " where speaker_id = ? and transcription_id != ?"
-            ") as used_elsewhere",
-            [body.speaker_name, tid],
-        )
-    ).first()
-    if used_row and used_row["used_elsewhere"]:
-        return Response.json(
-            EditResponse(
-                ok=False,
-                error="Speaker is used in other transcriptions. Use unassign instead.",
-            ).model_dump(),
-            status=400,
-        )
-
-    count_row = (
-        await db.execute(
-            "select count(*) as cnt from datasette_scribe_transcription_entries"
-            " where transcription_id = ? and speaker_id = ?",
-            [tid, body.speaker_name],
-        )
-    ).first()
-    affected = count_row["cnt"] if count_row else 0
-
-    await db.execute_write(
-        "update datasette_scribe_transcription_entries set speaker_id = null"
-        " where transcription_id = ? and speaker_id = ?",
-        [tid, body.speaker_name],
-    )
-    await db.execute_write(
-        "delete from datasette_scribe_speakers where name = ?",
-        [body.speaker_name],
+    operation = EditOperation(op="delete_speaker", name=body.speaker_name)
+    return await run_edit(
+        db, lambda conn: apply_edits(conn, int(transcription_id), [operation])
     )
 
-    await db.execute_write(
-        "insert into datasette_scribe_transcription_edits (transcription_id, entry_id, operation, detail, created_at)"
-        " values (?, null, ?, ?, datetime('now', 'subsec'))",
-        [
-            tid,
-            "delete_speaker",
-            json.dumps(
-                {
-                    "name": body.speaker_name,
-                    "affected_entries": affected,
-                }
-            ),
-        ],
-    )
-
-    return Response.json(EditResponse(ok=True).model_dump())
-
 
 @router.POST(
     "/-/api/scribe/speakers/(?P<speaker_id>\\d+)/rename$",
@@ -195,55 +88,6 @@ async def api_rename_speaker(
 ):
     await ensure_schema(datasette, body.database)
     db = datasette.get_database(body.database)
-    sid = int(speaker_id)
-
-    # Get current speaker name
-    row = (await db.execute("select name from datasette_scribe_speakers where id = ?", [sid])).first()
-    if row is None:
-        return Response.json(
-            EditResponse(ok=False, error="Speaker not found").model_dump(), status=404
-        )
-
-    old_name = row["name"]
-    new_name = body.new_name.strip()
-    if not new_name:
-        return Response.json(
-            EditResponse(ok=False, error="Name cannot be empty").model_dump(),
-            status=400,
-        )
-
-    if old_name == new_name:
-        return Response.json(EditResponse(ok=True).model_dump())
-
-    # Check if new name already exists
-    existing = (
-        await db.execute("select id from datasette_scribe_speakers where name = ?", [new_name])
-    ).first()
-    if existing:
-        return Response.json(
-            EditResponse(
-                ok=False, error="A speaker with that name already exists"
-            ).model_dump(),
-            status=400,
-        )
-
-    # Update the speaker name
-    await db.execute_write("update datasette_scribe_speakers set name = ? where id = ?", [new_name, sid])
-
-    # Update all entries referencing old name (global, does NOT update original_speaker_id)
-    await db.execute_write(
-        "update datasette_scribe_transcription_entries set speaker_id = ? where speaker_id = ?",
-        [new_name, old_name],
+    return await run_edit(
+        db, lambda conn: rename_speaker(conn, int(speaker_id), body.new_name)
     )
-
-    # Log the rename edit
-    await db.execute_write(
-        "insert into datasette_scribe_transcription_edits (transcription_id, entry_id, operation, detail, created_at)"
-        " values (null, null, ?, ?, datetime('now', 'subsec'))",
-        [
-            "rename_speaker",
-            json.dumps({"old_name": old_name, "new_name": new_name}),
-        ],
-    )
-
-    return Response.json(EditResponse(ok=True).model_dump())
@@ -1,18 +1,79 @@
+import asyncio
 import base64
+import dataclasses
 import json
 from typing import Annotated
 
 from datasette import Response
 from datasette_plugin_router import Body
 
+from ..cache import audio_sha256, cache_get
+from ..ffmpeg import is_url
+from ..ingest import insert_transcription, store_response
+from ..jobs import TRANSCRIPTION_STATUS, get_job_queue
+from ..metrics import QUEUE_DEPTH, count_audio_bytes, render as render_metrics
+from ..mutations import EditError, apply_edits, edit_entry
 from ..page_data import (
+    ApiClientStats,
+    ApiPreprocessStats,
+    BatchEditRequest,
+    BatchEditResponse,
+    EditOperationResult,
     EditEntryRequest,
     EditResponse,
     NewTranscriptionRequest,
     NewTranscriptionResponse,
+    RetryTranscriptionRequest,
+    ScribeStatusResponse,
+    TranscriptionChangesResponse,
+    TranscriptionEdit,
+    TranscriptionEntriesResponse,
+    TranscriptionEntry,
+    TranscriptionListResponse,
+    TranscriptionSpeaker,
+    TranscriptionStatusResponse,
+    TranscriptionSummary,
+)
+from ..router import router, check_permission, ensure_schema, run_edit
+from ..storage import get_audio_store
+from ..streaming import BlobTooLarge, blob_reader, range_response
+from ..transcode import DATABASE_STORAGE
+from ..voxtral_api import DEFAULT_MODEL
+from ..waveform import CONTENT_TYPE as WAVEFORM_CONTENT_TYPE, waveform_version
+
+# Entries per window: the detail page embeds the first, the client fetches the rest
+ENTRIES_WINDOW = 300
+MAX_ENTRIES_WINDOW = 2000
+TRANSCRIPTIONS_PAGE = 50
+MAX_TRANSCRIPTIONS_PAGE = 500
+# Larger files go through the resumable uploads API, which streams them to disk
+MAX_FILE_DATA_SIZE = 25 * 1024 * 1024
+# More edits than this since a client's version and it reloads instead
+MAX_CHANGES = 1000
+# Edits that change the transcription's speakers or their entry counts
+SPEAKER_OPERATIONS = {
+    "reassign_speaker",
+    "create_speaker",
+    "combine_speakers",
+    "delete_speaker",
+    "rename_speaker",
+}
+
+ENTRY_SELECT = (
+    "select e.id, e.start, e.end, s.name as speaker_id, e.text, e.original_speaker_id, e.original_text"
+    " from datasette_scribe_transcription_entries e"
+    " left join datasette_scribe_speakers s on s.id = e.speaker_ref"
+)
+
+TRANSCRIPTION_SELECT = (
+    "select t.id, t.url, t.input_type, t.filename, t.model, t.granularity, t.submitted_at,"
+    " t.completed_at, t.error, " + TRANSCRIPTION_STATUS + " as status,"
+    " coalesce(st.entries_count, 0) as entries_count, st.duration,"
+    " coalesce(st.speakers_count, 0) as speakers_count"
+    " from datasette_scribe_transcriptions t"
+    # Transcriptions without entries yet have no stats row
+    " left join datasette_scribe_transcription_stats st on st.transcription_id = t.id"
 )
-from ..router import router, check_permission, ensure_schema
-from ..voxtral_api import transcribe
 
 
 @router.POST("/-/api/scribe/new$", output=NewTranscriptionResponse)
@@ -35,184 +96,729 @@ async def api_new_transcription(
             status=400,
         )
 
-    await ensure_schema(datasette, body.database)
-    db = datasette.get_database(body.database)
+    if body.url and not is_url(body.url):
+        return Response.json(
+            NewTranscriptionResponse(
+                ok=False, error="url must be an http:// or https:// URL"
+            ).model_dump(),
+            status=400,
+        )
+    # Four base64 characters per three bytes, checked before decoding any of it
+    if body.file_data and len(body.file_data) // 4 * 3 > MAX_FILE_DATA_SIZE:
+        return Response.json(
+            NewTranscriptionResponse(
+                ok=False,
+                error=f"file_data is larger than {MAX_FILE_DATA_SIZE // (1024 * 1024)} MB;"
+                " use the uploads API for large files",
+            ).model_dump(),
+            status=413,
+        )
 
-    model = "voxtral-mini-2602"
-    granularity = "segment"
+    await ensure_schema(datasette, body.database)
 
+    input_type = "url"
+    file_bytes = None
+    filename = None
+    content_type = None
+    audio = None
+    sha256 = None
     if body.file_data:
         input_type = "file"
         file_bytes = base64.b64decode(body.file_data)
         filename = body.filename or "audio.mp3"
         content_type = body.content_type or "audio/mpeg"
+        store = get_audio_store(datasette)
+        if store is not None:
+            audio = await asyncio.to_thread(store.put, file_bytes, content_type)
+            sha256 = audio.sha256
+            file_bytes = None
+        else:
+            sha256 = audio_sha256(file_bytes)
+
+    transcription_id, status = await queue_transcription(
+        datasette,
+        body.database,
+        url=body.url,
+        input_type=input_type,
+        filename=filename,
+        content_type=content_type,
+        collection_id=body.collection_id,
+        file_bytes=file_bytes,
+        audio=audio,
+        sha256=sha256,
+        use_cache=not body.no_cache,
+    )
+    return Response.json(
+        NewTranscriptionResponse(
+            ok=True, id=transcription_id, status=status, cached=status == "completed"
+        ).model_dump()
+    )
+
+
+async def queue_transcription(
+    datasette,
+    database: str,
+    *,
+    url: str | None,
+    input_type: str,
+    filename: str | None,
+    content_type: str | None,
+    collection_id: int | None,
+    file_bytes: bytes | None = None,
+    audio=None,
+    audio_path=None,
+    sha256: str | None = None,
+    use_cache: bool = True,
+) -> tuple[int, str]:
+    """Insert a transcription with its job in one transaction and queue it.
+
+    When the response cache already has this audio (``sha256``) the
+    transcription is completed on the spot instead, and only the steps
+    that follow transcription are left to the queue. Returns the
+    transcription ID and its status.
+    """
+    db = datasette.get_database(database)
+    queue = get_job_queue(datasette)
+    model = DEFAULT_MODEL
+    granularity = "segment"
+
+    def create(conn):
+        cached = None
+        if sha256 and use_cache and queue.cache.enabled:
+            cached = cache_get(conn, sha256, model=model, granularity=granularity)
+        transcription_id = insert_transcription(
+            conn,
+            url=url,
+            input_type=input_type,
+            filename=filename,
+            model=model,
+            granularity=granularity,
+            file_bytes=file_bytes,
+            content_type=content_type,
+            audio=audio,
+            audio_path=audio_path,
+            audio_sha256=sha256,
+        )
+        if collection_id is not None:
+            conn.execute(
+                "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (?, ?)",
+                [collection_id, transcription_id],
+            )
+        if cached is not None:
+            store_response(conn, transcription_id, cached)
+            conn.execute(
+                "insert into datasette_scribe_jobs (transcription_id, status, max_attempts, finished_at)"
+                " values (?, 'completed', ?, datetime('now', 'subsec'))",
+                [transcription_id, queue.max_attempts],
+            )
+            return transcription_id, None
+        job_id = conn.execute(
+            "insert into datasette_scribe_jobs (transcription_id, max_attempts, use_cache) values (?, ?, ?)",
+            [transcription_id, queue.max_attempts, int(use_cache)],
+        ).lastrowid
+        return transcription_id, job_id
+
+    transcription_id, job_id = await db.execute_write_fn(create)
+    if job_id is None:
+        # Waveform peaks and the playback copy still need making
+        queue.finish_cached(database, transcription_id)
+        return transcription_id, "completed"
+    queue.submit(database, job_id)
+    return transcription_id, "queued"
+
+
+@router.GET("/-/api/scribe/status$", output=ScribeStatusResponse)
+@check_permission()
+async def api_scribe_status(datasette, request):
+    queue = get_job_queue(datasette)
+    client = queue.client
+    preprocess = None
+    if queue.preprocess is not None:
+        stats = queue.preprocess_stats
+        preprocess = ApiPreprocessStats(
+            **dataclasses.asdict(stats),
+            bytes_saved=stats.bytes_saved,
+            upload_seconds_saved=stats.upload_seconds_saved(
+                client.stats.upload_bytes, client.stats.upload_seconds
+            )
+            if client
+            else None,
+        )
+    return Response.json(
+        ScribeStatusResponse(
+            queue_depth=queue.depth(),
+            api=ApiClientStats(**dataclasses.asdict(client.stats)) if client else None,
+            preprocess=preprocess,
+        ).model_dump()
+    )
+
+
+@router.GET("/-/api/scribe/metrics$")
+@check_permission()
+async def api_scribe_metrics(datasette, request):
+    """Counters and histograms for this process in the Prometheus text format."""
+    QUEUE_DEPTH.set(get_job_queue(datasette).depth())
+    return Response(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/transcription/(?P<transcription_id>\\d+)/status$",
+    output=TranscriptionStatusResponse,
+)
+@check_permission()
+async def api_transcription_status(
+    datasette, request, database: str, transcription_id: str
+):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+    row = (
+        await db.execute(
+            "select t.id, " + TRANSCRIPTION_STATUS + " as status, t.error,"
+            " coalesce((select j.attempts from datasette_scribe_jobs j where j.transcription_id = t.id), 0) as attempts"
+            " from datasette_scribe_transcriptions t where t.id = ?",
+            [int(transcription_id)],
+        )
+    ).first()
+    if row is None:
+        return Response.text("Transcription not found", status=404)
+    return Response.json(TranscriptionStatusResponse(**dict(row)).model_dump())
+
+
+async def transcriptions_page(
+    db,
+    *,
+    collection_id: int | None,
+    cursor: str | None = None,
+    limit: int = TRANSCRIPTIONS_PAGE,
+) -> tuple[list[TranscriptionSummary], str | None]:
+    """Transcriptions newest first, and the cursor for the next page.
+
+    ``collection_id=None`` lists the transcriptions not in any collection.
+    """
+    if collection_id is None:
+        where = [
+            "not exists (select 1 from datasette_scribe_collection_transcriptions ct"
+            " where ct.transcription_id = t.id)"
+        ]
+        params: list = []
     else:
-        input_type = "url"
-        file_bytes = None
-        filename = None
-        content_type = None
-
-    result = await db.execute_write(
-        """
-        insert into datasette_scribe_transcriptions (url, input_type, filename, model, granularity, submitted_at)
-        values (?, ?, ?, ?, ?, datetime('now', 'subsec'))
-        """,
-        [body.url, input_type, filename, model, granularity],
+        where = [
+            "t.id in (select transcription_id from datasette_scribe_collection_transcriptions"
+            " where collection_id = ?)"
+        ]
+        params = [collection_id]
+    if cursor is not None:
+        where.append("t.id < ?")
+        params.append(int(cursor))
+    rows = (
+        await db.execute(
+            TRANSCRIPTION_SELECT
+            + " where "
+            + " and ".join(where)
+            + " order by t.id desc limit ?",
+            [*params, limit + 1],
+        )
+    ).rows
+    transcriptions = [TranscriptionSummary(**dict(r)) for r in rows[:limit]]
+    next_cursor = str(transcriptions[-1].id) if len(rows) > limit else None
+    return transcriptions, next_cursor
+
+
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/transcriptions$",
+    output=TranscriptionListResponse,
+)
+@check_permission()
+async def api_transcriptions(datasette, request, database: str):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+    try:
+        collection_id = request.args.get("collection_id")
+        limit = int(request.args.get("limit") or TRANSCRIPTIONS_PAGE)
+        transcriptions, next_cursor = await transcriptions_page(
+            db,
+            collection_id=int(collection_id) if collection_id else None,
+            cursor=request.args.get("cursor") or None,
+            limit=min(max(limit, 1), MAX_TRANSCRIPTIONS_PAGE),
+        )
+    except ValueError:
+        return Response.json(
+            TranscriptionListResponse(
+                ok=False, error="collection_id, cursor and limit must be integers"
+            ).model_dump(),
+            status=400,
+        )
+    return Response.json(
+        TranscriptionListResponse(
+            ok=True, transcriptions=transcriptions, next_cursor=next_cursor
+        ).model_dump()
     )
-    transcription_id = result.lastrowid
 
-    if file_bytes is not None:
-        await db.execute_write(
-            "insert into datasette_scribe_audio_blobs (transcription_id, data, content_type) values (?, ?, ?)",
-            [transcription_id, file_bytes, content_type],
+
+def encode_entries_cursor(start: float, entry_id: int) -> str:
+    # repr() round-trips the float exactly
+    return f"{start!r}:{entry_id}"
+
+
+def decode_entries_cursor(cursor: str) -> tuple[float, int]:
+    start, _, entry_id = cursor.rpartition(":")
+    return float(start), int(entry_id)
+
+
+async def entries_window(
+    db,
+    transcription_id: int,
+    *,
+    cursor: str | None = None,
+    limit: int = ENTRIES_WINDOW,
+    start_time: float | None = None,
+    end_time: float | None = None,
+) -> tuple[list[TranscriptionEntry], str | None]:
+    """One window of entries in (start, id) order, and the cursor for the next.
+
+    ``start_time`` and ``end_time`` keep to entries starting in that range.
+    """
+    where = ["e.transcription_id = ?"]
+    params: list = [transcription_id]
+    if cursor is not None:
+        after_start, after_id = decode_entries_cursor(cursor)
+        # Spelled out rather than as a row value, so the start range can use
+        # the (transcription_id, start, ...) index
+        where.append("e.start >= ? and (e.start > ? or e.id > ?)")
+        params.extend([after_start, after_start, after_id])
+    if start_time is not None:
+        where.append("e.start >= ?")
+        params.append(start_time)
+    if end_time is not None:
+        where.append("e.start < ?")
+        params.append(end_time)
+    rows = (
+        await db.execute(
+            ENTRY_SELECT
+            + " where "
+            + " and ".join(where)
+            + " order by e.start, e.id limit ?",
+            [*params, limit + 1],
         )
+    ).rows
+    entries = [TranscriptionEntry(**dict(r)) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_entries_cursor(entries[-1].start, entries[-1].id)
+    return entries, next_cursor
+
 
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/transcription/(?P<transcription_id>\\d+)/entries$",
+    output=TranscriptionEntriesResponse,
+)
+@check_permission()
+async def api_transcription_entries(
+    datasette, request, database: str, transcription_id: str
+):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
     try:
-        if file_bytes is not None:
-            response = await transcribe(file_data=file_bytes, filename=filename)
-        else:
-            response = await transcribe(body.url)
-    except Exception as e:
-        error_msg = str(e)
-        await db.execute_write(
-            "update datasette_scribe_transcriptions set error = ? where id = ?",
-            [error_msg, transcription_id],
+        limit = int(request.args.get("limit") or ENTRIES_WINDOW)
+        start_time = request.args.get("start_time")
+        end_time = request.args.get("end_time")
+        entries, next_cursor = await entries_window(
+            db,
+            int(transcription_id),
+            cursor=request.args.get("cursor") or None,
+            limit=min(max(limit, 1), MAX_ENTRIES_WINDOW),
+            start_time=float(start_time) if start_time else None,
+            end_time=float(end_time) if end_time else None,
         )
+    except ValueError:
         return Response.json(
-            NewTranscriptionResponse(
-                ok=False, id=transcription_id, error=error_msg
+            TranscriptionEntriesResponse(
+                ok=False, error="Invalid cursor, limit, start_time or end_time"
             ).model_dump(),
-            status=502,
+            status=400,
         )
+    return Response.json(
+        TranscriptionEntriesResponse(
+            ok=True, entries=entries, next_cursor=next_cursor
+        ).model_dump()
+    )
 
-    usage_json = response.usage.model_dump_json() if response.usage else None
 
-    await db.execute_write(
-        """
-        update datasette_scribe_transcriptions set completed_at = datetime('now', 'subsec'), usage = ?
-        where id = ?
-        """,
-        [usage_json, transcription_id],
+async def transcription_speakers(
+    db, transcription_id: int
+) -> list[TranscriptionSpeaker]:
+    rows = await db.execute(
+        "select s.id, s.name, s.is_original, u.entries_count,"
+        " exists("
+        "  select 1 from datasette_scribe_speaker_usage other"
+        "  where other.speaker_ref = s.id and other.transcription_id != u.transcription_id"
+        " ) as used_elsewhere"
+        " from datasette_scribe_speaker_usage u"
+        " join datasette_scribe_speakers s on s.id = u.speaker_ref"
+        " where u.transcription_id = ?"
+        " order by s.name",
+        [transcription_id],
     )
+    return [
+        TranscriptionSpeaker(
+            id=r["id"],
+            name=r["name"],
+            is_original=bool(r["is_original"]),
+            used_in_other_transcriptions=bool(r["used_elsewhere"]),
+            entries_count=r["entries_count"],
+        )
+        for r in rows.rows
+    ]
 
-    seen_speakers: set[str] = set()
-    for segment in response.segments:
-        # Prefix speaker IDs to keep them unique per transcription — the model
-        # reuses generic names like "Speaker 1" across different audio files.
-        # original_speaker_id preserves the raw value from the model.
-        scoped_speaker = (
-            f"t{transcription_id}_{segment.speaker_id}"
-            if segment.speaker_id
-            else None
-        )
-        await db.execute_write(
-            """
-            insert into datasette_scribe_transcription_entries
-                (transcription_id, start, end, speaker_id, text, original_text, original_speaker_id)
-            values (?, ?, ?, ?, ?, ?, ?)
-            """,
-            [
-                transcription_id,
-                segment.start,
-                segment.end,
-                scoped_speaker,
-                segment.text,
-                segment.text,
-                segment.speaker_id,
-            ],
+
+async def transcription_version(db, transcription_id: int) -> int:
+    """The id of the latest edit to this transcription, or to every transcription."""
+    # Two lookups rather than an or, so each is one seek on the index
+    return (
+        await db.execute(
+            "select coalesce(max(version), 0) from ("
+            " select max(id) as version from datasette_scribe_transcription_edits where transcription_id = ?"
+            " union all"
+            " select max(id) from datasette_scribe_transcription_edits where transcription_id is null"
+            ")",
+            [transcription_id],
         )
-        if scoped_speaker and scoped_speaker not in seen_speakers:
-            seen_speakers.add(scoped_speaker)
-            await db.execute_write(
-                "insert or ignore into datasette_scribe_speakers (name, is_original) values (?, 1)",
-                [scoped_speaker],
-            )
+    ).single_value()
+
 
-    if body.collection_id is not None:
-        await db.execute_write(
-            "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (?, ?)",
-            [body.collection_id, transcription_id],
+async def transcription_changes(
+    db, transcription_id: int, since: int
+) -> TranscriptionChangesResponse:
+    edit_rows = (
+        await db.execute(
+            "select id, operation, detail, created_at, entry_id from ("
+            " select * from datasette_scribe_transcription_edits where transcription_id = ? and id > ?"
+            " union all"
+            " select * from datasette_scribe_transcription_edits where transcription_id is null and id > ?"
+            ") order by id limit ?",
+            [transcription_id, since, since, MAX_CHANGES + 1],
+        )
+    ).rows
+    if len(edit_rows) > MAX_CHANGES:
+        return TranscriptionChangesResponse(
+            ok=True,
+            version=await transcription_version(db, transcription_id),
+            reset=True,
         )
+    edits = [TranscriptionEdit(**dict(r)) for r in edit_rows]
+    if not edits:
+        return TranscriptionChangesResponse(ok=True, version=since)
 
-    return Response.json(
-        NewTranscriptionResponse(
-            ok=True, id=transcription_id, entries_count=len(response.segments)
-        ).model_dump()
+    entry_ids = sorted({e.entry_id for e in edits if e.entry_id is not None})
+    entries = []
+    if entry_ids:
+        rows = await db.execute(
+            ENTRY_SELECT
+            + " where e.id in (select value from json_each(?)) and e.transcription_id = ?",
+            [json.dumps(entry_ids), transcription_id],
+        )
+        entries = [TranscriptionEntry(**dict(r)) for r in rows.rows]
+    speakers = None
+    if any(e.operation in SPEAKER_OPERATIONS for e in edits):
+        speakers = await transcription_speakers(db, transcription_id)
+    return TranscriptionChangesResponse(
+        ok=True, version=edits[-1].id, edits=edits, entries=entries, speakers=speakers
     )
 
 
-@router.GET("/(?P<database>[^/]+)/-/api/scribe/transcription/(?P<transcription_id>\\d+)/audio$")
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/transcription/(?P<transcription_id>\\d+)/changes$",
+    output=TranscriptionChangesResponse,
+)
 @check_permission()
-async def api_transcription_audio(datasette, request, database: str, transcription_id: str):
+async def api_transcription_changes(
+    datasette, request, database: str, transcription_id: str
+):
+    await ensure_schema(datasette, database)
     db = datasette.get_database(database)
+    try:
+        since = int(request.args.get("since") or 0)
+    except ValueError:
+        return Response.json(
+            TranscriptionChangesResponse(
+                ok=False, error="since must be an integer"
+            ).model_dump(),
+            status=400,
+        )
+    changes = await transcription_changes(db, int(transcription_id), since)
+    return Response.json(changes.model_dump())
+
+
+@router.POST(
+    "/-/api/scribe/transcription/(?P<transcription_id>\\d+)/retry$",
+    output=NewTranscriptionResponse,
+)
+@check_permission()
+async def api_retry_transcription(
+    datasette,
+    request,
+    transcription_id: str,
+    body: Annotated[RetryTranscriptionRequest, Body()],
+):
+    await ensure_schema(datasette, body.database)
+    db = datasette.get_database(body.database)
     tid = int(transcription_id)
+
     row = (
         await db.execute(
-            "select ab.data, ab.content_type from datasette_scribe_audio_blobs ab where ab.transcription_id = ?",
+            "select t.completed_at, j.status from datasette_scribe_transcriptions t"
+            " left join datasette_scribe_jobs j on j.transcription_id = t.id"
+            " where t.id = ?",
             [tid],
         )
     ).first()
-    if row is not None:
-        return Response(
-            body=row["data"],
-            content_type=row["content_type"],
-            headers={"Cache-Control": "max-age=3600"},
+    if row is None:
+        return Response.json(
+            NewTranscriptionResponse(
+                ok=False, error="Transcription not found"
+            ).model_dump(),
+            status=404,
+        )
+    if row["completed_at"] is not None or row["status"] in ("queued", "running"):
+        return Response.json(
+            NewTranscriptionResponse(
+                ok=False, id=tid, error="Only failed transcriptions can be retried"
+            ).model_dump(),
+            status=400,
         )
-    return Response.text("Audio not found", status=404)
 
+    queue = get_job_queue(datasette)
 
-@router.POST("/-/api/scribe/entry/(?P<entry_id>\\d+)/edit$", output=EditResponse)
+    def requeue(conn):
+        conn.execute(
+            "update datasette_scribe_transcriptions set error = null where id = ?",
+            [tid],
+        )
+        conn.execute(
+            "insert into datasette_scribe_jobs (transcription_id, max_attempts) values (?, ?)"
+            " on conflict (transcription_id) do update set status = 'queued', attempts = 0,"
+            " max_attempts = excluded.max_attempts, error = null, started_at = null, finished_at = null,"
+            " next_attempt_at = null",
+            [tid, queue.max_attempts],
+        )
+        return conn.execute(
+            "select id from datasette_scribe_jobs where transcription_id = ?", [tid]
+        ).fetchone()[0]
+
+    job_id = await db.execute_write_fn(requeue)
+    queue.submit(body.database, job_id)
+
+    return Response.json(
+        NewTranscriptionResponse(ok=True, id=tid, status="queued").model_dump()
+    )
+
+
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/transcription/(?P<transcription_id>\\d+)/audio$"
+)
 @check_permission()
-async def api_edit_entry(
-    datasette, request, entry_id: str, body: Annotated[EditEntryRequest, Body()]
+async def api_transcription_audio(
+    datasette, request, database: str, transcription_id: str
 ):
-    await ensure_schema(datasette, body.database)
-    db = datasette.get_database(body.database)
-    eid = int(entry_id)
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+    tid = int(transcription_id)
+
+    # A speech-quality copy made by the transcode stage is served in
+    # preference to the original
+    playback = (
+        await db.execute(
+            "select sha256, size, content_type, storage from datasette_scribe_playback_audio"
+            " where transcription_id = ?",
+            [tid],
+        )
+    ).first()
+    if playback is not None:
+        if playback["storage"] != DATABASE_STORAGE:
+            return await external_audio_response(datasette, request, playback)
+
+        try:
+            read_playback, chunk_size = blob_reader(
+                db, "datasette_scribe_playback_audio", tid, playback["size"]
+            )
+        except BlobTooLarge as e:
+            return Response.text(str(e), status=503)
+        return range_response(
+            request,
+            count_audio_bytes(read_playback),
+            size=playback["size"],
+            etag=f'"{playback["sha256"]}"',
+            content_type=playback["content_type"],
+            chunk_size=chunk_size,
+        )
+
+    stored = (
+        await db.execute(
+            "select sha256, size, content_type, storage from datasette_scribe_audio_files"
+            " where transcription_id = ?",
+            [tid],
+        )
+    ).first()
+    if stored is not None:
+        return await external_audio_response(datasette, request, stored)
 
+    # length() of a blob is read from the record header, not the content
     row = (
         await db.execute(
-            "select id, transcription_id, text, speaker_id from datasette_scribe_transcription_entries where id = ?",
-            [eid],
+            "select ab.id, length(ab.data) as size, ab.content_type from datasette_scribe_audio_blobs ab"
+            " where ab.transcription_id = ?",
+            [tid],
         )
     ).first()
     if row is None:
-        return Response.json(
-            EditResponse(ok=False, error="Entry not found").model_dump(), status=404
+        return Response.text("Audio not found", status=404)
+
+    blob_id = row["id"]
+    try:
+        read, chunk_size = blob_reader(
+            db, "datasette_scribe_audio_blobs", blob_id, row["size"]
         )
+    except BlobTooLarge as e:
+        return Response.text(str(e), status=503)
+    return range_response(
+        request,
+        count_audio_bytes(read),
+        size=row["size"],
+        # Audio blobs are never modified once written
+        etag=f'"scribe-audio-{blob_id}-{row["size"]}"',
+        content_type=row["content_type"],
+        chunk_size=chunk_size,
+    )
+
 
-    tid = row["transcription_id"]
+@router.GET(
+    "/(?P<database>[^/]+)/-/api/scribe/transcription/(?P<transcription_id>\\d+)/waveform$"
+)
+@check_permission()
+async def api_transcription_waveform(
+    datasette, request, database: str, transcription_id: str
+):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+    tid = int(transcription_id)
 
-    if body.text is not None and body.text != row["text"]:
-        await db.execute_write(
-            "update datasette_scribe_transcription_entries set text = ? where id = ?",
-            [body.text, eid],
+    row = (
+        await db.execute(
+            "select length(data) as size, created_at from datasette_scribe_waveforms"
+            " where transcription_id = ?",
+            [tid],
         )
-        await db.execute_write(
-            "insert into datasette_scribe_transcription_edits (transcription_id, entry_id, operation, detail, created_at)"
-            " values (?, ?, ?, ?, datetime('now', 'subsec'))",
-            [
-                tid,
-                eid,
-                "edit_text",
-                json.dumps({"old": row["text"], "new": body.text}),
-            ],
+    ).first()
+    if row is None:
+        return Response.text("Waveform not found", status=404)
+
+    # Peaks are a few hundred KB an hour of audio, well under the substr() limit
+    read, chunk_size = blob_reader(db, "datasette_scribe_waveforms", tid, row["size"])
+    return range_response(
+        request,
+        read,
+        size=row["size"],
+        etag=f'"scribe-waveform-{tid}-{waveform_version(row["created_at"])}"',
+        content_type=WAVEFORM_CONTENT_TYPE,
+        chunk_size=chunk_size,
+        # The page links to it with ?v= set to the version, so recomputed
+        # peaks get a new URL
+        cache_control="private, max-age=31536000, immutable",
+    )
+
+
+async def external_audio_response(datasette, request, stored):
+    store = get_audio_store(datasette)
+    if store is None or store.name != stored["storage"]:
+        return Response.text(
+            f"Audio is in {stored['storage']} storage, which is not configured",
+            status=503,
         )
+    sha256 = stored["sha256"]
+    url = await asyncio.to_thread(store.url, sha256, stored["content_type"])
+    if url is not None:
+        # The store serves the bytes (and Range requests) itself
+        return Response.redirect(url)
+
+    async def read(offset: int, length: int) -> bytes:
+        return await asyncio.to_thread(store.read, sha256, offset, length)
+
+    return range_response(
+        request,
+        count_audio_bytes(read),
+        size=stored["size"],
+        # Content-addressed, so the digest is a perfect validator
+        etag=f'"{sha256}"',
+        content_type=stored["content_type"],
+    )
+
 
-    if body.speaker_id is not None and body.speaker_id != row["speaker_id"]:
-        await db.execute_write(
-            "update datasette_scribe_transcription_entries set speaker_id = ? where id = ?",
-            [body.speaker_id, eid],
+@router.POST("/-/api/scribe/entry/(?P<entry_id>\\d+)/edit$", output=EditResponse)
+@check_permission()
+async def api_edit_entry(
+    datasette, request, entry_id: str, body: Annotated[EditEntryRequest, Body()]
+):
+    await ensure_schema(datasette, body.database)
+    db = datasette.get_database(body.database)
+    return await run_edit(
+        db,
+        lambda conn: edit_entry(
+            conn, int(entry_id), text=body.text, speaker_id=body.speaker_id
+        ),
+    )
+
+
+@router.POST(
+    "/-/api/scribe/transcription/(?P<transcription_id>\\d+)/edits$",
+    output=BatchEditResponse,
+)
+@check_permission()
+async def api_batch_edit(
+    datasette,
+    request,
+    transcription_id: str,
+    body: Annotated[BatchEditRequest, Body()],
+):
+    await ensure_schema(datasette, body.database)
+    db = datasette.get_database(body.database)
+    tid = int(transcription_id)
+
+    # One transaction: if any operation fails, execute_write_fn rolls back the rest
+    try:
+        applied = await db.execute_write_fn(
+            lambda conn: apply_edits(conn, tid, body.operations)
         )
-        await db.execute_write(
-            "insert into datasette_scribe_transcription_edits (transcription_id, entry_id, operation, detail, created_at)"
-            " values (?, ?, ?, ?, datetime('now', 'subsec'))",
-            [
-                tid,
-                eid,
-                "reassign_speaker",
-                json.dumps({"old": row["speaker_id"], "new": body.speaker_id}),
-            ],
+    except EditError as e:
+        if e.index is None:
+            return Response.json(
+                BatchEditResponse(ok=False, error=e.message).model_dump(),
+                status=e.status,
+            )
+        results = [
+            EditOperationResult(ok=False, error=e.message if i == e.index else None)
+            for i in range(len(body.operations))
+        ]
+        return Response.json(
+            BatchEditResponse(
+                ok=False,
+                results=results,
+                error=f"Operation {e.index + 1} ({body.operations[e.index].op}): {e.message}",
+            ).model_dump(),
+            status=400,
         )
 
-    return Response.json(EditResponse(ok=True).model_dump())
+    return Response.json(
+        BatchEditResponse(
+            ok=True,
+            results=[
+                EditOperationResult(
+                    ok=True,
+                    affected_entries=r.affected_entries,
+                    speaker_id=r.speaker_id,
+                )
+                for r in applied
+            ],
+        ).model_dump()
+    )
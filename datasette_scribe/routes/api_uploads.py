@@ -0,0 +1,164 @@
+import asyncio
+from typing import Annotated
+
+from datasette import Response
+from datasette_plugin_router import Body
+
+from ..page_data import (
+    FinishUploadRequest,
+    NewTranscriptionResponse,
+    StartUploadRequest,
+    UploadResponse,
+)
+from ..router import router, check_permission, ensure_schema
+from ..storage import file_sha256, get_audio_store
+from ..uploads import UPLOAD_CHUNK_SIZE, UploadError, get_upload_store
+from .api_transcriptions import queue_transcription
+
+
+def _actor_id(request) -> str | None:
+    return request.actor.get("id") if request.actor else None
+
+
+def _upload_error(e: UploadError) -> Response:
+    return Response.json(
+        UploadResponse(ok=False, offset=e.offset or 0, error=str(e)).model_dump(),
+        status=e.status,
+    )
+
+
+@router.POST("/-/api/scribe/uploads$", output=UploadResponse)
+@check_permission()
+async def api_start_upload(
+    datasette, request, body: Annotated[StartUploadRequest, Body()]
+):
+    await ensure_schema(datasette, body.database)
+    try:
+        upload = get_upload_store(datasette).create(
+            database=body.database,
+            filename=body.filename,
+            content_type=body.content_type or "audio/mpeg",
+            size=body.size,
+            actor_id=_actor_id(request),
+        )
+    except UploadError as e:
+        return _upload_error(e)
+    return Response.json(
+        UploadResponse(
+            ok=True,
+            upload_id=upload.id,
+            size=upload.size,
+            chunk_size=UPLOAD_CHUNK_SIZE,
+        ).model_dump()
+    )
+
+
+@router.GET("/-/api/scribe/uploads/(?P<upload_id>[0-9a-f]{32})$", output=UploadResponse)
+@check_permission()
+async def api_upload_status(datasette, request, upload_id: str):
+    uploads = get_upload_store(datasette)
+    try:
+        upload = uploads.get(upload_id, _actor_id(request))
+    except UploadError as e:
+        return _upload_error(e)
+    return Response.json(
+        UploadResponse(
+            ok=True,
+            upload_id=upload.id,
+            offset=uploads.offset(upload),
+            size=upload.size,
+            chunk_size=UPLOAD_CHUNK_SIZE,
+        ).model_dump()
+    )
+
+
+# The body is raw audio bytes rather than JSON, streamed straight to disk,
+# so this route reads from the ASGI receive channel itself
+@router.POST(
+    "/-/api/scribe/uploads/(?P<upload_id>[0-9a-f]{32})/chunk$", output=UploadResponse
+)
+@check_permission()
+async def api_upload_chunk(datasette, request, upload_id: str):
+    uploads = get_upload_store(datasette)
+    try:
+        upload = uploads.get(upload_id, _actor_id(request))
+        try:
+            offset = int(request.headers.get("upload-offset", ""))
+        except ValueError:
+            raise UploadError("Upload-Offset header is required")
+        new_offset = await uploads.append(upload, offset, request.receive)
+    except UploadError as e:
+        return _upload_error(e)
+    return Response.json(
+        UploadResponse(
+            ok=True, upload_id=upload.id, offset=new_offset, size=upload.size
+        ).model_dump()
+    )
+
+
+@router.POST(
+    "/-/api/scribe/uploads/(?P<upload_id>[0-9a-f]{32})/finish$",
+    output=NewTranscriptionResponse,
+)
+@check_permission()
+async def api_finish_upload(
+    datasette, request, upload_id: str, body: Annotated[FinishUploadRequest, Body()]
+):
+    uploads = get_upload_store(datasette)
+    try:
+        upload = uploads.get(upload_id, _actor_id(request))
+    except UploadError as e:
+        return Response.json(
+            NewTranscriptionResponse(ok=False, error=str(e)).model_dump(),
+            status=e.status,
+        )
+    async with uploads.lock(upload):
+        if not uploads.part_path(upload.id).exists():
+            # Finished by a concurrent request
+            return Response.json(
+                NewTranscriptionResponse(
+                    ok=False, error="Upload not found"
+                ).model_dump(),
+                status=404,
+            )
+        received = uploads.offset(upload)
+        if received != upload.size:
+            return Response.json(
+                NewTranscriptionResponse(
+                    ok=False,
+                    error=f"Upload is incomplete: {received} of {upload.size} bytes received",
+                ).model_dump(),
+                status=409,
+            )
+
+        part_path = uploads.part_path(upload.id)
+        audio = None
+        store = get_audio_store(datasette)
+        if store is not None:
+            audio = await asyncio.to_thread(
+                store.put_file, part_path, upload.content_type
+            )
+            sha256 = audio.sha256
+        else:
+            sha256 = await asyncio.to_thread(file_sha256, part_path)
+
+        transcription_id, status = await queue_transcription(
+            datasette,
+            upload.database,
+            url=None,
+            input_type="file",
+            filename=upload.filename,
+            content_type=upload.content_type,
+            collection_id=body.collection_id,
+            audio=audio,
+            audio_path=None if audio else part_path,
+            sha256=sha256,
+            use_cache=not body.no_cache,
+        )
+        uploads.discard(upload)
+
+    return Response.json(
+        NewTranscriptionResponse(
+            ok=True, id=transcription_id, status=status, cached=status == "completed"
+        ).model_dump()
+    )
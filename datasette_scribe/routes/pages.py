@@ -1,3 +1,5 @@
+import json
+
 from pydantic import BaseModel
 
 from datasette import Response
@@ -9,13 +11,22 @@ from ..page_data import (
     CollectionWithTranscriptions,
     NewTranscriptionPageData,
     ScribePageData,
+    SearchPageData,
     TranscriptionDetailPageData,
     TranscriptionEdit,
-    TranscriptionEntry,
     TranscriptionSpeaker,
     TranscriptionSummary,
 )
+from .api_transcriptions import (
+    TRANSCRIPTION_SELECT,
+    entries_window,
+    transcription_speakers,
+    transcription_version,
+    transcriptions_page,
+)
 from ..router import router, check_permission, ensure_schema
+from ..search import search_index_ready
+from ..waveform import waveform_version
 
 
 async def render_page(
@@ -34,14 +45,9 @@ async def render_page(
     )
 
 
-TRANSCRIPTION_SELECT = (
-    "select t.id, t.url, t.input_type, t.filename, t.model, t.granularity, t.submitted_at,"
-    " t.completed_at, t.error,"
-    " (select count(*) from datasette_scribe_transcription_entries e where e.transcription_id = t.id) as entries_count,"
-    " (select max(e.end) from datasette_scribe_transcription_entries e where e.transcription_id = t.id) as duration,"
-    " (select count(distinct e.speaker_id) from datasette_scribe_transcription_entries e where e.transcription_id = t.id and e.speaker_id is not null) as speakers_count"
-    " from datasette_scribe_transcriptions t"
-)
+# Transcriptions shown per collection on the listing page; the rest are
+# fetched from the transcriptions API
+RECENT_PER_COLLECTION = 10
 
 
 @router.GET("/(?P<database>[^/]+)/-/scribe$")
@@ -50,20 +56,38 @@ async def scribe_page(datasette, request, database: str):
     await ensure_schema(datasette, database)
     db = datasette.get_database(database)
 
-    # Get all collections
+    # A fixed number of queries however many collections there are
     collection_rows = await db.execute(
-        "select id, name, description, created_at from datasette_scribe_collections order by name"
+        "select c.id, c.name, c.description, c.created_at,"
+        " (select count(*) from datasette_scribe_collection_transcriptions ct"
+        " where ct.collection_id = c.id) as transcriptions_count"
+        " from datasette_scribe_collections c order by c.name"
+    )
+    recent_rows = await db.execute(
+        "select collection_id, transcription_id from ("
+        " select collection_id, transcription_id, row_number() over ("
+        "  partition by collection_id order by transcription_id desc"
+        " ) as n from datasette_scribe_collection_transcriptions"
+        ") where n <= ?",
+        [RECENT_PER_COLLECTION],
+    )
+    collection_of = {
+        r["transcription_id"]: r["collection_id"] for r in recent_rows.rows
+    }
+    t_rows = await db.execute(
+        TRANSCRIPTION_SELECT
+        + " where t.id in (select value from json_each(?)) order by t.id desc",
+        [json.dumps(list(collection_of))],
     )
+    recent: dict[int, list[TranscriptionSummary]] = {}
+    for r in t_rows.rows:
+        recent.setdefault(collection_of[r["id"]], []).append(
+            TranscriptionSummary(**dict(r))
+        )
+
     collections = []
     for crow in collection_rows.rows:
-        cid = crow["id"]
-        t_rows = await db.execute(
-            TRANSCRIPTION_SELECT
-            + " join datasette_scribe_collection_transcriptions ct on ct.transcription_id = t.id"
-            " where ct.collection_id = ? order by t.id desc",
-            [cid],
-        )
-        transcriptions = [TranscriptionSummary(**dict(r)) for r in t_rows.rows]
+        transcriptions = recent.get(crow["id"], [])
         collections.append(
             CollectionWithTranscriptions(
                 id=crow["id"],
@@ -71,16 +95,25 @@ async def scribe_page(datasette, request, database: str):
                 description=crow["description"],
                 created_at=crow["created_at"],
                 transcriptions=transcriptions,
+                transcriptions_count=crow["transcriptions_count"],
+                transcriptions_next_cursor=(
+                    str(transcriptions[-1].id)
+                    if len(transcriptions) < crow["transcriptions_count"]
+                    else None
+                ),
             )
         )
 
-    # Get uncollected transcriptions
-    uncollected_rows = await db.execute(
-        TRANSCRIPTION_SELECT
-        + " where t.id not in (select transcription_id from datasette_scribe_collection_transcriptions)"
-        " order by t.id desc"
+    uncollected, uncollected_next_cursor = await transcriptions_page(
+        db, collection_id=None
     )
-    uncollected = [TranscriptionSummary(**dict(r)) for r in uncollected_rows.rows]
+    uncollected_count = (
+        await db.execute(
+            "select count(*) from datasette_scribe_transcriptions t where not exists ("
+            " select 1 from datasette_scribe_collection_transcriptions ct where ct.transcription_id = t.id"
+            ")"
+        )
+    ).single_value()
 
     return await render_page(
         datasette,
@@ -91,6 +124,8 @@ async def scribe_page(datasette, request, database: str):
             database_name=database,
             collections=collections,
             uncollected_transcriptions=uncollected,
+            uncollected_count=uncollected_count,
+            uncollected_next_cursor=uncollected_next_cursor,
         ),
     )
 
@@ -104,62 +139,38 @@ async def transcription_detail_page(
     db = datasette.get_database(database)
     tid = int(transcription_id)
 
-    row = (
-        await db.execute(
-            "select t.id, t.url, t.input_type, t.filename, t.model, t.granularity, t.submitted_at,"
-            " t.completed_at, t.error,"
-            " (select count(*) from datasette_scribe_transcription_entries e where e.transcription_id = t.id) as entries_count"
-            " from datasette_scribe_transcriptions t where t.id = ?",
-            [tid],
-        )
-    ).first()
+    row = (await db.execute(TRANSCRIPTION_SELECT + " where t.id = ?", [tid])).first()
     if row is None:
         return Response.text("Transcription not found", status=404)
 
     transcription = TranscriptionSummary(**dict(row))
+    # Read before anything else, so an edit made while the page is built is
+    # sent again by the changes API rather than missed
+    version = await transcription_version(db, tid)
 
     if transcription.input_type == "file":
         audio_url = f"/{database}/-/api/scribe/transcription/{tid}/audio"
     else:
         audio_url = transcription.url
 
-    entry_rows = await db.execute(
-        "select id, start, end, speaker_id, text, original_speaker_id, original_text"
-        " from datasette_scribe_transcription_entries where transcription_id = ?"
-        " order by start",
-        [tid],
-    )
-    entries = [TranscriptionEntry(**dict(r)) for r in entry_rows.rows]
-
-    speaker_rows = await db.execute(
-        "select distinct s.id, s.name, s.is_original"
-        " from datasette_scribe_speakers s"
-        " join datasette_scribe_transcription_entries e on e.speaker_id = s.name"
-        " where e.transcription_id = ?"
-        " order by s.name",
-        [tid],
-    )
-    speakers = []
-    for r in speaker_rows.rows:
-        used_row = (
-            await db.execute(
-                "select exists("
-                " select 1 from datasette_scribe_transcription_entries"
-                " where speaker_id = ? and transcription_id != ?"
-                ") as used_elsewhere",
-                [r["name"], tid],
-            )
-        ).first()
-        speakers.append(
-            TranscriptionSpeaker(
-                id=r["id"],
-                name=r["name"],
-                is_original=bool(r["is_original"]),
-                used_in_other_transcriptions=bool(
-                    used_row["used_elsewhere"] if used_row else False
-                ),
-            )
+    waveform = (
+        await db.execute(
+            "select created_at from datasette_scribe_waveforms where transcription_id = ?",
+            [tid],
         )
+    ).first()
+    peaks_url = None
+    if waveform is not None:
+        version_param = waveform_version(waveform["created_at"])
+        peaks_url = (
+            f"/{database}/-/api/scribe/transcription/{tid}/waveform?v={version_param}"
+        )
+
+    # Long transcriptions have thousands of entries, so only the first window
+    # is embedded in the page
+    entries, entries_next_cursor = await entries_window(db, tid)
+
+    speakers = await transcription_speakers(db, tid)
 
     # Check if transcription belongs to a collection
     collection_row = (
@@ -177,29 +188,28 @@ async def transcription_detail_page(
     if collection:
         # In a collection: speakers used within the same collection + free speakers
         all_speaker_rows = await db.execute(
-            "select distinct s.id, s.name, s.is_original from datasette_scribe_speakers s"
-            " where s.name in ("
-            "   select e.speaker_id from datasette_scribe_transcription_entries e"
-            "   join datasette_scribe_collection_transcriptions ct on ct.transcription_id = e.transcription_id"
-            "   where ct.collection_id = ? and e.speaker_id is not null"
-            " ) or s.name not in ("
-            "   select e.speaker_id from datasette_scribe_transcription_entries e"
-            "   where e.speaker_id is not null"
+            "select s.id, s.name, s.is_original from datasette_scribe_speakers s"
+            " where s.id in ("
+            "   select u.speaker_ref from datasette_scribe_speaker_usage u"
+            "   join datasette_scribe_collection_transcriptions ct on ct.transcription_id = u.transcription_id"
+            "   where ct.collection_id = ?"
+            " ) or not exists ("
+            "   select 1 from datasette_scribe_speaker_usage u where u.speaker_ref = s.id"
             " ) order by s.name",
             [collection.id],
         )
     else:
         # Uncollected: speakers used in uncollected transcriptions + free speakers
         all_speaker_rows = await db.execute(
-            "select distinct s.id, s.name, s.is_original from datasette_scribe_speakers s"
-            " where s.name in ("
-            "   select e.speaker_id from datasette_scribe_transcription_entries e"
-            "   where e.transcription_id not in ("
-            "     select transcription_id from datasette_scribe_collection_transcriptions"
-            "   ) and e.speaker_id is not null"
-            " ) or s.name not in ("
-            "   select e.speaker_id from datasette_scribe_transcription_entries e"
-            "   where e.speaker_id is not null"
+            "select s.id, s.name, s.is_original from datasette_scribe_speakers s"
+            " where s.id in ("
+            "   select u.speaker_ref from datasette_scribe_speaker_usage u"
+            "   where not exists ("
+            "     select 1 from datasette_scribe_collection_transcriptions ct"
+            "     where ct.transcription_id = u.transcription_id"
+            "   )"
+            " ) or not exists ("
+            "   select 1 from datasette_scribe_speaker_usage u where u.speaker_ref = s.id"
             " ) order by s.name"
         )
     all_speakers = [
@@ -231,12 +241,15 @@ async def transcription_detail_page(
             database_name=database,
             transcription=transcription,
             audio_url=audio_url,
+            peaks_url=peaks_url,
             entries=entries,
+            entries_next_cursor=entries_next_cursor,
             speakers=speakers,
             all_speakers=all_speakers,
             edits=edits,
             collection=collection,
             all_collections=all_collections,
+            version=version,
         ),
     )
 
@@ -261,13 +274,32 @@ async def new_transcription_page(datasette, request, database: str):
     )
 
 
-@router.GET(
-    "/(?P<database>[^/]+)/-/scribe/collections/(?P<collection_id>[^/]+)$"
-)
+@router.GET("/(?P<database>[^/]+)/-/scribe/search$")
 @check_permission()
-async def collection_detail_page(
-    datasette, request, database: str, collection_id: str
-):
+async def search_page(datasette, request, database: str):
+    await ensure_schema(datasette, database)
+    db = datasette.get_database(database)
+    index_ready = await db.execute_fn(search_index_ready)
+    collection_rows = await db.execute(
+        "select id, name, description, created_at from datasette_scribe_collections order by name"
+    )
+    collections = [CollectionSummary(**dict(r)) for r in collection_rows.rows]
+    return await render_page(
+        datasette,
+        request,
+        page_title="Search",
+        entrypoint="src/pages/search/index.ts",
+        page_data=SearchPageData(
+            database_name=database,
+            collections=collections,
+            index_ready=index_ready,
+        ),
+    )
+
+
+@router.GET("/(?P<database>[^/]+)/-/scribe/collections/(?P<collection_id>[^/]+)$")
+@check_permission()
+async def collection_detail_page(datasette, request, database: str, collection_id: str):
     await ensure_schema(datasette, database)
     db = datasette.get_database(database)
     cid = int(collection_id)
@@ -293,22 +325,18 @@ async def collection_detail_page(
     transcriptions = [TranscriptionSummary(**dict(r)) for r in t_rows.rows]
 
     # Available uncollected transcriptions
-    avail_rows = await db.execute(
-        TRANSCRIPTION_SELECT
-        + " where t.id not in (select transcription_id from datasette_scribe_collection_transcriptions)"
-        " order by t.id desc"
-    )
-    available = [TranscriptionSummary(**dict(r)) for r in avail_rows.rows]
+    available, available_next_cursor = await transcriptions_page(db, collection_id=None)
 
     # Speaker stats for this collection
     speaker_rows = await db.execute(
-        "select e.speaker_id as name,"
-        " count(*) as entry_count,"
-        " count(distinct e.transcription_id) as transcription_count"
-        " from datasette_scribe_transcription_entries e"
-        " join datasette_scribe_collection_transcriptions ct on ct.transcription_id = e.transcription_id"
-        " where ct.collection_id = ? and e.speaker_id is not null"
-        " group by e.speaker_id"
+        "select s.name,"
+        " sum(u.entries_count) as entry_count,"
+        " count(*) as transcription_count"
+        " from datasette_scribe_speaker_usage u"
+        " join datasette_scribe_collection_transcriptions ct on ct.transcription_id = u.transcription_id"
+        " join datasette_scribe_speakers s on s.id = u.speaker_ref"
+        " where ct.collection_id = ?"
+        " group by s.id"
         " order by entry_count desc",
         [cid],
     )
@@ -324,6 +352,7 @@ async def collection_detail_page(
             collection=collection,
             transcriptions=transcriptions,
             available_transcriptions=available,
+            available_next_cursor=available_next_cursor,
             speakers=speakers,
         ),
     )
@@ -11,7 +11,8 @@ create table if not exists datasette_scribe_transcriptions (
     usage text
 );
 
--- TODO: Remove audio_blobs table when S3 storage is implemented
+-- Audio stored in the database itself, used when no audio_storage is
+-- configured. `datasette scribe move-audio` moves it to an external store.
 create table if not exists datasette_scribe_audio_blobs (
     id integer primary key,
     transcription_id integer not null unique references datasette_scribe_transcriptions(id),
@@ -58,3 +59,15 @@ create table if not exists datasette_scribe_collection_transcriptions (
     added_at text not null default (datetime('now', 'subsec')),
     primary key (collection_id, transcription_id)
 );
+
+create table if not exists datasette_scribe_jobs (
+    id integer primary key,
+    transcription_id integer not null unique references datasette_scribe_transcriptions(id),
+    status text not null default 'queued', -- queued, running, completed or failed
+    attempts integer not null default 0,
+    max_attempts integer not null default 3,
+    error text,
+    created_at text not null default (datetime('now', 'subsec')),
+    started_at text,
+    finished_at text
+);
@@ -0,0 +1,217 @@
+"""Full-text search across transcription entries.
+
+``datasette_scribe_entries_fts`` is an FTS5 index over the entries table,
+kept current by the triggers created in ``m006_search_index``, so every
+write path — ingest, entry edits, speaker tools — updates it without any
+extra code. Entries that existed before search was enabled are indexed in
+the background by ``build_search_index()``, one batch per write
+transaction, so the server stays responsive while a large archive is
+indexed.
+"""
+
+import asyncio
+import html
+import logging
+import re
+import weakref
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BATCH_SIZE = 5000
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Scoring every match gets slow for terms that are in most entries, so
+# broader queries list the newest matches first instead
+MAX_RANKED_MATCHES = 20000
+
+# What search_sql() has snippet() wrap matches in — char(2) and char(3) —
+# replaced with <mark> once the text has been escaped
+_HIGHLIGHT_START = "\x02"
+_HIGHLIGHT_END = "\x03"
+_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# Background index builds, one per database
+_builds: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def index_batch(conn, batch_size: int = SEARCH_BATCH_SIZE) -> bool:
+    """Index the next ``batch_size`` entries that predate the search index.
+
+    Returns True once every entry is indexed. The caller commits.
+    """
+    indexed_through, backfill_until = conn.execute(
+        "select indexed_through, backfill_until from datasette_scribe_search_state"
+    ).fetchone()
+    if indexed_through >= backfill_until:
+        return True
+    # IDs have gaps where entries were deleted, so look up where this batch ends
+    (upper,) = conn.execute(
+        "select max(id) from ("
+        " select id from datasette_scribe_transcription_entries"
+        " where id > ? and id <= ? order by id limit ?"
+        ")",
+        [indexed_through, backfill_until, batch_size],
+    ).fetchone()
+    if upper is None:
+        upper = backfill_until
+    conn.execute(
+        "insert into datasette_scribe_entries_fts (rowid, text)"
+        " select id, text from datasette_scribe_transcription_entries where id > ? and id <= ?",
+        [indexed_through, upper],
+    )
+    conn.execute(
+        "update datasette_scribe_search_state set indexed_through = ?", [upper]
+    )
+    return upper >= backfill_until
+
+
+def search_index_ready(conn) -> bool:
+    row = conn.execute(
+        "select indexed_through >= backfill_until from datasette_scribe_search_state"
+    ).fetchone()
+    return bool(row and row[0])
+
+
+async def build_search_index(db, batch_size: int = SEARCH_BATCH_SIZE):
+    while not await db.execute_write_fn(lambda conn: index_batch(conn, batch_size)):
+        # Let queued writes from requests in between batches
+        await asyncio.sleep(0)
+
+
+def start_search_index(db):
+    """Start indexing ``db`` in the background, unless it's already running."""
+    task = _builds.get(db)
+    if task is not None and not task.done():
+        return
+    task = asyncio.create_task(build_search_index(db))
+    task.add_done_callback(_log_build_failure)
+    _builds[db] = task
+
+
+def _log_build_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Building the search index failed", exc_info=task.exception())
+
+
+async def resume_search_indexes(datasette):
+    """Finish indexing any database left part way through by a previous process."""
+    for db in datasette.databases.values():
+        if not db.is_mutable or not await db.table_exists(
+            "datasette_scribe_search_state"
+        ):
+            continue
+        if not await db.execute_fn(search_index_ready):
+            start_search_index(db)
+
+
+async def stop_search_indexes(datasette):
+    tasks = [_builds.pop(db) for db in datasette.databases.values() if db in _builds]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def fts_query(q: str) -> str | None:
+    """Turn what a user typed into an FTS5 query.
+
+    Every word, or "quoted phrase", is quoted, so punctuation and FTS5
+    operators are matched literally instead of raising syntax errors. A
+    trailing ``*`` keeps prefix matching. All terms have to match.
+    """
+    terms = []
+    for phrase, word in _TERM_RE.findall(q):
+        text = phrase or word
+        prefix = not phrase and text.endswith("*")
+        text = text.rstrip("*") if prefix else text
+        if text.strip():
+            terms.append('"' + text.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+
+def match_count_sql(match: str) -> tuple[str, list]:
+    # Counting reads the doclists without scoring them, so it's cheap even
+    # for terms that are in most entries
+    return (
+        "select count(*) from datasette_scribe_entries_fts where datasette_scribe_entries_fts match ?",
+        [match],
+    )
+
+
+def search_sql(
+    match: str,
+    *,
+    collection_id: int | None = None,
+    speaker: str | None = None,
+    ranked: bool = True,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    offset: int = 0,
+) -> tuple[str, list]:
+    """SQL and parameters for a page of hits, fetching one extra row to tell if there are more.
+
+    ``ranked`` orders hits by relevance, which scores every match. Without
+    it the newest entries come first, which FTS5 can read straight from the
+    index however many entries match.
+    """
+    where = ["datasette_scribe_entries_fts match ?"]
+    params: list = [match]
+    if collection_id is not None:
+        in_collection = (
+            " in (select transcription_id from datasette_scribe_collection_transcriptions"
+            " where collection_id = ?)"
+        )
+        # The unary + stops SQLite driving the query from the entries
+        # indexes, which would run the full-text match once per entry
+        # instead of once for the whole query
+        where.append("+e.transcription_id" + in_collection)
+        # The rowid bounds let FTS5 skip straight to the entries the filter
+        # can match, rather than reading through every match from the
+        # newest down
+        where.append(
+            "datasette_scribe_entries_fts.rowid between"
+            " (select min(id) from datasette_scribe_transcription_entries where transcription_id"
+            + in_collection
+            + ")"
+            " and (select max(id) from datasette_scribe_transcription_entries where transcription_id"
+            + in_collection
+            + ")"
+        )
+        params.extend([collection_id] * 3)
+    if speaker:
+        speaker_ref = "(select id from datasette_scribe_speakers where name = ?)"
+        # Unary + and rowid bounds as for collections
+        where.append("+e.speaker_ref = " + speaker_ref)
+        where.append(
+            "datasette_scribe_entries_fts.rowid between"
+            " (select min(id) from datasette_scribe_transcription_entries where speaker_ref = "
+            + speaker_ref
+            + ")"
+            " and (select max(id) from datasette_scribe_transcription_entries where speaker_ref = "
+            + speaker_ref
+            + ")"
+        )
+        params.extend([speaker] * 3)
+    order = (
+        "datasette_scribe_entries_fts.rank"
+        if ranked
+        else "datasette_scribe_entries_fts.rowid desc"
+    )
+    sql = (
+        "select e.id as entry_id, e.transcription_id, e.start, e.end, s.name as speaker_id,"
+        " coalesce(t.filename, t.url, 'Transcription ' || t.id) as transcription_title,"
+        " snippet(datasette_scribe_entries_fts, 0, char(2), char(3), '…', 16) as snippet"
+        " from datasette_scribe_entries_fts"
+        " join datasette_scribe_transcription_entries e on e.id = datasette_scribe_entries_fts.rowid"
+        " join datasette_scribe_transcriptions t on t.id = e.transcription_id"
+        " left join datasette_scribe_speakers s on s.id = e.speaker_ref"
+        " where " + " and ".join(where) + f" order by {order} limit ? offset ?"
+    )
+    params.extend([limit + 1, offset])
+    return sql, params
+
+
+def snippet_html(snippet: str) -> str:
+    return (
+        html.escape(snippet)
+        .replace(_HIGHLIGHT_START, "<mark>")
+        .replace(_HIGHLIGHT_END, "</mark>")
+    )
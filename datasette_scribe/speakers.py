@@ -0,0 +1,28 @@
+"""Speakers, which entries refer to by id through ``speaker_ref``.
+
+The API and edit log still name speakers; these helpers turn a name into
+the id stored on entries. Like ``ingest``, nothing here commits.
+"""
+
+
+def speaker_ref(conn, name: str | None, *, is_original: bool = False) -> int | None:
+    """The id of the speaker called ``name``, adding them if they're new.
+
+    An empty or missing name means the entry has no speaker.
+    """
+    if not name:
+        return None
+    conn.execute(
+        "insert or ignore into datasette_scribe_speakers (name, is_original) values (?, ?)",
+        [name, int(is_original)],
+    )
+    return find_speaker(conn, name)
+
+
+def find_speaker(conn, name: str | None) -> int | None:
+    if not name:
+        return None
+    row = conn.execute(
+        "select id from datasette_scribe_speakers where name = ?", [name]
+    ).fetchone()
+    return row[0] if row else None
@@ -0,0 +1,52 @@
+"""Per-transcription entry count, duration and speaker usage.
+
+Listing pages read the counts from ``datasette_scribe_transcription_stats``
+instead of aggregating every transcription's entries on each view, and
+speaker lists read ``datasette_scribe_speaker_usage`` — how many entries of
+each transcription every speaker has. Every write that adds entries or
+changes their speakers calls ``refresh_transcription_stats()`` in the same
+transaction, so neither is ever out of step with the entries. Like
+``ingest``, nothing here commits.
+"""
+
+from typing import Iterable
+
+
+def refresh_transcription_stats(conn, transcription_ids: Iterable[int]):
+    """Recompute the stats and speaker usage of the given transcriptions from their entries."""
+    for transcription_id in transcription_ids:
+        # Both read the (transcription_id, start, end, speaker_ref) covering index
+        conn.execute(
+            "insert or replace into datasette_scribe_transcription_stats"
+            " (transcription_id, entries_count, duration, speakers_count)"
+            " select ?, count(*), max(end), count(distinct speaker_ref)"
+            " from datasette_scribe_transcription_entries where transcription_id = ?",
+            [transcription_id, transcription_id],
+        )
+        conn.execute(
+            "delete from datasette_scribe_speaker_usage where transcription_id = ?",
+            [transcription_id],
+        )
+        conn.execute(
+            "insert into datasette_scribe_speaker_usage (speaker_ref, transcription_id, entries_count)"
+            " select speaker_ref, transcription_id, count(*) from datasette_scribe_transcription_entries"
+            " where transcription_id = ? and speaker_ref is not null group by speaker_ref",
+            [transcription_id],
+        )
+
+
+def refresh_all_stats(conn) -> int:
+    """Rebuild the stats of every transcription. Returns how many have entries."""
+    conn.execute("delete from datasette_scribe_speaker_usage")
+    conn.execute(
+        "insert into datasette_scribe_speaker_usage (speaker_ref, transcription_id, entries_count)"
+        " select speaker_ref, transcription_id, count(*) from datasette_scribe_transcription_entries"
+        " where speaker_ref is not null group by speaker_ref, transcription_id"
+    )
+    conn.execute("delete from datasette_scribe_transcription_stats")
+    return conn.execute(
+        "insert into datasette_scribe_transcription_stats"
+        " (transcription_id, entries_count, duration, speakers_count)"
+        " select transcription_id, count(*), max(end), count(distinct speaker_ref)"
+        " from datasette_scribe_transcription_entries group by transcription_id"
+    ).rowcount
@@ -0,0 +1,414 @@
+"""Content-addressed audio storage outside the SQLite file.
+
+Audio is stored once per SHA-256 digest, so uploading the same file twice
+costs no extra space. The database keeps one ``datasette_scribe_audio_files``
+row per transcription pointing at the digest.
+
+Configure a backend with the ``audio_storage`` plugin setting::
+
+    {"type": "local", "path": "/var/lib/scribe/audio"}
+    {"type": "s3", "bucket": "scribe", "endpoint_url": "http://localhost:9000"}
+
+Without it, audio stays in ``datasette_scribe_audio_blobs`` as before.
+The store methods block, so async code calls them with
+``asyncio.to_thread()``.
+"""
+
+import abc
+import asyncio
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+
+from .router import get_config
+from .streaming import CHUNK_SIZE, blob_reader, read_blob, substr_chunk_size
+
+_stores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class StoredAudio:
+    sha256: str
+    size: int
+    content_type: str
+    storage: str
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AudioStore(abc.ABC):
+    """Interface shared by the storage backends."""
+
+    name: str
+
+    @abc.abstractmethod
+    def exists(self, sha256: str) -> bool: ...
+
+    @abc.abstractmethod
+    def write(self, sha256: str, data: bytes, content_type: str): ...
+
+    @abc.abstractmethod
+    def read(
+        self, sha256: str, offset: int = 0, length: int | None = None
+    ) -> bytes: ...
+
+    @abc.abstractmethod
+    def delete(self, sha256: str): ...
+
+    def write_file(self, sha256: str, path: Path, content_type: str):
+        """Store the file at ``path``, which the store may move or delete."""
+        self.write(sha256, path.read_bytes(), content_type)
+
+    def download(self, sha256: str, path: str):
+        """Copy the stored file to ``path`` without reading it into memory whole."""
+        offset = 0
+        with open(path, "wb") as f:
+            while chunk := self.read(sha256, offset, DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                offset += len(chunk)
+
+    def url(self, sha256: str, content_type: str) -> str | None:
+        """A URL clients can fetch the audio from directly, if the backend has one."""
+        return None
+
+    def put(self, data: bytes, content_type: str) -> StoredAudio:
+        sha256 = hashlib.sha256(data).hexdigest()
+        if not self.exists(sha256):
+            self.write(sha256, data, content_type)
+        return StoredAudio(
+            sha256=sha256, size=len(data), content_type=content_type, storage=self.name
+        )
+
+    def put_file(self, path: Path, content_type: str) -> StoredAudio:
+        """Like ``put()``, hashing the file in chunks rather than loading it."""
+        sha256 = file_sha256(path)
+        size = path.stat().st_size
+        if not self.exists(sha256):
+            self.write_file(sha256, path, content_type)
+        return StoredAudio(
+            sha256=sha256, size=size, content_type=content_type, storage=self.name
+        )
+
+
+class LocalAudioStore(AudioStore):
+    name = "local"
+
+    def __init__(self, path):
+        self.root = Path(path)
+
+    def path(self, sha256: str) -> Path:
+        # Fan out so no single directory ends up with every file
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def exists(self, sha256: str) -> bool:
+        return self.path(sha256).exists()
+
+    def write(self, sha256: str, data: bytes, content_type: str):
+        path = self.path(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated file under
+        # the final name
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def write_file(self, sha256: str, path: Path, content_type: str):
+        target = self.path(sha256)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # shutil.move() is a rename on the same filesystem and a copy
+        # otherwise; the final os.replace() keeps either way atomic. The
+        # temporary name is unique, so identical uploads finishing at once
+        # don't move into the same file
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".upload-")
+        os.close(fd)
+        try:
+            shutil.move(path, tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def read(self, sha256: str, offset: int = 0, length: int | None = None) -> bytes:
+        with open(self.path(sha256), "rb") as f:
+            f.seek(offset)
+            return f.read(-1 if length is None else length)
+
+    def delete(self, sha256: str):
+        self.path(sha256).unlink(missing_ok=True)
+
+
+class S3AudioStore(AudioStore):
+    """Any S3-compatible service — AWS, MinIO, R2 — via boto3."""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        prefix: str = "",
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        url_expires: int = 3600,
+    ):
+        try:
+            import boto3  # ty: ignore[unresolved-import]
+        except ImportError:
+            raise RuntimeError(
+                "boto3 is required for S3 audio storage. Install it with: "
+                "uv pip install 'datasette-scribe[s3]'"
+            )
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_expires = url_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+        )
+
+    def key(self, sha256: str) -> str:
+        return f"{self.prefix}{sha256}"
+
+    def exists(self, sha256: str) -> bool:
+        from botocore.exceptions import ClientError  # ty: ignore[unresolved-import]
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(sha256))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def write(self, sha256: str, data: bytes, content_type: str):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.key(sha256),
+            Body=data,
+            ContentType=content_type,
+        )
+
+    def write_file(self, sha256: str, path: Path, content_type: str):
+        # Multipart upload for large files, without reading them into memory
+        self.client.upload_file(
+            str(path),
+            self.bucket,
+            self.key(sha256),
+            ExtraArgs={"ContentType": content_type},
+        )
+
+    def read(self, sha256: str, offset: int = 0, length: int | None = None) -> bytes:
+        kwargs = {}
+        if offset or length is not None:
+            end = "" if length is None else offset + length - 1
+            kwargs["Range"] = f"bytes={offset}-{end}"
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key(sha256), **kwargs
+        )
+        return response["Body"].read()
+
+    def delete(self, sha256: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(sha256))
+
+    def download(self, sha256: str, path: str):
+        self.client.download_file(self.bucket, self.key(sha256), path)
+
+    def url(self, sha256: str, content_type: str) -> str | None:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.key(sha256),
+                "ResponseContentType": content_type,
+            },
+            ExpiresIn=self.url_expires,
+        )
+
+
+def audio_store_from_config(config: dict | None) -> AudioStore | None:
+    if not config:
+        return None
+    kind = config.get("type", "local")
+    if kind == "local":
+        return LocalAudioStore(config["path"])
+    if kind == "s3":
+        return S3AudioStore(
+            config["bucket"],
+            prefix=config.get("prefix", ""),
+            endpoint_url=config.get("endpoint_url"),
+            region=config.get("region"),
+            access_key_id=config.get("access_key_id"),
+            secret_access_key=config.get("secret_access_key"),
+            url_expires=int(config.get("url_expires", 3600)),
+        )
+    raise ValueError(f"Unknown audio_storage type: {kind}")
+
+
+def get_audio_store(datasette) -> AudioStore | None:
+    if datasette not in _stores:
+        _stores[datasette] = audio_store_from_config(
+            get_config(datasette).get("audio_storage")
+        )
+    return _stores[datasette]
+
+
+def record_audio(conn, transcription_id: int, audio: StoredAudio):
+    conn.execute(
+        "insert into datasette_scribe_audio_files (transcription_id, sha256, size, content_type, storage)"
+        " values (?, ?, ?, ?, ?)",
+        [transcription_id, audio.sha256, audio.size, audio.content_type, audio.storage],
+    )
+
+
+@dataclass
+class AudioBlob:
+    """Audio kept in the database, as the ``data`` blob in one row of ``table``."""
+
+    table: str
+    rowid: int
+    size: int
+
+
+def locate_audio(conn, transcription_id: int) -> StoredAudio | AudioBlob | None:
+    """Where the audio for a transcription is kept."""
+    row = conn.execute(
+        "select sha256, size, content_type, storage from datasette_scribe_audio_files"
+        " where transcription_id = ?",
+        [transcription_id],
+    ).fetchone()
+    if row is not None:
+        return StoredAudio(*row)
+    row = conn.execute(
+        "select rowid, length(data) from datasette_scribe_audio_blobs where transcription_id = ?",
+        [transcription_id],
+    ).fetchone()
+    if row is not None:
+        return AudioBlob("datasette_scribe_audio_blobs", *row)
+    # The original may have been dropped in favour of its playback copy
+    row = conn.execute(
+        "select sha256, size, content_type, storage, rowid, data is not null"
+        " from datasette_scribe_playback_audio where transcription_id = ?",
+        [transcription_id],
+    ).fetchone()
+    if row is None:
+        return None
+    if row[5]:
+        return AudioBlob("datasette_scribe_playback_audio", row[4], row[1])
+    return StoredAudio(*row[:4])
+
+
+def _source_store(store: AudioStore | None, audio: StoredAudio) -> AudioStore:
+    if store is None or store.name != audio.storage:
+        raise ValueError(
+            f"Audio is in {audio.storage} storage, which is not configured"
+        )
+    return store
+
+
+@contextlib.asynccontextmanager
+async def audio_file(datasette, db, transcription_id: int, suffix: str = ""):
+    """The audio for a transcription as a path ffmpeg can read, or None.
+
+    Files in a local store are used where they are. Anything else is copied
+    to a temporary file a chunk at a time, so the audio is never held in
+    memory whole, and the copy is removed on exit.
+    """
+    source = await db.execute_fn(lambda conn: locate_audio(conn, transcription_id))
+    if source is None:
+        yield None
+        return
+    with tempfile.TemporaryDirectory(prefix="scribe-audio-") as tmp:
+        path = os.path.join(tmp, f"audio{suffix}")
+        if isinstance(source, StoredAudio):
+            store = _source_store(get_audio_store(datasette), source)
+            if isinstance(store, LocalAudioStore):
+                path = str(store.path(source.sha256))
+            else:
+                await asyncio.to_thread(store.download, source.sha256, path)
+        else:
+            read, step = blob_reader(db, source.table, source.rowid, source.size)
+            with open(path, "wb") as f:
+                for offset in range(0, source.size, step):
+                    f.write(await read(offset, step))
+        yield path
+
+
+@contextlib.contextmanager
+def audio_path(conn, store: AudioStore | None, transcription_id: int, suffix: str = ""):
+    """``audio_file()`` for a direct connection, as the CLI commands use."""
+    source = locate_audio(conn, transcription_id)
+    if source is None:
+        yield None
+        return
+    with tempfile.TemporaryDirectory(prefix="scribe-audio-") as tmp:
+        path = os.path.join(tmp, f"audio{suffix}")
+        if isinstance(source, StoredAudio):
+            store = _source_store(store, source)
+            if isinstance(store, LocalAudioStore):
+                path = str(store.path(source.sha256))
+            else:
+                store.download(source.sha256, path)
+        else:
+            step = (
+                CHUNK_SIZE
+                if hasattr(conn, "blobopen")
+                else substr_chunk_size(source.size)
+            )
+            with open(path, "wb") as f:
+                for offset in range(0, source.size, step):
+                    f.write(read_blob(conn, source.table, source.rowid, offset, step))
+        yield path
+
+
+def blob_sha256(conn, table: str, rowid: int, size: int) -> str:
+    """The SHA-256 of the ``data`` blob in one row of ``table``, read in chunks."""
+    digest = hashlib.sha256()
+    step = CHUNK_SIZE if hasattr(conn, "blobopen") else substr_chunk_size(size)
+    for offset in range(0, size, step):
+        digest.update(read_blob(conn, table, rowid, offset, step))
+    return digest.hexdigest()
+
+
+def move_blob(conn, store: AudioStore, blob_id: int) -> StoredAudio:
+    """Copy one legacy audio blob into ``store`` and drop it from the database.
+
+    The caller commits; the blob row is only deleted once the file has been
+    written, so an interrupted move can simply be run again.
+    """
+    transcription_id, data, content_type = conn.execute(
+        "select transcription_id, data, content_type from datasette_scribe_audio_blobs where id = ?",
+        [blob_id],
+    ).fetchone()
+    audio = store.put(data, content_type)
+    record_audio(conn, transcription_id, audio)
+    conn.execute(
+        "update datasette_scribe_transcriptions set audio_sha256 = ?"
+        " where id = ? and audio_sha256 is null",
+        [audio.sha256, transcription_id],
+    )
+    conn.execute("delete from datasette_scribe_audio_blobs where id = ?", [blob_id])
+    return audio
@@ -0,0 +1,310 @@
+"""Streamed HTTP responses with Range, ETag and If-None-Match support."""
+
+import asyncio
+import re
+import sqlite3 as python_sqlite3
+import threading
+from pathlib import Path
+from typing import AsyncIterable, Awaitable, Callable
+
+from datasette import Response
+from datasette.utils.sqlite import sqlite3
+
+CHUNK_SIZE = 256 * 1024
+FLUSH_SIZE = 64 * 1024
+# Without incremental blob I/O, the largest blob read with substr() and the
+# most reads of one blob per response; see blob_reader()
+MAX_SUBSTR_BLOB_SIZE = 16 * 1024 * 1024
+MAX_BLOB_READS = 16
+INCREMENTAL_BLOB_IO = hasattr(sqlite3.Connection, "blobopen")  # ty: ignore[unresolved-attribute]
+
+_blob_connections: dict[str, tuple[python_sqlite3.Connection, threading.Lock]] = {}
+_blob_connections_lock = threading.Lock()
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+ReadChunk = Callable[[int, int], Awaitable[bytes]]
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single-range ``Range`` header into an inclusive (start, end) pair.
+
+    Returns None when the whole body should be sent — no header, a header we
+    don't understand, or several ranges — and raises ValueError when the
+    range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+def read_blob(conn, table: str, rowid: int, offset: int, length: int) -> bytes:
+    """``length`` bytes from ``offset`` of the ``data`` blob in one row of ``table``."""
+    if hasattr(conn, "blobopen"):
+        # Incremental blob I/O reads only the requested pages
+        with conn.blobopen(table, "data", rowid, readonly=True) as blob:
+            blob.seek(offset)
+            return blob.read(length)
+    # SQLite loads the whole blob to take a substr() of it
+    return conn.execute(
+        f"select substr(data, ?, ?) from {table} where rowid = ?",
+        [offset + 1, length, rowid],
+    ).fetchone()[0]
+
+
+def substr_chunk_size(size: int) -> int:
+    """Reads of a ``size`` byte blob with ``substr()`` take at most ``MAX_BLOB_READS``
+    chunks, so the total loaded is a fixed multiple of the blob's size
+    rather than growing with its square."""
+    return max(CHUNK_SIZE, -(-size // MAX_BLOB_READS))
+
+
+def _blob_connection(db) -> tuple[python_sqlite3.Connection, threading.Lock] | None:
+    """A read-only connection to ``db``'s file with ``blobopen()``, if there can be one.
+
+    For when Datasette's connections come from pysqlite3, which has no
+    ``blobopen()``; the standard library's sqlite3 has it from Python 3.11.
+    These connections stay open for the life of the process: with two
+    SQLite libraries in one process, closing a file in one drops the POSIX
+    locks the other holds on it.
+    """
+    if (
+        db.is_memory
+        or not db.path
+        or not hasattr(python_sqlite3.Connection, "blobopen")
+    ):
+        return None
+    path = str(Path(db.path).resolve())
+    with _blob_connections_lock:
+        if path not in _blob_connections:
+            conn = python_sqlite3.connect(
+                f"{Path(path).as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            _blob_connections[path] = (conn, threading.Lock())
+        return _blob_connections[path]
+
+
+def blob_reader(db, table: str, rowid: int, size: int) -> tuple[ReadChunk, int]:
+    """A reader for the ``size`` byte ``data`` blob in one row of ``table``,
+    and the chunk size to read it in.
+
+    Reads use incremental blob I/O, through Datasette's connections or a
+    connection of our own, so memory stays at one chunk whatever the blob's
+    size. Where neither can do it — an in-memory database under pysqlite3,
+    or Python 3.10 — blobs up to ``MAX_SUBSTR_BLOB_SIZE`` are read with
+    ``substr()`` and larger ones raise ``BlobTooLarge``.
+    """
+    own = None if INCREMENTAL_BLOB_IO else _blob_connection(db)
+    if own is not None:
+        conn, lock = own
+
+        def read_locked(offset: int, length: int) -> bytes:
+            with lock:
+                return read_blob(conn, table, rowid, offset, length)
+
+        async def read_own(offset: int, length: int) -> bytes:
+            return await asyncio.to_thread(read_locked, offset, length)
+
+        return read_own, CHUNK_SIZE
+
+    if not INCREMENTAL_BLOB_IO and size > MAX_SUBSTR_BLOB_SIZE:
+        raise BlobTooLarge(
+            f"This {size // (1024 * 1024)} MB blob is too large to read without incremental"
+            " blob I/O; move audio out of the database with `datasette scribe move-audio`"
+        )
+
+    async def read(offset: int, length: int) -> bytes:
+        return await db.execute_fn(
+            lambda conn: read_blob(conn, table, rowid, offset, length)
+        )
+
+    return read, CHUNK_SIZE if INCREMENTAL_BLOB_IO else substr_chunk_size(size)
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
+
+
+class StreamingResponse:
+    """Sends ``length`` bytes starting at ``offset``, reading them in chunks."""
+
+    def __init__(
+        self,
+        read: ReadChunk,
+        *,
+        offset: int,
+        length: int,
+        status: int = 200,
+        headers: dict | None = None,
+        content_type: str = "application/octet-stream",
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        self.read = read
+        self.offset = offset
+        self.length = length
+        self.status = status
+        self.headers = headers or {}
+        self.content_type = content_type
+        self.chunk_size = chunk_size
+
+    async def asgi_send(self, send):
+        headers = {
+            **self.headers,
+            "content-type": self.content_type,
+            "content-length": str(self.length),
+        }
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status,
+                "headers": [
+                    [key.lower().encode("latin-1"), str(value).encode("latin-1")]
+                    for key, value in headers.items()
+                ],
+            }
+        )
+        offset = self.offset
+        remaining = self.length
+        while remaining > 0:
+            chunk = await self.read(offset, min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                }
+            )
+        if remaining > 0 or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class ChunkedResponse:
+    """Sends each chunk of ``body`` as it's produced, when the length isn't known up front."""
+
+    def __init__(
+        self,
+        body: AsyncIterable[bytes | str],
+        *,
+        status: int = 200,
+        headers: dict | None = None,
+        content_type: str = "application/octet-stream",
+    ):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+        self.content_type = content_type
+
+    async def asgi_send(self, send):
+        headers = {**self.headers, "content-type": self.content_type}
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status,
+                "headers": [
+                    [key.lower().encode("latin-1"), str(value).encode("latin-1")]
+                    for key, value in headers.items()
+                ],
+            }
+        )
+        # Small chunks are gathered up, so each message carries a useful amount
+        buffer = bytearray()
+        async for chunk in self.body:
+            buffer += chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            if len(buffer) >= FLUSH_SIZE:
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": bytes(buffer),
+                        "more_body": True,
+                    }
+                )
+                buffer.clear()
+        await send(
+            {"type": "http.response.body", "body": bytes(buffer), "more_body": False}
+        )
+
+
+def range_response(
+    request,
+    read: ReadChunk,
+    *,
+    size: int,
+    etag: str,
+    content_type: str,
+    cache_control: str = "max-age=3600",
+    chunk_size: int = CHUNK_SIZE,
+):
+    """Build the right response for a GET of a ``size`` byte resource."""
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": cache_control,
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response("", status=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        # The client's cached copy is stale, so it needs the whole thing
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(
+            "",
+            status=416,
+            headers={**headers, "Content-Range": f"bytes */{size}"},
+        )
+
+    if byte_range is None:
+        return StreamingResponse(
+            read,
+            offset=0,
+            length=size,
+            headers=headers,
+            content_type=content_type,
+            chunk_size=chunk_size,
+        )
+    start, end = byte_range
+    return StreamingResponse(
+        read,
+        offset=start,
+        length=end - start + 1,
+        status=206,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+        content_type=content_type,
+        chunk_size=chunk_size,
+    )
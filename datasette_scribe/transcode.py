@@ -0,0 +1,192 @@
+"""Speech-quality playback copies of uploaded audio.
+
+Uploads are kept as received, often WAV or high-bitrate MP3 several times
+larger than speech needs. With the ``transcode`` plugin setting, each
+uploaded file is re-encoded by ffmpeg as low-bitrate mono Opus or AAC and
+the audio endpoint serves that copy instead::
+
+    {"codec": "opus", "bitrate": "32k", "keep_original": true, "workers": 2}
+
+The encodes run from a process pool, so a burst of uploads never runs more
+than ``workers`` of them at once. Playback copies are recorded in
+``datasette_scribe_playback_audio``: in the audio store when one is
+configured, otherwise inline in its ``data`` column. With ``keep_original``
+off the original is deleted once its copy is stored, and re-transcribing
+uses the copy.
+"""
+
+import asyncio
+import hashlib
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import ffmpeg
+from .storage import AudioStore, StoredAudio
+
+DEFAULT_CODEC = "opus"
+DEFAULT_BITRATE = "32k"
+DEFAULT_WORKERS = 2
+# Playback copies kept inline rather than in an audio store
+DATABASE_STORAGE = "database"
+
+
+@dataclass(frozen=True)
+class Codec:
+    content_type: str
+    extension: str
+    args: tuple[str, ...]
+
+
+CODECS = {
+    "opus": Codec("audio/ogg", ".ogg", ("-c:a", "libopus", "-application", "voip")),
+    # For browsers without Opus; faststart puts the index first so playback
+    # can start before the whole file has loaded
+    "aac": Codec("audio/mp4", ".m4a", ("-c:a", "aac", "-movflags", "+faststart")),
+}
+
+
+@dataclass
+class TranscodeOptions:
+    codec: str = DEFAULT_CODEC
+    bitrate: str = DEFAULT_BITRATE
+    keep_original: bool = True
+    workers: int = DEFAULT_WORKERS
+
+
+def transcode_options(config) -> TranscodeOptions | None:
+    """From the ``transcode`` plugin setting, either ``true`` or an object of overrides."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    codec = config.get("codec", DEFAULT_CODEC)
+    if codec not in CODECS:
+        raise ValueError(f"Unknown transcode codec: {codec}")
+    return TranscodeOptions(
+        codec=codec,
+        bitrate=str(config.get("bitrate", DEFAULT_BITRATE)),
+        keep_original=bool(config.get("keep_original", True)),
+        workers=max(1, int(config.get("workers", DEFAULT_WORKERS))),
+    )
+
+
+def transcode_file(source: str, output: str, codec: str, bitrate: str) -> int:
+    """Encode ``source`` as mono ``codec`` at ``bitrate``, returning the output size.
+
+    Runs in a worker process, so it blocks.
+    """
+    result = subprocess.run(
+        [
+            ffmpeg.require(),
+            "-hide_banner",
+            "-nostats",
+            "-loglevel",
+            "error",
+            "-i",
+            source,
+            "-vn",
+            "-ac",
+            "1",
+            *CODECS[codec].args,
+            "-b:a",
+            bitrate,
+            "-y",
+            output,
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        message = result.stderr.decode(errors="replace").strip().splitlines()
+        raise ffmpeg.FFmpegError(
+            f"ffmpeg failed: {message[-1] if message else result.returncode}"
+        )
+    return os.path.getsize(output)
+
+
+async def transcode_audio(
+    pool, source: str, options: TranscodeOptions, store: AudioStore | None
+) -> tuple[StoredAudio, bytes | None] | None:
+    """Encode the audio at ``source`` on ``pool`` and put the copy in ``store``.
+
+    Returns the stored copy, with its bytes when there is no store and they
+    belong in the database, or None when the copy would be no smaller.
+    """
+    codec = CODECS[options.codec]
+    loop = asyncio.get_running_loop()
+    with tempfile.TemporaryDirectory(prefix="scribe-transcode-") as tmp:
+        output = Path(tmp) / f"playback{codec.extension}"
+        size = await loop.run_in_executor(
+            pool, transcode_file, source, str(output), options.codec, options.bitrate
+        )
+        if size >= os.path.getsize(source):
+            return None
+        if store is not None:
+            stored = await asyncio.to_thread(store.put_file, output, codec.content_type)
+            return stored, None
+        data = await asyncio.to_thread(output.read_bytes)
+        stored = StoredAudio(
+            sha256=hashlib.sha256(data).hexdigest(),
+            size=len(data),
+            content_type=codec.content_type,
+            storage=DATABASE_STORAGE,
+        )
+        return stored, data
+
+
+def save_playback(
+    conn,
+    transcription_id: int,
+    audio: StoredAudio,
+    data: bytes | None,
+    *,
+    original_size: int,
+    keep_original: bool,
+) -> str | None:
+    """Record a playback copy, dropping the original unless ``keep_original``.
+
+    Returns the digest of a dropped original that nothing else references, for
+    the caller to delete from the audio store once this has committed.
+    """
+    conn.execute(
+        "insert or replace into datasette_scribe_playback_audio"
+        " (transcription_id, sha256, size, content_type, storage, data, original_size, created_at)"
+        " values (?, ?, ?, ?, ?, ?, ?, datetime('now', 'subsec'))",
+        [
+            transcription_id,
+            audio.sha256,
+            audio.size,
+            audio.content_type,
+            audio.storage,
+            data,
+            original_size,
+        ],
+    )
+    if keep_original:
+        return None
+    conn.execute(
+        "delete from datasette_scribe_audio_blobs where transcription_id = ?",
+        [transcription_id],
+    )
+    row = conn.execute(
+        "select sha256 from datasette_scribe_audio_files where transcription_id = ?",
+        [transcription_id],
+    ).fetchone()
+    if row is None:
+        return None
+    conn.execute(
+        "delete from datasette_scribe_audio_files where transcription_id = ?",
+        [transcription_id],
+    )
+    # Stored audio is content addressed, so another upload may share the file
+    shared = conn.execute(
+        "select 1 from datasette_scribe_audio_files where sha256 = ?1"
+        " union all select 1 from datasette_scribe_playback_audio where sha256 = ?1 and storage != ?2"
+        " limit 1",
+        [row[0], DATABASE_STORAGE],
+    ).fetchone()
+    return None if shared else row[0]
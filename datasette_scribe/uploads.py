@@ -0,0 +1,173 @@
+"""Resumable chunked audio uploads.
+
+An upload is started with its declared size, filled by appending chunks at
+explicit offsets, then finished, which hands the file to the transcription
+step. Partial uploads live in a directory on disk — ``<id>.part`` plus a
+``<id>.json`` sidecar — so the current offset is simply the size of the
+part file and an interrupted upload can be resumed, even across restarts.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import tempfile
+import time
+import weakref
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .router import get_config
+
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_MAX_UPLOAD_SIZE = 512 * 1024 * 1024
+# Unfinished uploads older than this are deleted
+UPLOAD_EXPIRY = 24 * 60 * 60
+
+_stores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 400, offset: int | None = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+@dataclass
+class Upload:
+    id: str
+    database: str
+    filename: str
+    content_type: str
+    size: int
+    actor_id: str | None
+    created: float
+
+
+class UploadStore:
+    def __init__(self, root, *, max_size: int = DEFAULT_MAX_UPLOAD_SIZE):
+        self.root = Path(root)
+        self.max_size = max_size
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def part_path(self, upload_id: str) -> Path:
+        return self.root / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.root / f"{upload_id}.json"
+
+    def create(
+        self,
+        *,
+        database: str,
+        filename: str,
+        content_type: str,
+        size: int,
+        actor_id: str | None,
+    ) -> Upload:
+        if size <= 0:
+            raise UploadError("Upload size must be positive")
+        if size > self.max_size:
+            raise UploadError(
+                f"File is larger than the {self.max_size // (1024 * 1024)} MB upload limit",
+                status=413,
+            )
+        self.expire()
+        self.root.mkdir(parents=True, exist_ok=True)
+        upload = Upload(
+            id=secrets.token_hex(16),
+            database=database,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            actor_id=actor_id,
+            created=time.time(),
+        )
+        self.part_path(upload.id).touch()
+        self._meta_path(upload.id).write_text(json.dumps(asdict(upload)))
+        return upload
+
+    def get(self, upload_id: str, actor_id: str | None) -> Upload:
+        try:
+            upload = Upload(**json.loads(self._meta_path(upload_id).read_text()))
+        except (FileNotFoundError, ValueError, TypeError):
+            raise UploadError("Upload not found", status=404)
+        if upload.actor_id != actor_id:
+            # Don't reveal that someone else's upload exists
+            raise UploadError("Upload not found", status=404)
+        return upload
+
+    def lock(self, upload: Upload) -> asyncio.Lock:
+        """Held while an upload is being appended to or finished."""
+        return self._locks.setdefault(upload.id, asyncio.Lock())
+
+    def offset(self, upload: Upload) -> int:
+        return self.part_path(upload.id).stat().st_size
+
+    async def append(self, upload: Upload, offset: int, receive) -> int:
+        """Write one request body to the upload at ``offset``, streaming it.
+
+        Returns the new offset. Bytes received before a dropped connection
+        are kept, so the client resumes from whatever ``offset()`` reports.
+        """
+        async with self.lock(upload):
+            current = self.offset(upload)
+            if offset != current:
+                raise UploadError(
+                    f"Expected offset {current}, got {offset}",
+                    status=409,
+                    offset=current,
+                )
+            limit = min(upload.size - current, UPLOAD_CHUNK_SIZE)
+            received = 0
+            with open(self.part_path(upload.id), "ab") as f:
+                more_body = True
+                while more_body:
+                    message = await receive()
+                    if message["type"] != "http.request":
+                        break
+                    chunk = message.get("body", b"")
+                    received += len(chunk)
+                    if received > limit:
+                        f.truncate(current)
+                        raise UploadError(
+                            "Chunk is too large or runs past the declared size",
+                            status=413,
+                            offset=current,
+                        )
+                    f.write(chunk)
+                    more_body = message.get("more_body", False)
+            return current + received
+
+    def discard(self, upload: Upload):
+        for path in (self.part_path(upload.id), self._meta_path(upload.id)):
+            path.unlink(missing_ok=True)
+        self._locks.pop(upload.id, None)
+
+    def expire(self):
+        if not self.root.exists():
+            return
+        cutoff = time.time() - UPLOAD_EXPIRY
+        for path in self.root.glob("*.json"):
+            part = self.part_path(path.stem)
+            # Appending touches the part file, so active uploads are kept
+            last_active = (
+                part.stat().st_mtime if part.exists() else path.stat().st_mtime
+            )
+            if last_active < cutoff:
+                part.unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+
+
+def get_upload_store(datasette) -> UploadStore:
+    store = _stores.get(datasette)
+    if store is None:
+        config = get_config(datasette)
+        store = UploadStore(
+            config.get("upload_dir")
+            or os.path.join(tempfile.gettempdir(), "datasette-scribe-uploads"),
+            max_size=int(config.get("max_upload_size", DEFAULT_MAX_UPLOAD_SIZE)),
+        )
+        _stores[datasette] = store
+    return store
@@ -1,9 +1,23 @@
-import httpx
+import asyncio
+import datetime
+import email.utils
+import importlib.util
+import io
+import logging
 import os
+import random
+import time
+from dataclasses import dataclass
 
+import httpx
 from pydantic import BaseModel
 
+from .metrics import instrument_transcribe
+
+logger = logging.getLogger(__name__)
+
 TRANSCRIPTION_URL = "https://api.mistral.ai/v1/audio/transcriptions"
+DEFAULT_MODEL = "voxtral-mini-2602"
 
 
 class TranscriptionSegment(BaseModel):
@@ -20,6 +34,8 @@ class TranscriptionUsage(BaseModel):
     total_tokens: int | None = None
     completion_tokens: int | None = None
     num_cached_tokens: int | None = None
+    # Set when the response came from scribe's response cache, not the API
+    cached: bool | None = None
 
 
 class TranscriptionResponse(BaseModel):
@@ -31,41 +47,284 @@ class TranscriptionResponse(BaseModel):
     finish_reason: str | None = None
 
 
-async def transcribe(
-    file_url: str | None = None,
-    *,
-    file_data: bytes | None = None,
-    filename: str | None = None,
-    model: str = "voxtral-mini-2602",
-    diarize: bool = True,
-    timestamp_granularities: list[str] | None = None,
-    api_key: str | None = None,
-) -> TranscriptionResponse:
-    if api_key is None:
-        api_key = os.environ["MISTRAL_API_KEY"]
-    if timestamp_granularities is None:
-        timestamp_granularities = ["segment"]
-
-    data = {
-        "model": model,
-        "diarize": str(diarize).lower(),
-    }
-    for granularity in timestamp_granularities:
-        data["timestamp_granularities"] = granularity
-
-    files = None
-    if file_data is not None:
-        files = {"file": (filename or "audio.mp3", file_data)}
-    else:
-        data["file_url"] = file_url or ""
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            TRANSCRIPTION_URL,
-            headers={"x-api-key": api_key},
-            data=data,
-            files=files,
-            timeout=300,
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class ClientStats:
+    requests: int = 0
+    retries: int = 0
+    # 429 responses from the API
+    throttled: int = 0
+    # Requests held back by the client-side rate limits, and for how long
+    rate_limit_waits: int = 0
+    rate_limit_wait_seconds: float = 0.0
+    failures: int = 0
+    # File bytes sent and the seconds spent sending them, for the upload rate
+    upload_bytes: int = 0
+    upload_seconds: float = 0.0
+
+
+class _TimedUpload(io.BytesIO):
+    """File data that times how long the request body takes to send.
+
+    httpx reads multipart files in chunks as it writes them to the
+    connection, so the time from the first read to the empty last one is the
+    upload, give or take the socket buffer.
+    """
+
+    def __init__(self, data: bytes, stats: ClientStats):
+        super().__init__(data)
+        self.size = len(data)
+        self.stats = stats
+        self.started = None
+
+    def seek(self, *args):
+        # httpx seeks back to the start before every attempt
+        self.started = None
+        return super().seek(*args)
+
+    def read(self, size=-1):
+        if self.started is None:
+            self.started = time.monotonic()
+        chunk = super().read(size)
+        if not chunk:
+            self.stats.upload_bytes += self.size
+            self.stats.upload_seconds += time.monotonic() - self.started
+        return chunk
+
+
+class TokenBucket:
+    """Allows ``per_minute`` units per minute, in bursts of up to a minute's worth.
+
+    ``adjust()`` settles an estimate once the real cost is known; the bucket
+    may go into debt, which later callers wait out.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Wait until ``amount`` is available and take it. Returns seconds waited."""
+        amount = min(amount, self.capacity)
+        # The lock queues callers, so they are served in order
+        async with self._lock:
+            self._refill()
+            waited = 0.0
+            if self.tokens < amount:
+                waited = (amount - self.tokens) / self.rate
+                await asyncio.sleep(waited)
+                self._refill()
+            self.tokens -= amount
+            return waited
+
+    def adjust(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(
+        (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0
+    )
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class VoxtralClient:
+    """A long-lived, pooled client for the transcription API.
+
+    Transient failures — 429, 5xx and transport errors — are retried with
+    exponential backoff and full jitter, waiting at least as long as any
+    Retry-After header asks. Optional token buckets keep requests and audio
+    seconds per minute under the account's limits before the API has to say
+    so. Counters are kept in ``stats``.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key: str | None = None,
+        max_connections: int = 10,
+        max_retries: int = 4,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        requests_per_minute: float | None = None,
+        audio_seconds_per_minute: float | None = None,
+        timeout: float = 300,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.request_limit = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.audio_limit = (
+            TokenBucket(audio_seconds_per_minute) if audio_seconds_per_minute else None
+        )
+        self.stats = ClientStats()
+        self._client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout, connect=10),
+            transport=transport,
         )
-        response.raise_for_status()
-        return TranscriptionResponse.model_validate(response.json())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _throttle(self, audio_seconds: float | None):
+        waited = 0.0
+        if self.request_limit:
+            waited += await self.request_limit.acquire()
+        if self.audio_limit:
+            # Without an estimate this still waits out any debt left by
+            # earlier responses that came in over theirs
+            waited += await self.audio_limit.acquire(audio_seconds or 0)
+        if waited:
+            self.stats.rate_limit_waits += 1
+            self.stats.rate_limit_wait_seconds += waited
+
+    def _delay(self, attempt: int, response: httpx.Response | None) -> float:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @instrument_transcribe
+    async def transcribe(
+        self,
+        file_url: str | None = None,
+        *,
+        file_data: bytes | None = None,
+        filename: str | None = None,
+        model: str = DEFAULT_MODEL,
+        diarize: bool = True,
+        timestamp_granularities: list[str] | None = None,
+        audio_seconds: float | None = None,
+    ) -> TranscriptionResponse:
+        """Transcribe a URL or file. ``audio_seconds`` is an estimate of the
+        audio's length for the audio rate limit, settled from the response."""
+        api_key = self.api_key or os.environ["MISTRAL_API_KEY"]
+        if timestamp_granularities is None:
+            timestamp_granularities = ["segment"]
+
+        data = {
+            "model": model,
+            "diarize": str(diarize).lower(),
+        }
+        for granularity in timestamp_granularities:
+            data["timestamp_granularities"] = granularity
+
+        files = None
+        if file_data is not None:
+            files = {
+                "file": (filename or "audio.mp3", _TimedUpload(file_data, self.stats))
+            }
+        else:
+            data["file_url"] = file_url or ""
+
+        attempt = 0
+        while True:
+            await self._throttle(audio_seconds)
+            self.stats.requests += 1
+            response = None
+            try:
+                response = await self._client.post(
+                    TRANSCRIPTION_URL,
+                    headers={"x-api-key": api_key},
+                    data=data,
+                    files=files,
+                )
+                if response.status_code == 429:
+                    self.stats.throttled += 1
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    break
+                error: Exception = httpx.HTTPStatusError(
+                    f"{response.status_code} {response.reason_phrase}",
+                    request=response.request,
+                    response=response,
+                )
+            except httpx.TransportError as e:
+                error = e
+            except httpx.HTTPStatusError:
+                self.stats.failures += 1
+                raise
+            if attempt >= self.max_retries:
+                self.stats.failures += 1
+                raise error
+            delay = self._delay(attempt, response)
+            attempt += 1
+            self.stats.retries += 1
+            logger.warning(
+                "Transcription request failed (%s), retry %s of %s in %.1fs",
+                error,
+                attempt,
+                self.max_retries,
+                delay,
+            )
+            await asyncio.sleep(delay)
+
+        result = TranscriptionResponse.model_validate(response.json())
+        if self.audio_limit and result.usage and result.usage.prompt_audio_seconds:
+            self.audio_limit.adjust(
+                result.usage.prompt_audio_seconds - (audio_seconds or 0)
+            )
+        return result
+
+
+async def transcribe(file_url: str | None = None, **kwargs) -> TranscriptionResponse:
+    """One-off transcription with a short-lived client."""
+    async with VoxtralClient(api_key=kwargs.pop("api_key", None)) as client:
+        return await client.transcribe(file_url, **kwargs)
+
+
+def _float_or_none(value) -> float | None:
+    return None if value is None else float(value)
+
+
+def voxtral_client_from_config(config: dict | None) -> VoxtralClient:
+    config = config or {}
+    return VoxtralClient(
+        max_connections=int(config.get("max_connections", 10)),
+        max_retries=int(config.get("max_retries", 4)),
+        backoff=float(config.get("backoff", 1.0)),
+        max_backoff=float(config.get("max_backoff", 60.0)),
+        requests_per_minute=_float_or_none(config.get("requests_per_minute")),
+        audio_seconds_per_minute=_float_or_none(config.get("audio_seconds_per_minute")),
+    )
@@ -0,0 +1,182 @@
+"""Precomputed waveform peaks for the audio player.
+
+Audio is decoded once by ffmpeg to mono 16-bit PCM at ``SAMPLE_RATE`` and
+reduced to min/max pairs at several resolutions, so the player can draw a
+waveform without downloading the audio. The decoded PCM is streamed and
+reduced as it arrives, so memory stays flat however long the recording is.
+
+The peaks are stored in ``datasette_scribe_waveforms`` in this little-endian
+binary format::
+
+    header    magic "SCWF", version u8, level count u8, reserved u16,
+              sample rate u32, total samples u64
+    levels    per level: samples per peak u32, peak count u32
+    data      per level, in the same order: peak count (min, max) int8 pairs
+
+Level 0 is the finest; each following level is ``LEVEL_FACTOR`` times
+coarser, down to about ``MIN_PEAKS`` peaks. NumPy does the reduction and is
+an optional dependency.
+"""
+
+import struct
+
+from . import ffmpeg
+
+SAMPLE_RATE = 8000
+# About 31 peaks a second at the finest level, 225KB for an hour of audio
+SAMPLES_PER_PEAK = 256
+LEVEL_FACTOR = 4
+MIN_PEAKS = 1024
+CONTENT_TYPE = "application/vnd.scribe.waveform"
+
+MAGIC = b"SCWF"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBHIQ")
+_LEVEL = struct.Struct("<II")
+
+
+def require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(
+            "numpy is required for waveform peaks. Install it with: "
+            "uv pip install 'datasette-scribe[waveform]'"
+        )
+    return numpy
+
+
+class PeakReducer:
+    """Reduces a stream of s16le PCM bytes to min/max peaks at every level."""
+
+    def __init__(self, samples_per_peak: int = SAMPLES_PER_PEAK):
+        self.np = require_numpy()
+        self.samples_per_peak = samples_per_peak
+        self.samples = 0
+        self._pending = b""
+        self._mins = []
+        self._maxs = []
+
+    def feed(self, data: bytes):
+        data = self._pending + data
+        # Only whole peaks are reduced; the remainder waits for more data
+        usable = len(data) - len(data) % (self.samples_per_peak * 2)
+        self._pending = data[usable:]
+        if usable:
+            self._reduce(self.np.frombuffer(data, dtype="<i2", count=usable // 2))
+
+    def _reduce(self, samples):
+        self.samples += len(samples)
+        blocks = samples.reshape(-1, self.samples_per_peak)
+        # The top 8 bits are plenty to draw with, at half the size
+        self._mins.append((blocks.min(axis=1) >> 8).astype(self.np.int8))
+        self._maxs.append((blocks.max(axis=1) >> 8).astype(self.np.int8))
+
+    def levels(self) -> list[tuple[int, "object", "object"]]:
+        """(samples per peak, mins, maxs) for each level, finest first."""
+        np = self.np
+        if len(self._pending) >= 2:
+            # Pad the last partial peak with its own first sample, so it
+            # doesn't pick up silence that isn't in the recording
+            tail = np.frombuffer(
+                self._pending, dtype="<i2", count=len(self._pending) // 2
+            )
+            self._reduce(np.resize(tail, self.samples_per_peak))
+            self.samples -= self.samples_per_peak - len(tail)
+        self._pending = b""
+        mins = np.concatenate(self._mins) if self._mins else np.zeros(0, np.int8)
+        maxs = np.concatenate(self._maxs) if self._maxs else np.zeros(0, np.int8)
+        levels = [(self.samples_per_peak, mins, maxs)]
+        samples_per_peak = self.samples_per_peak
+        while len(mins) > MIN_PEAKS:
+            pad = -len(mins) % LEVEL_FACTOR
+            mins = np.concatenate([mins, np.repeat(mins[-1:], pad)])
+            maxs = np.concatenate([maxs, np.repeat(maxs[-1:], pad)])
+            mins = mins.reshape(-1, LEVEL_FACTOR).min(axis=1)
+            maxs = maxs.reshape(-1, LEVEL_FACTOR).max(axis=1)
+            samples_per_peak *= LEVEL_FACTOR
+            levels.append((samples_per_peak, mins, maxs))
+        return levels
+
+
+def pack_peaks(levels, *, samples: int, sample_rate: int = SAMPLE_RATE) -> bytes:
+    np = require_numpy()
+    parts = [_HEADER.pack(MAGIC, VERSION, len(levels), 0, sample_rate, samples)]
+    parts.extend(_LEVEL.pack(spp, len(mins)) for spp, mins, _ in levels)
+    for _, mins, maxs in levels:
+        parts.append(np.column_stack([mins, maxs]).astype(np.int8).tobytes())
+    return b"".join(parts)
+
+
+def unpack_peaks(data: bytes) -> dict:
+    """The header and levels of packed peaks, with (min, max) pairs as lists."""
+    magic, version, count, _, sample_rate, samples = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a scribe waveform")
+    offset = _HEADER.size + count * _LEVEL.size
+    levels = []
+    for i in range(count):
+        spp, peaks = _LEVEL.unpack_from(data, _HEADER.size + i * _LEVEL.size)
+        pairs = struct.unpack_from(f"<{peaks * 2}b", data, offset)
+        levels.append(
+            {"samples_per_peak": spp, "peaks": list(zip(pairs[::2], pairs[1::2]))}
+        )
+        offset += peaks * 2
+    return {"sample_rate": sample_rate, "samples": samples, "levels": levels}
+
+
+async def compute_peaks(source: str) -> bytes:
+    """Decode ``source``, a path or http(s) URL, and return its packed peaks."""
+    reducer = PeakReducer()
+    async for chunk in ffmpeg.stream(
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-loglevel",
+        "error",
+        *ffmpeg.input_args(source),
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-f",
+        "s16le",
+        "-",
+    ):
+        reducer.feed(chunk)
+    levels = reducer.levels()
+    return pack_peaks(levels, samples=reducer.samples)
+
+
+async def compute_peaks_for_audio(path: str | None, url: str | None) -> bytes:
+    """Peaks for uploaded audio at ``path``, or for ``url`` when there is none."""
+    if path is not None:
+        return await compute_peaks(path)
+    if url is None or not ffmpeg.is_url(url):
+        raise ValueError("No audio to compute peaks for")
+    # ffmpeg reads http(s) URLs itself
+    return await compute_peaks(url)
+
+
+def store_peaks(conn, transcription_id: int, data: bytes):
+    conn.execute(
+        "insert or replace into datasette_scribe_waveforms (transcription_id, data, created_at)"
+        " values (?, ?, datetime('now', 'subsec'))",
+        [transcription_id, data],
+    )
+
+
+def waveform_version(created_at: str) -> str:
+    """A token that changes whenever the peaks are recomputed."""
+    return "".join(c for c in created_at if c.isdigit())
+
+
+def waveform_available() -> bool:
+    """Whether peaks can be computed here: NumPy imports and ffmpeg is on PATH."""
+    try:
+        require_numpy()
+        ffmpeg.require()
+    except (RuntimeError, ffmpeg.FFmpegError):
+        return False
+    return True
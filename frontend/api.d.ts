@@ -4,6 +4,681 @@
  */
 
 export interface paths {
+    "/-/api/scribe/new": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        post: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path?: never;
+                cookie?: never;
+            };
+            requestBody: {
+                content: {
+                    "application/json": {
+                        /** Database */
+                        database: string;
+                        /**
+                         * Url
+                         * @default null
+                         */
+                        url?: string | null;
+                        /**
+                         * File Data
+                         * @default null
+                         */
+                        file_data?: string | null;
+                        /**
+                         * Filename
+                         * @default null
+                         */
+                        filename?: string | null;
+                        /**
+                         * Content Type
+                         * @default null
+                         */
+                        content_type?: string | null;
+                        /**
+                         * Collection Id
+                         * @default null
+                         */
+                        collection_id?: number | null;
+                        /**
+                         * No Cache
+                         * @default false
+                         */
+                        no_cache?: boolean;
+                    };
+                };
+            };
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Id
+                             * @default null
+                             */
+                            id: number | null;
+                            /**
+                             * Status
+                             * @default null
+                             */
+                            status: string | null;
+                            /**
+                             * Cached
+                             * @default false
+                             */
+                            cached: boolean;
+                            /**
+                             * Entries Count
+                             * @default null
+                             */
+                            entries_count: number | null;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/-/api/scribe/status": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path?: never;
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Queue Depth */
+                            queue_depth: number;
+                            /** @default null */
+                            api: components["schemas"]["ApiClientStats"] | null;
+                            /** @default null */
+                            preprocess: components["schemas"]["ApiPreprocessStats"] | null;
+                        };
+                    };
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/-/api/scribe/metrics": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path?: never;
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content?: never;
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/transcription/{transcription_id}/status": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Id */
+                            id: number;
+                            /** Status */
+                            status: string;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                            /**
+                             * Attempts
+                             * @default 0
+                             */
+                            attempts: number;
+                        };
+                    };
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/transcriptions": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Transcriptions
+                             * @default []
+                             */
+                            transcriptions: components["schemas"]["TranscriptionSummary"][];
+                            /**
+                             * Next Cursor
+                             * @default null
+                             */
+                            next_cursor: string | null;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/transcription/{transcription_id}/entries": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Entries
+                             * @default []
+                             */
+                            entries: components["schemas"]["TranscriptionEntry"][];
+                            /**
+                             * Next Cursor
+                             * @default null
+                             */
+                            next_cursor: string | null;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/transcription/{transcription_id}/changes": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Version
+                             * @default 0
+                             */
+                            version: number;
+                            /**
+                             * Edits
+                             * @default []
+                             */
+                            edits: components["schemas"]["TranscriptionEdit"][];
+                            /**
+                             * Entries
+                             * @default []
+                             */
+                            entries: components["schemas"]["TranscriptionEntry"][];
+                            /**
+                             * Speakers
+                             * @default null
+                             */
+                            speakers: components["schemas"]["TranscriptionSpeaker"][] | null;
+                            /**
+                             * Reset
+                             * @default false
+                             */
+                            reset: boolean;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/-/api/scribe/transcription/{transcription_id}/retry": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        post: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody: {
+                content: {
+                    "application/json": {
+                        /** Database */
+                        database: string;
+                    };
+                };
+            };
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Id
+                             * @default null
+                             */
+                            id: number | null;
+                            /**
+                             * Status
+                             * @default null
+                             */
+                            status: string | null;
+                            /**
+                             * Cached
+                             * @default false
+                             */
+                            cached: boolean;
+                            /**
+                             * Entries Count
+                             * @default null
+                             */
+                            entries_count: number | null;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/transcription/{transcription_id}/audio": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content?: never;
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/transcription/{transcription_id}/waveform": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content?: never;
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/-/api/scribe/entry/{entry_id}/edit": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        post: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    entry_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody: {
+                content: {
+                    "application/json": {
+                        /** Database */
+                        database: string;
+                        /**
+                         * Text
+                         * @default null
+                         */
+                        text?: string | null;
+                        /**
+                         * Speaker Id
+                         * @default null
+                         */
+                        speaker_id?: string | null;
+                    };
+                };
+            };
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/-/api/scribe/transcription/{transcription_id}/edits": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        post: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody: {
+                content: {
+                    "application/json": {
+                        /** Database */
+                        database: string;
+                        /** Operations */
+                        operations: components["schemas"]["EditOperation"][];
+                    };
+                };
+            };
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Results
+                             * @default []
+                             */
+                            results: components["schemas"]["EditOperationResult"][];
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
     "/{database}/-/scribe": {
         parameters: {
             query?: never;
@@ -110,6 +785,41 @@ export interface paths {
         patch?: never;
         trace?: never;
     };
+    "/{database}/-/scribe/search": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content?: never;
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
     "/{database}/-/scribe/collections/{collection_id}": {
         parameters: {
             query?: never;
@@ -134,67 +844,114 @@ export interface paths {
                     headers: {
                         [name: string]: unknown;
                     };
-                    content?: never;
+                    content?: never;
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/-/api/scribe/uploads": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        post: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path?: never;
+                cookie?: never;
+            };
+            requestBody: {
+                content: {
+                    "application/json": {
+                        /** Database */
+                        database: string;
+                        /** Filename */
+                        filename: string;
+                        /**
+                         * Content Type
+                         * @default null
+                         */
+                        content_type?: string | null;
+                        /** Size */
+                        size: number;
+                    };
+                };
+            };
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Upload Id
+                             * @default null
+                             */
+                            upload_id: string | null;
+                            /**
+                             * Offset
+                             * @default 0
+                             */
+                            offset: number;
+                            /**
+                             * Size
+                             * @default null
+                             */
+                            size: number | null;
+                            /**
+                             * Chunk Size
+                             * @default null
+                             */
+                            chunk_size: number | null;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
                 };
             };
         };
-        put?: never;
-        post?: never;
         delete?: never;
         options?: never;
         head?: never;
         patch?: never;
         trace?: never;
     };
-    "/-/api/scribe/new": {
+    "/-/api/scribe/uploads/{upload_id}": {
         parameters: {
             query?: never;
             header?: never;
             path?: never;
             cookie?: never;
         };
-        get?: never;
-        put?: never;
-        post: {
+        get: {
             parameters: {
                 query?: never;
                 header?: never;
-                path?: never;
-                cookie?: never;
-            };
-            requestBody: {
-                content: {
-                    "application/json": {
-                        /** Database */
-                        database: string;
-                        /**
-                         * Url
-                         * @default null
-                         */
-                        url?: string | null;
-                        /**
-                         * File Data
-                         * @default null
-                         */
-                        file_data?: string | null;
-                        /**
-                         * Filename
-                         * @default null
-                         */
-                        filename?: string | null;
-                        /**
-                         * Content Type
-                         * @default null
-                         */
-                        content_type?: string | null;
-                        /**
-                         * Collection Id
-                         * @default null
-                         */
-                        collection_id?: number | null;
-                    };
+                path: {
+                    upload_id: string;
                 };
+                cookie?: never;
             };
+            requestBody?: never;
             responses: {
                 /** @description OK */
                 200: {
@@ -206,15 +963,25 @@ export interface paths {
                             /** Ok */
                             ok: boolean;
                             /**
-                             * Id
+                             * Upload Id
                              * @default null
                              */
-                            id: number | null;
+                            upload_id: string | null;
                             /**
-                             * Entries Count
+                             * Offset
+                             * @default 0
+                             */
+                            offset: number;
+                            /**
+                             * Size
                              * @default null
                              */
-                            entries_count: number | null;
+                            size: number | null;
+                            /**
+                             * Chunk Size
+                             * @default null
+                             */
+                            chunk_size: number | null;
                             /**
                              * Error
                              * @default null
@@ -225,26 +992,29 @@ export interface paths {
                 };
             };
         };
+        put?: never;
+        post?: never;
         delete?: never;
         options?: never;
         head?: never;
         patch?: never;
         trace?: never;
     };
-    "/{database}/-/api/scribe/transcription/{transcription_id}/audio": {
+    "/-/api/scribe/uploads/{upload_id}/chunk": {
         parameters: {
             query?: never;
             header?: never;
             path?: never;
             cookie?: never;
         };
-        get: {
+        get?: never;
+        put?: never;
+        post: {
             parameters: {
                 query?: never;
                 header?: never;
                 path: {
-                    database: string;
-                    transcription_id: string;
+                    upload_id: string;
                 };
                 cookie?: never;
             };
@@ -255,19 +1025,47 @@ export interface paths {
                     headers: {
                         [name: string]: unknown;
                     };
-                    content?: never;
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Upload Id
+                             * @default null
+                             */
+                            upload_id: string | null;
+                            /**
+                             * Offset
+                             * @default 0
+                             */
+                            offset: number;
+                            /**
+                             * Size
+                             * @default null
+                             */
+                            size: number | null;
+                            /**
+                             * Chunk Size
+                             * @default null
+                             */
+                            chunk_size: number | null;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
                 };
             };
         };
-        put?: never;
-        post?: never;
         delete?: never;
         options?: never;
         head?: never;
         patch?: never;
         trace?: never;
     };
-    "/-/api/scribe/entry/{entry_id}/edit": {
+    "/-/api/scribe/uploads/{upload_id}/finish": {
         parameters: {
             query?: never;
             header?: never;
@@ -281,25 +1079,23 @@ export interface paths {
                 query?: never;
                 header?: never;
                 path: {
-                    entry_id: string;
+                    upload_id: string;
                 };
                 cookie?: never;
             };
             requestBody: {
                 content: {
                     "application/json": {
-                        /** Database */
-                        database: string;
                         /**
-                         * Text
+                         * Collection Id
                          * @default null
                          */
-                        text?: string | null;
+                        collection_id?: number | null;
                         /**
-                         * Speaker Id
-                         * @default null
+                         * No Cache
+                         * @default false
                          */
-                        speaker_id?: string | null;
+                        no_cache?: boolean;
                     };
                 };
             };
@@ -313,6 +1109,26 @@ export interface paths {
                         "application/json": {
                             /** Ok */
                             ok: boolean;
+                            /**
+                             * Id
+                             * @default null
+                             */
+                            id: number | null;
+                            /**
+                             * Status
+                             * @default null
+                             */
+                            status: string | null;
+                            /**
+                             * Cached
+                             * @default false
+                             */
+                            cached: boolean;
+                            /**
+                             * Entries Count
+                             * @default null
+                             */
+                            entries_count: number | null;
                             /**
                              * Error
                              * @default null
@@ -830,10 +1646,379 @@ export interface paths {
         patch?: never;
         trace?: never;
     };
+    "/{database}/-/api/scribe/search": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content: {
+                        "application/json": {
+                            /** Ok */
+                            ok: boolean;
+                            /**
+                             * Hits
+                             * @default []
+                             */
+                            hits: components["schemas"]["SearchHit"][];
+                            /**
+                             * Has More
+                             * @default false
+                             */
+                            has_more: boolean;
+                            /**
+                             * Ranked
+                             * @default true
+                             */
+                            ranked: boolean;
+                            /**
+                             * Index Ready
+                             * @default true
+                             */
+                            index_ready: boolean;
+                            /**
+                             * Error
+                             * @default null
+                             */
+                            error: string | null;
+                        };
+                    };
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/transcription/{transcription_id}/export": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                    transcription_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content?: never;
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/{database}/-/api/scribe/collections/{collection_id}/export": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get: {
+            parameters: {
+                query?: never;
+                header?: never;
+                path: {
+                    database: string;
+                    collection_id: string;
+                };
+                cookie?: never;
+            };
+            requestBody?: never;
+            responses: {
+                /** @description OK */
+                200: {
+                    headers: {
+                        [name: string]: unknown;
+                    };
+                    content?: never;
+                };
+            };
+        };
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
 }
 export type webhooks = Record<string, never>;
 export interface components {
-    schemas: never;
+    schemas: {
+        ApiClientStats: {
+            /** Requests */
+            requests: number;
+            /** Retries */
+            retries: number;
+            /** Throttled */
+            throttled: number;
+            /** Rate Limit Waits */
+            rate_limit_waits: number;
+            /** Rate Limit Wait Seconds */
+            rate_limit_wait_seconds: number;
+            /** Failures */
+            failures: number;
+            /**
+             * Upload Bytes
+             * @default 0
+             */
+            upload_bytes: number;
+            /**
+             * Upload Seconds
+             * @default 0.0
+             */
+            upload_seconds: number;
+        };
+        ApiPreprocessStats: {
+            /** Files */
+            files: number;
+            /** Unchanged */
+            unchanged: number;
+            /** Input Bytes */
+            input_bytes: number;
+            /** Output Bytes */
+            output_bytes: number;
+            /** Seconds */
+            seconds: number;
+            /** Bytes Saved */
+            bytes_saved: number;
+            /**
+             * Upload Seconds Saved
+             * @default null
+             */
+            upload_seconds_saved: number | null;
+        };
+        TranscriptionSummary: {
+            /** Id */
+            id: number;
+            /**
+             * Url
+             * @default null
+             */
+            url: string | null;
+            /**
+             * Input Type
+             * @default "url"
+             */
+            input_type: string;
+            /**
+             * Filename
+             * @default null
+             */
+            filename: string | null;
+            /** Model */
+            model: string;
+            /** Granularity */
+            granularity: string;
+            /** Submitted At */
+            submitted_at: string;
+            /**
+             * Completed At
+             * @default null
+             */
+            completed_at: string | null;
+            /**
+             * Error
+             * @default null
+             */
+            error: string | null;
+            /**
+             * Status
+             * @default "completed"
+             */
+            status: string;
+            /**
+             * Entries Count
+             * @default 0
+             */
+            entries_count: number;
+            /**
+             * Duration
+             * @default null
+             */
+            duration: number | null;
+            /**
+             * Speakers Count
+             * @default 0
+             */
+            speakers_count: number;
+        };
+        TranscriptionEntry: {
+            /** Id */
+            id: number;
+            /** Start */
+            start: number;
+            /** End */
+            end: number;
+            /**
+             * Speaker Id
+             * @default null
+             */
+            speaker_id: string | null;
+            /** Text */
+            text: string;
+            /**
+             * Original Speaker Id
+             * @default null
+             */
+            original_speaker_id: string | null;
+            /**
+             * Original Text
+             * @default null
+             */
+            original_text: string | null;
+        };
+        TranscriptionEdit: {
+            /** Id */
+            id: number;
+            /** Operation */
+            operation: string;
+            /** Detail */
+            detail: string;
+            /** Created At */
+            created_at: string;
+            /**
+             * Entry Id
+             * @default null
+             */
+            entry_id: number | null;
+        };
+        TranscriptionSpeaker: {
+            /** Id */
+            id: number;
+            /** Name */
+            name: string;
+            /**
+             * Is Original
+             * @default true
+             */
+            is_original: boolean;
+            /**
+             * Used In Other Transcriptions
+             * @default false
+             */
+            used_in_other_transcriptions: boolean;
+            /**
+             * Entries Count
+             * @default 0
+             */
+            entries_count: number;
+        };
+        EditOperation: {
+            /** Op */
+            op: string;
+            /**
+             * Entry Id
+             * @default null
+             */
+            entry_id: number | null;
+            /**
+             * Text
+             * @default null
+             */
+            text: string | null;
+            /**
+             * Speaker Id
+             * @default null
+             */
+            speaker_id: string | null;
+            /**
+             * Name
+             * @default null
+             */
+            name: string | null;
+            /**
+             * From Speaker
+             * @default null
+             */
+            from_speaker: string | null;
+            /**
+             * To Speaker
+             * @default null
+             */
+            to_speaker: string | null;
+        };
+        EditOperationResult: {
+            /** Ok */
+            ok: boolean;
+            /**
+             * Affected Entries
+             * @default 0
+             */
+            affected_entries: number;
+            /**
+             * Speaker Id
+             * @default null
+             */
+            speaker_id: number | null;
+            /**
+             * Error
+             * @default null
+             */
+            error: string | null;
+        };
+        SearchHit: {
+            /** Entry Id */
+            entry_id: number;
+            /** Transcription Id */
+            transcription_id: number;
+            /** Transcription Title */
+            transcription_title: string;
+            /** Start */
+            start: number;
+            /** End */
+            end: number;
+            /**
+             * Speaker Id
+             * @default null
+             */
+            speaker_id: string | null;
+            /** Snippet Html */
+            snippet_html: string;
+        };
+    };
     responses: never;
     parameters: never;
     requestBodies: never;
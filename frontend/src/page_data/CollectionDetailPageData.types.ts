@@ -19,11 +19,13 @@ export type Granularity = string;
 export type SubmittedAt = string;
 export type CompletedAt = string | null;
 export type Error = string | null;
+export type Status = string;
 export type EntriesCount = number;
 export type Duration = number | null;
 export type SpeakersCount = number;
 export type Transcriptions = TranscriptionSummary[];
 export type AvailableTranscriptions = TranscriptionSummary[];
+export type AvailableNextCursor = string | null;
 export type Name1 = string;
 export type EntryCount = number;
 export type TranscriptionCount = number;
@@ -34,6 +36,7 @@ export interface CollectionDetailPageData {
   collection: CollectionSummary;
   transcriptions?: Transcriptions;
   available_transcriptions?: AvailableTranscriptions;
+  available_next_cursor?: AvailableNextCursor;
   speakers?: Speakers;
   [k: string]: unknown;
 }
@@ -54,6 +57,7 @@ export interface TranscriptionSummary {
   submitted_at: SubmittedAt;
   completed_at?: CompletedAt;
   error?: Error;
+  status?: Status;
   entries_count?: EntriesCount;
   duration?: Duration;
   speakers_count?: SpeakersCount;
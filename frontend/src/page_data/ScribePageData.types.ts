@@ -19,17 +19,24 @@ export type Granularity = string;
 export type SubmittedAt = string;
 export type CompletedAt = string | null;
 export type Error = string | null;
+export type Status = string;
 export type EntriesCount = number;
 export type Duration = number | null;
 export type SpeakersCount = number;
 export type Transcriptions = TranscriptionSummary[];
+export type TranscriptionsCount = number;
+export type TranscriptionsNextCursor = string | null;
 export type Collections = CollectionWithTranscriptions[];
 export type UncollectedTranscriptions = TranscriptionSummary[];
+export type UncollectedCount = number;
+export type UncollectedNextCursor = string | null;
 
 export interface ScribePageData {
   database_name: DatabaseName;
   collections?: Collections;
   uncollected_transcriptions?: UncollectedTranscriptions;
+  uncollected_count?: UncollectedCount;
+  uncollected_next_cursor?: UncollectedNextCursor;
   [k: string]: unknown;
 }
 export interface CollectionWithTranscriptions {
@@ -38,6 +45,8 @@ export interface CollectionWithTranscriptions {
   description?: Description;
   created_at?: CreatedAt;
   transcriptions?: Transcriptions;
+  transcriptions_count?: TranscriptionsCount;
+  transcriptions_next_cursor?: TranscriptionsNextCursor;
   [k: string]: unknown;
 }
 export interface TranscriptionSummary {
@@ -50,6 +59,7 @@ export interface TranscriptionSummary {
   submitted_at: SubmittedAt;
   completed_at?: CompletedAt;
   error?: Error;
+  status?: Status;
   entries_count?: EntriesCount;
   duration?: Duration;
   speakers_count?: SpeakersCount;
@@ -15,10 +15,12 @@ export type Granularity = string;
 export type SubmittedAt = string;
 export type CompletedAt = string | null;
 export type Error = string | null;
+export type Status = string;
 export type EntriesCount = number;
 export type Duration = number | null;
 export type SpeakersCount = number;
 export type AudioUrl = string | null;
+export type PeaksUrl = string | null;
 export type Id1 = number;
 export type Start = number;
 export type End = number;
@@ -27,10 +29,12 @@ export type Text = string;
 export type OriginalSpeakerId = string | null;
 export type OriginalText = string | null;
 export type Entries = TranscriptionEntry[];
+export type EntriesNextCursor = string | null;
 export type Id2 = number;
 export type Name = string;
 export type IsOriginal = boolean;
 export type UsedInOtherTranscriptions = boolean;
+export type EntriesCount1 = number;
 export type Speakers = TranscriptionSpeaker[];
 export type AllSpeakers = TranscriptionSpeaker[];
 export type Id3 = number;
@@ -44,17 +48,21 @@ export type Name1 = string;
 export type Description = string;
 export type CreatedAt1 = string;
 export type AllCollections = CollectionSummary[];
+export type Version = number;
 
 export interface TranscriptionDetailPageData {
   database_name: DatabaseName;
   transcription: TranscriptionSummary;
   audio_url?: AudioUrl;
+  peaks_url?: PeaksUrl;
   entries?: Entries;
+  entries_next_cursor?: EntriesNextCursor;
   speakers?: Speakers;
   all_speakers?: AllSpeakers;
   edits?: Edits;
   collection?: CollectionSummary | null;
   all_collections?: AllCollections;
+  version?: Version;
   [k: string]: unknown;
 }
 export interface TranscriptionSummary {
@@ -67,6 +75,7 @@ export interface TranscriptionSummary {
   submitted_at: SubmittedAt;
   completed_at?: CompletedAt;
   error?: Error;
+  status?: Status;
   entries_count?: EntriesCount;
   duration?: Duration;
   speakers_count?: SpeakersCount;
@@ -87,6 +96,7 @@ export interface TranscriptionSpeaker {
   name: Name;
   is_original?: IsOriginal;
   used_in_other_transcriptions?: UsedInOtherTranscriptions;
+  entries_count?: EntriesCount1;
   [k: string]: unknown;
 }
 export interface TranscriptionEdit {
@@ -0,0 +1,8 @@
+import { mount } from "svelte";
+import SearchPage from "./SearchPage.svelte";
+
+const app = mount(SearchPage, {
+  target: document.getElementById("app-root")!,
+});
+
+export default app;
@@ -0,0 +1,75 @@
+import type { components } from "../../../api.d.ts";
+
+type EditOperation = components["schemas"]["EditOperation"];
+export type EditOperationResult = components["schemas"]["EditOperationResult"];
+export type QueuedEdit = Pick<EditOperation, "op"> & Partial<EditOperation>;
+
+type SendBatch = (operations: EditOperation[]) => Promise<{
+  results: EditOperationResult[];
+  error?: string | null;
+}>;
+
+// The server applies at most this many operations per batch
+const MAX_BATCH = 1000;
+
+/**
+ * Collects edits made in quick succession and sends them as one batch once
+ * there's been a pause of `delay` ms. Each edit resolves with its own result.
+ * The server applies a batch atomically, so if one operation fails, the
+ * others in its batch resolve as not applied too.
+ */
+export function createEditQueue(send: SendBatch, delay = 400) {
+  let pending: {
+    operation: EditOperation;
+    resolve: (result: EditOperationResult) => void;
+  }[] = [];
+  let timer: ReturnType<typeof setTimeout> | null = null;
+
+  async function flush() {
+    if (timer) clearTimeout(timer);
+    timer = null;
+    const batch = pending.slice(0, MAX_BATCH);
+    pending = pending.slice(MAX_BATCH);
+    if (batch.length === 0) return;
+    let results: EditOperationResult[];
+    try {
+      const response = await send(batch.map((p) => p.operation));
+      results = response.results;
+      if (results.length !== batch.length) throw new Error(response.error ?? "Saving edits failed");
+    } catch (e) {
+      const error = e instanceof Error ? e.message : String(e);
+      results = batch.map(() => ({ ok: false, affected_entries: 0, speaker_id: null, error }));
+    }
+    batch.forEach((p, i) => p.resolve(results[i]!));
+  }
+
+  function enqueue(edit: QueuedEdit): Promise<EditOperationResult> {
+    const operation: EditOperation = {
+      entry_id: null,
+      text: null,
+      speaker_id: null,
+      name: null,
+      from_speaker: null,
+      to_speaker: null,
+      ...edit,
+    };
+    const result = new Promise<EditOperationResult>((resolve) =>
+      pending.push({ operation, resolve }),
+    );
+    if (timer) clearTimeout(timer);
+    if (pending.length >= MAX_BATCH) {
+      flush();
+    } else {
+      timer = setTimeout(flush, delay);
+    }
+    return result;
+  }
+
+  return {
+    enqueue,
+    flush,
+    get hasPending() {
+      return pending.length > 0;
+    },
+  };
+}
@@ -0,0 +1,80 @@
+// Reads the packed peaks served by the waveform API; the format is described
+// in datasette_scribe/waveform.py
+
+export interface PeakLevel {
+  samplesPerPeak: number;
+  // Interleaved (min, max) pairs
+  peaks: Int8Array;
+}
+
+export interface Peaks {
+  sampleRate: number;
+  duration: number;
+  // Finest first
+  levels: PeakLevel[];
+}
+
+const HEADER_SIZE = 20;
+const LEVEL_SIZE = 8;
+
+export function parsePeaks(buffer: ArrayBuffer): Peaks {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== "SCWF" || view.getUint8(4) !== 1) {
+    throw new Error("Not a scribe waveform");
+  }
+  const count = view.getUint8(5);
+  const sampleRate = view.getUint32(8, true);
+  const samples = Number(view.getBigUint64(12, true));
+  const levels: PeakLevel[] = [];
+  let offset = HEADER_SIZE + count * LEVEL_SIZE;
+  for (let i = 0; i < count; i++) {
+    const samplesPerPeak = view.getUint32(HEADER_SIZE + i * LEVEL_SIZE, true);
+    const peakCount = view.getUint32(HEADER_SIZE + i * LEVEL_SIZE + 4, true);
+    levels.push({ samplesPerPeak, peaks: new Int8Array(buffer, offset, peakCount * 2) });
+    offset += peakCount * 2;
+  }
+  return { sampleRate, duration: samples / sampleRate, levels };
+}
+
+export async function fetchPeaks(url: string): Promise<Peaks | null> {
+  const response = await fetch(url);
+  if (!response.ok) return null;
+  return parsePeaks(await response.arrayBuffer());
+}
+
+// The coarsest level that still has a peak for every pixel
+function levelFor(peaks: Peaks, pixels: number): PeakLevel {
+  for (let i = peaks.levels.length - 1; i >= 0; i--) {
+    const level = peaks.levels[i]!;
+    if (level.peaks.length / 2 >= pixels) return level;
+  }
+  return peaks.levels[0]!;
+}
+
+export function drawPeaks(canvas: HTMLCanvasElement, peaks: Peaks, color: string) {
+  const ratio = window.devicePixelRatio || 1;
+  const width = Math.round(canvas.clientWidth * ratio);
+  const height = Math.round(canvas.clientHeight * ratio);
+  canvas.width = width;
+  canvas.height = height;
+  const ctx = canvas.getContext("2d");
+  if (!ctx || width === 0 || peaks.levels.length === 0) return;
+  const { peaks: data } = levelFor(peaks, width);
+  const count = data.length / 2;
+  const middle = height / 2;
+  const scale = middle / 128;
+  ctx.fillStyle = color;
+  for (let x = 0; x < width; x++) {
+    const from = Math.floor((x * count) / width);
+    const to = Math.max(from + 1, Math.floor(((x + 1) * count) / width));
+    let min = 0;
+    let max = 0;
+    for (let i = from; i < to && i < count; i++) {
+      min = Math.min(min, data[i * 2]!);
+      max = Math.max(max, data[i * 2 + 1]!);
+    }
+    const top = middle - (max + 1) * scale;
+    ctx.fillRect(x, top, 1, Math.max(1, (max - min + 1) * scale));
+  }
+}
@@ -63,6 +63,7 @@ export default defineConfig({
         new_transcription: "src/pages/new_transcript/index.ts",
         transcription_detail: "src/pages/transcription_detail/index.ts",
         collection_detail: "src/pages/collection_detail/index.ts",
+        search: "src/pages/search/index.ts",
       },
     },
   },
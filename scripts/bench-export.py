@@ -0,0 +1,114 @@
+"""Export speed and peak memory for a collection, in every format.
+
+Builds a collection of transcriptions and drains each export's generator
+through Database.execute, as the endpoint does: once for speed, and once
+tracking peak Python memory with tracemalloc. Peak memory should stay flat
+as the collection grows.
+
+Usage: python scripts/bench-export.py [entries]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from datasette.app import Datasette
+from datasette.utils.sqlite import sqlite3
+
+from datasette_scribe.export import (
+    FORMATS,
+    collection_transcription_ids,
+    export_transcriptions,
+    export_zip,
+)
+from datasette_scribe.migrations import migrate
+from datasette_scribe.stats import refresh_all_stats
+
+ENTRIES_PER_TRANSCRIPTION = 1000
+
+
+def populate(conn, n: int) -> int:
+    transcriptions = (n + ENTRIES_PER_TRANSCRIPTION - 1) // ENTRIES_PER_TRANSCRIPTION
+    conn.execute("insert into datasette_scribe_collections (name) values ('Bench')")
+    conn.executemany(
+        "insert into datasette_scribe_speakers (name) values (?)",
+        [(f"Speaker {s}",) for s in range(4)],
+    )
+    for t in range(1, transcriptions + 1):
+        conn.execute(
+            "insert into datasette_scribe_transcriptions (id, input_type, filename, model, granularity, submitted_at)"
+            " values (?, 'file', ?, 'm', 'segment', datetime('now'))",
+            [t, f"recording-{t}.mp3"],
+        )
+        conn.execute(
+            "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (1, ?)",
+            [t],
+        )
+        count = min(ENTRIES_PER_TRANSCRIPTION, n - (t - 1) * ENTRIES_PER_TRANSCRIPTION)
+        conn.executemany(
+            "insert into datasette_scribe_transcription_entries"
+            " (transcription_id, start, end, speaker_ref, text, original_text, original_speaker_id)"
+            " values (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    t,
+                    i * 2.0,
+                    i * 2.0 + 1.9,
+                    i % 4 + 1,
+                    f"Sentence number {i} of the recording.",
+                    None,
+                    None,
+                )
+                for i in range(count)
+            ],
+        )
+    return transcriptions
+
+
+async def main(n: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        conn = sqlite3.connect(path)  # ty: ignore[unresolved-attribute]
+        migrate(conn)
+        transcriptions = populate(conn, n)
+        refresh_all_stats(conn)
+        conn.commit()
+        conn.close()
+        print(f"{n:,} entries in {transcriptions:,} transcriptions")
+
+        datasette = Datasette([str(path)])
+        db = datasette.get_database("bench")
+
+        async def query(sql, params):
+            return (await db.execute(sql, params)).rows
+
+        async def drain(export, fmt) -> int:
+            size = 0
+            async for chunk in export(
+                query, collection_transcription_ids(query, 1), fmt
+            ):
+                size += len(chunk)
+            return size
+
+        for fmt in FORMATS:
+            export = export_zip if FORMATS[fmt].per_file else export_transcriptions
+            start = time.perf_counter()
+            size = await drain(export, fmt)
+            elapsed = time.perf_counter() - start
+            # Tracing slows it down several times over, so memory gets its own run
+            tracemalloc.start()
+            await drain(export, fmt)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            label = f"{fmt}{' (zip)' if FORMATS[fmt].per_file else ''}"
+            print(
+                f"{label:>10}: {size / 1e6:8.1f}MB in {elapsed:5.1f}s"
+                f" ({n / elapsed:9,.0f} entries/s), peak memory {peak / 1e6:5.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000))
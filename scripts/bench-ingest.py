@@ -0,0 +1,107 @@
+"""Compare per-row execute_write() ingestion with the single-transaction ingest module.
+
+Usage: python scripts/bench-ingest.py [segments]
+"""
+
+import asyncio
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from datasette.app import Datasette
+
+from datasette_scribe.ingest import insert_transcription, store_response
+from datasette_scribe.migrations import migrate
+from datasette_scribe.voxtral_api import TranscriptionResponse, TranscriptionSegment
+
+
+def make_response(n: int) -> TranscriptionResponse:
+    return TranscriptionResponse(
+        model="voxtral-mini-2602",
+        text="",
+        segments=[
+            TranscriptionSegment(
+                text=f"Segment number {i} of the benchmark recording",
+                start=i * 2.0,
+                end=i * 2.0 + 1.9,
+                speaker_id=f"speaker_{i % 4}",
+            )
+            for i in range(n)
+        ],
+    )
+
+
+async def per_row(db, response):
+    tid = await db.execute_write_fn(
+        lambda conn: insert_transcription(
+            conn,
+            url=None,
+            input_type="file",
+            filename="a.mp3",
+            model="m",
+            granularity="segment",
+        )
+    )
+    for segment in response.segments:
+        speaker = f"t{tid}_{segment.speaker_id}"
+        await db.execute_write(
+            "insert or ignore into datasette_scribe_speakers (name, is_original) values (?, 1)",
+            [speaker],
+        )
+        await db.execute_write(
+            "insert into datasette_scribe_transcription_entries"
+            " (transcription_id, start, end, speaker_ref, text, original_text, original_speaker_id)"
+            " values (?, ?, ?, (select id from datasette_scribe_speakers where name = ?), ?, ?, ?)",
+            [
+                tid,
+                segment.start,
+                segment.end,
+                speaker,
+                segment.text,
+                segment.text,
+                segment.speaker_id,
+            ],
+        )
+
+
+async def batched(db, response):
+    def write(conn):
+        tid = insert_transcription(
+            conn,
+            url=None,
+            input_type="file",
+            filename="a.mp3",
+            model="m",
+            granularity="segment",
+        )
+        store_response(conn, tid, response)
+
+    await db.execute_write_fn(write)
+
+
+async def main(n: int):
+    response = make_response(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        conn = sqlite3.connect(path)
+        with conn:
+            migrate(conn)
+        conn.close()
+        datasette = Datasette([str(path)])
+        db = datasette.get_database("bench")
+        for name, fn in (
+            ("per-row execute_write", per_row),
+            ("ingest module", batched),
+        ):
+            start = time.perf_counter()
+            await fn(db, response)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:>22}: {n} segments in {elapsed:.3f}s ({n / elapsed:,.0f} rows/s)"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,142 @@
+"""Throughput of the speaker and collection endpoints under concurrent requests.
+
+Sends batches of concurrent combine, delete, rename and collection requests
+through the API. Reports requests per second, and how many write
+transactions the requests queued and how long the write thread spent on
+them, since Datasette's own per-request overhead dominates end-to-end time.
+Then checks that no entry was left pointing at a deleted speaker.
+
+Usage: python scripts/bench-mutations.py [transcriptions]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from datasette.app import Datasette
+from datasette.utils.sqlite import sqlite3
+
+from datasette_scribe import SCRIBE_ACCESS_NAME
+from datasette_scribe.migrations import migrate
+from datasette_scribe.stats import refresh_all_stats
+
+ENTRIES_PER_TRANSCRIPTION = 200
+ROUNDS = 5
+
+
+def populate(conn, transcriptions: int):
+    for t in range(1, transcriptions + 1):
+        conn.execute(
+            "insert into datasette_scribe_transcriptions (id, input_type, filename, model, granularity, submitted_at)"
+            " values (?, 'file', ?, 'm', 'segment', datetime('now'))",
+            [t, f"recording-{t}.mp3"],
+        )
+    conn.executemany(
+        "insert into datasette_scribe_speakers (name) values (?)",
+        [(f"Guest {g}",) for g in range(3)],
+    )
+    conn.executemany(
+        "insert into datasette_scribe_transcription_entries"
+        " (transcription_id, start, end, speaker_ref, text, original_text, original_speaker_id)"
+        " values (?, ?, ?, ?, 'Some words', 'Some words', 'speaker_0')",
+        [
+            (t, i * 2.0, i * 2.0 + 1.9, i % 3 + 1)
+            for t in range(1, transcriptions + 1)
+            for i in range(ENTRIES_PER_TRANSCRIPTION)
+        ],
+    )
+    conn.executemany(
+        "insert into datasette_scribe_collections (name) values (?)",
+        [(f"Collection {c}",) for c in range(3)],
+    )
+
+
+def requests_for(round: int, transcriptions: int):
+    guest = [f"Guest {(round + g) % 3}" for g in range(3)]
+    for t in range(1, transcriptions + 1):
+        yield (
+            f"/-/api/scribe/transcription/{t}/speakers/combine",
+            {"from_speaker": guest[0], "to_speaker": guest[1]},
+        )
+        yield (
+            f"/-/api/scribe/transcription/{t}/speakers/delete",
+            {"speaker_name": guest[2]},
+        )
+        yield f"/-/api/scribe/transcription/{t}/speakers/create", {"name": guest[0]}
+        yield (
+            f"/-/api/scribe/collections/{round % 3 + 1}/add-transcription",
+            {"transcription_id": t},
+        )
+        yield (
+            f"/-/api/scribe/collections/{round % 3 + 1}/remove-transcription",
+            {"transcription_id": t},
+        )
+    yield "/-/api/scribe/speakers/1/rename", {"new_name": f"Host {round}"}
+
+
+async def main(transcriptions: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        conn = sqlite3.connect(path)  # ty: ignore[unresolved-attribute]
+        migrate(conn)
+        populate(conn, transcriptions)
+        refresh_all_stats(conn)
+        conn.commit()
+        conn.close()
+
+        datasette = Datasette(
+            [str(path)], config={"permissions": {SCRIBE_ACCESS_NAME: True}}
+        )
+        await datasette.invoke_startup()
+        db = datasette.get_database("bench")
+        writes = {"count": 0, "seconds": 0.0}
+        # Every write, execute_write() included, goes through this
+        execute_write_fn = db._execute_write_fn
+
+        def timed(fn):
+            def run(conn):
+                start = time.perf_counter()
+                try:
+                    return fn(conn)
+                finally:
+                    writes["seconds"] += time.perf_counter() - start
+
+            return run
+
+        async def counted_write_fn(fn, *args, **kwargs):
+            writes["count"] += 1
+            return await execute_write_fn(timed(fn), *args, **kwargs)
+
+        db._execute_write_fn = counted_write_fn
+        total = 0
+        start = time.perf_counter()
+        for round in range(ROUNDS):
+            responses = await asyncio.gather(
+                *(
+                    datasette.client.post(url, json={"database": "bench", **body})
+                    for url, body in requests_for(round, transcriptions)
+                )
+            )
+            total += len(responses)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{total:,} requests in {elapsed:.2f}s: {total / elapsed:,.0f} requests/s"
+        )
+        print(
+            f"{writes['count']:,} write transactions, {writes['count'] / total:.1f} per request,"
+            f" {writes['seconds'] * 1000:,.0f}ms on the write thread"
+        )
+
+        orphans = (
+            await db.execute(
+                "select count(*) from datasette_scribe_transcription_entries"
+                " where speaker_ref is not null and speaker_ref not in (select id from datasette_scribe_speakers)"
+            )
+        ).single_value()
+        print(f"entries pointing at a deleted speaker: {orphans:,}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
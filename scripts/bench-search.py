@@ -0,0 +1,153 @@
+"""Measure search index build time and query latency over a synthetic corpus.
+
+Usage: python scripts/bench-search.py [entries]
+"""
+
+import itertools
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from datasette.utils.sqlite import sqlite3
+
+from datasette_scribe.migrations import migrate
+from datasette_scribe.search import (
+    MAX_RANKED_MATCHES,
+    fts_query,
+    index_batch,
+    match_count_sql,
+    search_sql,
+)
+
+ENTRIES_PER_TRANSCRIPTION = 500
+TRANSCRIPTIONS_PER_COLLECTION = 50
+QUERY_RUNS = 50
+
+# A Zipf-ish vocabulary, so some terms match a large share of the corpus
+WORDS = [f"word{i}" for i in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+
+QUERIES: list[tuple[str, str, dict[str, Any]]] = [
+    ("common term", "word0", {}),
+    ("rare term", "word19000", {}),
+    ("two terms", "word1 word50", {}),
+    ("phrase", '"word0 word1"', {}),
+    ("prefix", "word123*", {}),
+    ("collection filter", "word0", {"collection_id": 1}),
+    ("speaker filter", "word0", {"speaker": "t1_speaker_0"}),
+]
+
+
+def populate(conn, n: int):
+    rng = random.Random(0)
+    transcriptions = (n + ENTRIES_PER_TRANSCRIPTION - 1) // ENTRIES_PER_TRANSCRIPTION
+    collections = (
+        transcriptions + TRANSCRIPTIONS_PER_COLLECTION - 1
+    ) // TRANSCRIPTIONS_PER_COLLECTION
+    conn.executemany(
+        "insert into datasette_scribe_collections (id, name) values (?, ?)",
+        [(c + 1, f"Collection {c + 1}") for c in range(collections)],
+    )
+    for t in range(1, transcriptions + 1):
+        conn.execute(
+            "insert into datasette_scribe_transcriptions (id, input_type, filename, model, granularity, submitted_at)"
+            " values (?, 'file', ?, 'm', 'segment', datetime('now'))",
+            [t, f"recording-{t}.mp3"],
+        )
+        conn.execute(
+            "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (?, ?)",
+            [(t - 1) // TRANSCRIPTIONS_PER_COLLECTION + 1, t],
+        )
+        refs = [
+            conn.execute(
+                "insert into datasette_scribe_speakers (name) values (?)",
+                [f"t{t}_speaker_{s}"],
+            ).lastrowid
+            for s in range(3)
+        ]
+        count = min(ENTRIES_PER_TRANSCRIPTION, n - (t - 1) * ENTRIES_PER_TRANSCRIPTION)
+        rows = []
+        for i in range(count):
+            text = " ".join(
+                rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=rng.randint(8, 30))
+            )
+            rows.append(
+                (t, i * 4.0, i * 4.0 + 3.9, refs[i % 3], text, text, f"speaker_{i % 3}")
+            )
+        conn.executemany(
+            "insert into datasette_scribe_transcription_entries"
+            " (transcription_id, start, end, speaker_ref, text, original_text, original_speaker_id)"
+            " values (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def main(n: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        conn = sqlite3.connect(path, isolation_level=None)  # ty: ignore[unresolved-attribute]
+
+        # Entries written before search existed, as on an upgraded database
+        conn.execute("begin")
+        migrate(conn)
+        for (trigger,) in conn.execute(
+            "select name from sqlite_master where type = 'trigger' and name like 'datasette_scribe_entries_fts_%'"
+        ).fetchall():
+            conn.execute(f"drop trigger {trigger}")
+        conn.execute("drop table datasette_scribe_search_state")
+        conn.execute("drop table datasette_scribe_entries_fts")
+        conn.execute(
+            "delete from datasette_scribe_migrations where name = 'm006_search_index'"
+        )
+        start = time.perf_counter()
+        populate(conn, n)
+        conn.execute("commit")
+        print(f"{'populate':>18}: {n:,} entries in {time.perf_counter() - start:.1f}s")
+
+        conn.execute("begin")
+        migrate(conn)
+        conn.execute("commit")
+        batches = 0
+        slowest = 0.0
+        start = time.perf_counter()
+        while True:
+            batch_start = time.perf_counter()
+            conn.execute("begin immediate")
+            done = index_batch(conn)
+            conn.execute("commit")
+            slowest = max(slowest, time.perf_counter() - batch_start)
+            batches += 1
+            if done:
+                break
+        elapsed = time.perf_counter() - start
+        print(
+            f"{'index build':>18}: {elapsed:.1f}s in {batches} batches"
+            f" (slowest write lock {slowest * 1000:.0f}ms)"
+        )
+
+        # The same two queries the search API runs
+        for label, q, filters in QUERIES:
+            match = fts_query(q)
+            assert match is not None
+            timings = []
+            for _ in range(QUERY_RUNS):
+                start = time.perf_counter()
+                (matches,) = conn.execute(*match_count_sql(match)).fetchone()
+                ranked = matches <= MAX_RANKED_MATCHES
+                sql, params = search_sql(match, ranked=ranked, **filters)
+                conn.execute(sql, params).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(
+                f"{label:>18}: p50 {statistics.median(timings):7.2f}ms"
+                f"  p95 {timings[int(len(timings) * 0.95) - 1]:7.2f}ms"
+                f"  ({matches:,} matches, {'ranked' if ranked else 'newest first'})"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,193 @@
+"""Time speaker rename and combine before and after the speaker_ref migration.
+
+Builds a database at the schema before m008_speaker_refs, where entries name
+their speaker, and times the UPDATEs rename and combine used to run. Then it
+migrates and times the new statements, and the same operations through the
+API, which also log the edit and refresh transcription stats.
+
+Usage: python scripts/bench-speakers.py [entries]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from datasette.app import Datasette
+from datasette.utils.sqlite import sqlite3
+
+from datasette_scribe import SCRIBE_ACCESS_NAME, migrations
+
+ENTRIES_PER_TRANSCRIPTION = 1000
+SPEAKERS_PER_TRANSCRIPTION = 4
+# A speaker who appears in every transcription, like a podcast host
+HOST = "Host"
+
+
+def migrate_until(conn, name: str):
+    names = [fn.__name__ for fn in migrations.MIGRATIONS]
+    saved = migrations.MIGRATIONS[:]
+    migrations.MIGRATIONS[:] = saved[: names.index(name)]
+    try:
+        migrations.migrate(conn)
+    finally:
+        migrations.MIGRATIONS[:] = saved
+
+
+def populate(conn, n: int):
+    transcriptions = (n + ENTRIES_PER_TRANSCRIPTION - 1) // ENTRIES_PER_TRANSCRIPTION
+    conn.execute("insert into datasette_scribe_speakers (name) values (?)", [HOST])
+    for t in range(1, transcriptions + 1):
+        conn.execute(
+            "insert into datasette_scribe_transcriptions (id, input_type, filename, model, granularity, submitted_at)"
+            " values (?, 'file', ?, 'm', 'segment', datetime('now'))",
+            [t, f"recording-{t}.mp3"],
+        )
+        names = [HOST] + [
+            f"t{t}_speaker_{s}" for s in range(1, SPEAKERS_PER_TRANSCRIPTION)
+        ]
+        conn.executemany(
+            "insert or ignore into datasette_scribe_speakers (name) values (?)",
+            [(name,) for name in names],
+        )
+        count = min(ENTRIES_PER_TRANSCRIPTION, n - (t - 1) * ENTRIES_PER_TRANSCRIPTION)
+        conn.executemany(
+            "insert into datasette_scribe_transcription_entries"
+            " (transcription_id, start, end, speaker_id, text, original_text, original_speaker_id)"
+            " values (?, ?, ?, ?, 'Some words', 'Some words', ?)",
+            [
+                (
+                    t,
+                    i * 2.0,
+                    i * 2.0 + 1.9,
+                    names[i % len(names)],
+                    f"speaker_{i % len(names)}",
+                )
+                for i in range(count)
+            ],
+        )
+    return transcriptions
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:>32}: {(time.perf_counter() - start) * 1000:9.1f}ms")
+    return result
+
+
+async def timed_post(label: str, datasette, path: str, body: dict):
+    start = time.perf_counter()
+    response = await datasette.client.post(path, json={"database": "bench", **body})
+    print(f"{label:>32}: {(time.perf_counter() - start) * 1000:9.1f}ms")
+    assert response.json()["ok"], response.json()
+
+
+async def main(n: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        conn = sqlite3.connect(path, isolation_level=None)  # ty: ignore[unresolved-attribute]
+        conn.execute("begin")
+        migrate_until(conn, "m008_speaker_refs")
+        start = time.perf_counter()
+        transcriptions = populate(conn, n)
+        conn.execute("commit")
+        print(
+            f"{'populate':>32}: {n:,} entries, {transcriptions:,} transcriptions in {time.perf_counter() - start:.1f}s"
+        )
+
+        print("Speakers by name:")
+        for label, sql, params in (
+            (
+                "rename host",
+                "update datasette_scribe_transcription_entries set speaker_id = ? where speaker_id = ?",
+                ["Presenter", HOST],
+            ),
+            (
+                "rename one speaker",
+                "update datasette_scribe_transcription_entries set speaker_id = ? where speaker_id = ?",
+                ["Guest", "t1_speaker_1"],
+            ),
+            (
+                "combine in one transcription",
+                "update datasette_scribe_transcription_entries set speaker_id = ?"
+                " where transcription_id = ? and speaker_id = ?",
+                ["t2_speaker_1", 2, "t2_speaker_2"],
+            ),
+        ):
+            conn.execute("begin")
+            timed(label, lambda: conn.execute(sql, params))
+            conn.execute("rollback")
+
+        conn.execute("begin")
+        timed("migrate to speaker_ref", lambda: migrations.migrate(conn))
+        conn.execute("commit")
+
+        def ref(name):
+            return conn.execute(
+                "select id from datasette_scribe_speakers where name = ?", [name]
+            ).fetchone()[0]
+
+        print("Speakers by id:")
+        for label, sql, params in (
+            (
+                "rename host",
+                "update datasette_scribe_speakers set name = ? where id = ?",
+                ["Presenter", ref(HOST)],
+            ),
+            (
+                "rename one speaker",
+                "update datasette_scribe_speakers set name = ? where id = ?",
+                ["Guest", ref("t1_speaker_1")],
+            ),
+            (
+                "combine in one transcription",
+                "update datasette_scribe_transcription_entries set speaker_ref = ?"
+                " where transcription_id = ? and speaker_ref = ?",
+                [ref("t2_speaker_1"), 2, ref("t2_speaker_2")],
+            ),
+        ):
+            conn.execute("begin")
+            timed(label, lambda: conn.execute(sql, params))
+            conn.execute("rollback")
+        conn.close()
+
+        print("Speakers by id, through the API:")
+        datasette = Datasette(
+            [str(path)], config={"permissions": {SCRIBE_ACCESS_NAME: True}}
+        )
+        await datasette.invoke_startup()
+        db = datasette.get_database("bench")
+        host_id = (
+            await db.execute(
+                "select id from datasette_scribe_speakers where name = ?", [HOST]
+            )
+        ).single_value()
+        speaker_id = (
+            await db.execute(
+                "select id from datasette_scribe_speakers where name = 't1_speaker_1'"
+            )
+        ).single_value()
+        await timed_post(
+            "rename host",
+            datasette,
+            f"/-/api/scribe/speakers/{host_id}/rename",
+            {"new_name": "Presenter"},
+        )
+        await timed_post(
+            "rename one speaker",
+            datasette,
+            f"/-/api/scribe/speakers/{speaker_id}/rename",
+            {"new_name": "Guest"},
+        )
+        await timed_post(
+            "combine in one transcription",
+            datasette,
+            "/-/api/scribe/transcription/2/speakers/combine",
+            {"from_speaker": "t2_speaker_2", "to_speaker": "t2_speaker_1"},
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000))
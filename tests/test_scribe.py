@@ -1,5 +1,1702 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+from datasette.app import Datasette
+
 from datasette_scribe import __name__ as plugin_name
+from datasette_scribe import ffmpeg, jobs
+from datasette_scribe.router import SCRIBE_ACCESS_NAME, ensure_schema
+from datasette_scribe.voxtral_api import TranscriptionResponse, TranscriptionSegment
 
 
 def test_plugin_name():
     assert plugin_name == "datasette_scribe"
+
+
+def fake_response(segments=2):
+    return TranscriptionResponse(
+        model="voxtral-mini-2602",
+        text="",
+        segments=[
+            TranscriptionSegment(
+                text=f"Segment {i}",
+                start=float(i),
+                end=float(i + 1),
+                speaker_id=f"speaker_{i % 2}",
+            )
+            for i in range(segments)
+        ],
+    )
+
+
+def patch_transcribe(monkeypatch, fake):
+    async def transcribe(self, *args, **kwargs):
+        return await fake(*args, **kwargs)
+
+    monkeypatch.setattr(jobs.VoxtralClient, "transcribe", transcribe)
+
+
+@pytest.fixture
+def datasette(tmp_path):
+    path = tmp_path / "data.db"
+    sqlite3.connect(path).close()
+    ds = Datasette(
+        [str(path)],
+        config={
+            "permissions": {SCRIBE_ACCESS_NAME: True},
+            "plugins": {"datasette-scribe": {"retry_delay": 0}},
+        },
+    )
+    yield ds
+
+
+@pytest.mark.asyncio
+async def test_new_transcription_is_queued(datasette, monkeypatch):
+    calls = []
+
+    async def fake_transcribe(file_url=None, **kwargs):
+        calls.append(file_url)
+        if len(calls) == 1:
+            raise RuntimeError("429 Too Many Requests")
+        return fake_response()
+
+    patch_transcribe(monkeypatch, fake_transcribe)
+    response = await datasette.client.post(
+        "/-/api/scribe/new",
+        json={"database": "data", "url": "https://example.com/a.mp3"},
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    tid = response.json()["id"]
+
+    await jobs.get_job_queue(datasette).join()
+
+    db = datasette.get_database("data")
+    job = (
+        await db.execute(
+            "select status, attempts from datasette_scribe_jobs where transcription_id = ?",
+            [tid],
+        )
+    ).first()
+    assert dict(job) == {"status": "completed", "attempts": 2}
+    count = (
+        await db.execute(
+            "select count(*) from datasette_scribe_transcription_entries where transcription_id = ?",
+            [tid],
+        )
+    ).single_value()
+    assert count == 2
+
+    # A retry still backing off when the server stopped waits out the rest
+    await db.execute_write(
+        "update datasette_scribe_jobs set status = 'queued',"
+        " next_attempt_at = datetime('now', '+60 seconds') where transcription_id = ?",
+        [tid],
+    )
+    queue = jobs.get_job_queue(datasette)
+    await queue.recover()
+    assert queue.depth() == 0
+    [retry] = queue._retries
+    retry.cancel()
+
+    for url in ("file:///etc/passwd", "concat:/etc/passwd|x.mp3"):
+        rejected = await datasette.client.post(
+            "/-/api/scribe/new", json={"database": "data", "url": url}
+        )
+        assert rejected.status_code == 400
+    assert ffmpeg.input_args("https://example.com/a.mp3")[:2] == [
+        "-protocol_whitelist",
+        ffmpeg.URL_PROTOCOLS,
+    ]
+    assert ffmpeg.input_args("/tmp/a.mp3") == ["-i", "/tmp/a.mp3"]
+
+
+@pytest.mark.asyncio
+async def test_cached_transcription_gets_waveform(datasette, monkeypatch):
+    import base64
+
+    calls = []
+
+    async def fake_transcribe(file_url=None, **kwargs):
+        calls.append(kwargs["filename"])
+        return fake_response()
+
+    async def fake_peaks(path, url):
+        with open(path, "rb") as f:
+            return b"peaks" + f.read()
+
+    patch_transcribe(monkeypatch, fake_transcribe)
+    monkeypatch.setattr(jobs, "compute_peaks_for_audio", fake_peaks)
+    queue = jobs.get_job_queue(datasette)
+    monkeypatch.setattr(queue, "waveforms", True)
+    monkeypatch.setattr(queue, "preprocess", None)
+
+    body = {"database": "data", "file_data": base64.b64encode(b"same audio").decode()}
+    first = await datasette.client.post("/-/api/scribe/new", json=body)
+    assert first.json()["status"] == "queued"
+    await queue.join()
+    second = await datasette.client.post("/-/api/scribe/new", json=body)
+    assert second.json()["status"] == "completed"
+    await queue.join()
+    assert len(calls) == 1
+
+    db = datasette.get_database("data")
+    rows = await db.execute(
+        "select transcription_id, data from datasette_scribe_waveforms order by transcription_id"
+    )
+    assert [tuple(row) for row in rows] == [
+        (first.json()["id"], b"peakssame audio"),
+        (second.json()["id"], b"peakssame audio"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_response_cache(datasette):
+    from datasette_scribe.cache import CachePolicy, cache_get, cache_put
+
+    await ensure_schema(datasette, "data")
+    db = datasette.get_database("data")
+    policy = CachePolicy(max_entries=2, max_age_days=30)
+
+    def exercise(conn):
+        cache_put(
+            conn, "a", fake_response(), policy=policy, model="m", granularity="segment"
+        )
+        hit = cache_get(conn, "a", model="m", granularity="segment")
+        assert hit is not None and hit.usage is not None
+        assert hit.segments == fake_response().segments
+        assert hit.usage.cached is True
+        assert (
+            conn.execute("select hits from datasette_scribe_response_cache").fetchone()[
+                0
+            ]
+            == 1
+        )
+        # Every parameter that changes the output is part of the key
+        assert cache_get(conn, "a", model="other", granularity="segment") is None
+        assert cache_get(conn, "a", model="m", granularity="word") is None
+        assert (
+            cache_get(conn, "a", model="m", granularity="segment", diarize=False)
+            is None
+        )
+        assert cache_get(conn, "b", model="m", granularity="segment") is None
+        # A response served from the cache isn't stored again
+        cache_put(conn, "b", hit, policy=policy, model="m", granularity="segment")
+        assert cache_get(conn, "b", model="m", granularity="segment") is None
+
+        def age(sha256, days):
+            conn.execute(
+                "update datasette_scribe_response_cache set last_used_at = datetime('now', ?)"
+                " where audio_sha256 = ?",
+                [f"-{days} days", sha256],
+            )
+
+        # Past max_age_days
+        age("a", 31)
+        cache_put(
+            conn, "b", fake_response(), policy=policy, model="m", granularity="segment"
+        )
+        age("b", 2)
+        cache_put(
+            conn, "c", fake_response(), policy=policy, model="m", granularity="segment"
+        )
+        age("c", 1)
+        # Past max_entries, the least recently used go first
+        cache_put(
+            conn, "d", fake_response(), policy=policy, model="m", granularity="segment"
+        )
+        rows = conn.execute(
+            "select audio_sha256, hits from datasette_scribe_response_cache order by audio_sha256"
+        ).fetchall()
+        return [tuple(r) for r in rows]
+
+    assert await db.execute_write_fn(exercise) == [("c", 0), ("d", 0)]
+
+
+# Listing pages read every transcription row (by rowid) by design; any other
+# table scan means a query is missing an index. A full-text MATCH shows up as
+# a SCAN of the FTS5 table with an index plan containing "M", and reading a
+# subquery's rows as "SCAN (subquery-N)". json_each reads a parameter.
+ALLOWED_SCANS = {"t", "CONSTANT", "sqlite_master", "json_each"}
+
+
+@pytest.mark.asyncio
+async def test_page_queries_use_indexes(datasette, monkeypatch):
+    from datasette.database import Database
+
+    from datasette_scribe.ingest import insert_transcription, store_response
+    from datasette_scribe.mutations import edit_entry
+
+    monkeypatch.setenv("DATASETTE_SCRIBE_VITE_PATH", "http://localhost:5178/")
+    db = datasette.get_database("data")
+    await datasette.invoke_startup()
+    await ensure_schema(datasette, "data")
+
+    def populate(conn):
+        conn.execute(
+            "insert into datasette_scribe_collections (name) values ('Podcast')"
+        )
+        for collection_id in (1, None):
+            tid = insert_transcription(
+                conn,
+                url="https://example.com/a.mp3",
+                input_type="url",
+                filename=None,
+                model="voxtral-mini-2602",
+                granularity="segment",
+            )
+            store_response(conn, tid, fake_response(4))
+            if collection_id:
+                conn.execute(
+                    "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (?, ?)",
+                    [collection_id, tid],
+                )
+        edit_entry(conn, 1, text="Edited", speaker_id="Alice")
+
+    await db.execute_write_fn(populate)
+
+    queries = []
+    original_execute = Database.execute
+
+    async def recording_execute(self, sql, params=None, *args, **kwargs):
+        if self.name == "data":
+            queries.append((sql, params))
+        return await original_execute(self, sql, params, *args, **kwargs)
+
+    monkeypatch.setattr(Database, "execute", recording_execute)
+    for path in (
+        "/data/-/scribe",
+        "/data/-/scribe/transcription/1",
+        "/data/-/scribe/transcription/2",
+        "/data/-/scribe/collections/1",
+        "/data/-/scribe/new",
+        "/data/-/scribe/search",
+        "/data/-/api/scribe/search?q=segment&speaker=t1_speaker_0",
+        "/data/-/api/scribe/search?q=segment&collection_id=1",
+        "/data/-/api/scribe/transcription/1/entries?cursor=1.0:2&limit=2",
+        "/data/-/api/scribe/transcription/1/entries?start_time=1&end_time=3",
+        "/data/-/api/scribe/transcriptions?collection_id=1&cursor=5",
+        "/data/-/api/scribe/transcriptions?cursor=5",
+        "/data/-/api/scribe/transcription/1/changes?since=0",
+    ):
+        response = await datasette.client.get(path)
+        assert response.status_code == 200, path
+    monkeypatch.setattr(Database, "execute", original_execute)
+
+    assert queries
+    for sql, params in queries:
+        plan = await db.execute("explain query plan " + sql, params)
+        for row in plan.rows:
+            detail = row["detail"]
+            if (
+                detail.startswith("SCAN ")
+                and " USING " not in detail
+                and ":M" not in detail
+            ):
+                table = detail.split()[1]
+                assert table in ALLOWED_SCANS or table.startswith("(subquery-"), (
+                    sql,
+                    detail,
+                )
+
+
+@pytest.mark.asyncio
+async def test_get_routes_do_not_write(datasette, tmp_path, monkeypatch):
+    from datasette.database import Database
+
+    monkeypatch.setenv("DATASETTE_SCRIBE_VITE_PATH", "http://localhost:5178/")
+    await ensure_schema(datasette, "data")
+    await datasette.get_database("data").execute_write(
+        "insert into datasette_scribe_collections (name) values ('Podcast')"
+    )
+
+    # A fresh instance against the already migrated file
+    fresh = Datasette(
+        [str(tmp_path / "data.db")],
+        config={"permissions": {SCRIBE_ACCESS_NAME: True}},
+    )
+    await fresh.invoke_startup()
+    writes = []
+    original = Database._execute_write_fn
+
+    async def recording_write_fn(self, fn, *args, **kwargs):
+        writes.append(self.name)
+        return await original(self, fn, *args, **kwargs)
+
+    monkeypatch.setattr(Database, "_execute_write_fn", recording_write_fn)
+    for path in (
+        "/data/-/scribe",
+        "/data/-/scribe/new",
+        "/data/-/scribe/collections/1",
+        "/data/-/scribe/search",
+        "/data/-/api/scribe/search?q=hello",
+        "/data/-/api/scribe/transcriptions",
+    ):
+        response = await fresh.client.get(path)
+        assert response.status_code == 200, path
+    assert "data" not in writes
+
+
+@pytest.mark.asyncio
+async def test_audio_range_requests(datasette, monkeypatch):
+    import base64
+
+    async def fake_transcribe(*args, **kwargs):
+        return fake_response()
+
+    patch_transcribe(monkeypatch, fake_transcribe)
+    audio = bytes(range(256)) * 4000
+    response = await datasette.client.post(
+        "/-/api/scribe/new",
+        json={
+            "database": "data",
+            "file_data": base64.b64encode(audio).decode(),
+            "filename": "a.mp3",
+        },
+    )
+    url = f"/data/-/api/scribe/transcription/{response.json()['id']}/audio"
+
+    full = await datasette.client.get(url)
+    assert full.status_code == 200
+    assert full.content == audio
+    assert full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+
+    partial = await datasette.client.get(url, headers={"Range": "bytes=1000-1999"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 1000-1999/{len(audio)}"
+    assert partial.content == audio[1000:2000]
+
+    suffix = await datasette.client.get(url, headers={"Range": "bytes=-5"})
+    assert suffix.content == audio[-5:]
+
+    beyond = await datasette.client.get(url, headers={"Range": f"bytes={len(audio)}-"})
+    assert beyond.status_code == 416
+
+    cached = await datasette.client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    await jobs.get_job_queue(datasette).join()
+
+
+@pytest.mark.asyncio
+async def test_audio_blob_reads(tmp_path, monkeypatch):
+    import hashlib
+
+    from datasette_scribe import streaming
+    from datasette_scribe.storage import blob_sha256
+
+    class NoBlobOpen:
+        # Like a pysqlite3 connection, which has no blobopen()
+        def __init__(self, conn):
+            self.execute = conn.execute
+
+    table = "datasette_scribe_audio_blobs"
+    path = tmp_path / "blobs.db"
+    conn = sqlite3.connect(path)
+    conn.execute(f"create table {table} (id integer primary key, data blob)")
+    data = bytes(range(256)) * 100
+    conn.execute(f"insert into {table} (id, data) values (1, ?)", [data])
+    conn.commit()
+    for c in (conn, NoBlobOpen(conn)):
+        assert streaming.read_blob(c, table, 1, 1000, 500) == data[1000:1500]
+        assert streaming.read_blob(c, table, 1, len(data) - 10, 500) == data[-10:]
+        assert blob_sha256(c, table, 1, len(data)) == hashlib.sha256(data).hexdigest()
+    conn.close()
+
+    # As under pysqlite3: file databases are read through a connection of
+    # our own, in-memory ones with substr() up to a limit
+    monkeypatch.setattr(streaming, "INCREMENTAL_BLOB_IO", False)
+    monkeypatch.setattr(streaming, "MAX_SUBSTR_BLOB_SIZE", len(data) - 1)
+    datasette = Datasette([str(path)], memory=True)
+    if hasattr(sqlite3.Connection, "blobopen"):
+        read, chunk_size = streaming.blob_reader(
+            datasette.get_database("blobs"), table, 1, len(data)
+        )
+        assert chunk_size == streaming.CHUNK_SIZE
+        assert await read(1000, 500) == data[1000:1500]
+    memory = datasette.get_database("_memory")
+    with pytest.raises(streaming.BlobTooLarge):
+        streaming.blob_reader(memory, table, 1, len(data))
+    size = streaming.MAX_SUBSTR_BLOB_SIZE
+    _, chunk_size = streaming.blob_reader(memory, table, 1, size)
+    assert -(-size // chunk_size) <= streaming.MAX_BLOB_READS
+
+
+@pytest.mark.asyncio
+async def test_local_audio_storage(tmp_path, monkeypatch):
+    import base64
+
+    path = tmp_path / "data.db"
+    sqlite3.connect(path).close()
+    datasette = Datasette(
+        [str(path)],
+        config={
+            "permissions": {SCRIBE_ACCESS_NAME: True},
+            "plugins": {
+                "datasette-scribe": {
+                    "audio_storage": {"type": "local", "path": str(tmp_path / "audio")}
+                }
+            },
+        },
+    )
+    audio = b"ID3" + bytes(range(256)) * 100
+    received = []
+
+    async def fake_transcribe(*args, file_data=None, **kwargs):
+        received.append(file_data)
+        return fake_response()
+
+    patch_transcribe(monkeypatch, fake_transcribe)
+    ids = []
+    for _ in range(2):
+        response = await datasette.client.post(
+            "/-/api/scribe/new",
+            json={"database": "data", "file_data": base64.b64encode(audio).decode()},
+        )
+        ids.append(response.json()["id"])
+        await jobs.get_job_queue(datasette).join()
+    # The second upload was answered from the response cache
+    assert received == [audio]
+    assert response.json()["status"] == "completed"
+    assert response.json()["cached"] is True
+
+    bypass = await datasette.client.post(
+        "/-/api/scribe/new",
+        json={
+            "database": "data",
+            "file_data": base64.b64encode(audio).decode(),
+            "no_cache": True,
+        },
+    )
+    assert bypass.json()["status"] == "queued"
+    await jobs.get_job_queue(datasette).join()
+    assert received == [audio, audio]
+
+    # Stored once, outside the database
+    assert len([p for p in (tmp_path / "audio").rglob("*") if p.is_file()]) == 1
+    db = datasette.get_database("data")
+    blobs = (
+        await db.execute("select count(*) from datasette_scribe_audio_blobs")
+    ).single_value()
+    assert blobs == 0
+    usage = (
+        await db.execute(
+            "select usage ->> 'cached' from datasette_scribe_transcriptions where id = ?",
+            [ids[1]],
+        )
+    ).single_value()
+    assert usage == 1
+
+    from datasette_scribe.routes import api_transcriptions
+
+    monkeypatch.setattr(api_transcriptions, "MAX_FILE_DATA_SIZE", len(audio) - 1)
+    too_large = await datasette.client.post(
+        "/-/api/scribe/new",
+        json={"database": "data", "file_data": base64.b64encode(audio).decode()},
+    )
+    assert too_large.status_code == 413
+
+    url = f"/data/-/api/scribe/transcription/{ids[1]}/audio"
+    partial = await datasette.client.get(url, headers={"Range": "bytes=0-2"})
+    assert partial.status_code == 206
+    assert partial.content == b"ID3"
+
+
+@pytest.mark.asyncio
+async def test_local_store_concurrent_identical_writes(tmp_path):
+    from datasette_scribe.storage import AudioStore, LocalAudioStore, file_sha256
+
+    store = LocalAudioStore(tmp_path / "audio")
+    paths = []
+    for i in range(8):
+        path = tmp_path / f"upload-{i}"
+        path.write_bytes(b"same audio" * 1000)
+        paths.append(path)
+    sha256 = file_sha256(paths[0])
+    await asyncio.gather(
+        *(
+            asyncio.to_thread(store.write_file, sha256, path, "audio/mpeg")
+            for path in paths
+        )
+    )
+    assert store.read(sha256) == b"same audio" * 1000
+    assert [p.name for p in store.path(sha256).parent.iterdir()] == [sha256]
+
+    class Incomplete(AudioStore):
+        name = "incomplete"
+
+        def exists(self, sha256):
+            return False
+
+    with pytest.raises(TypeError):
+        Incomplete()  # ty: ignore[call-non-callable]
+
+
+@pytest.mark.skipif(
+    sqlite3.sqlite_version_info < (3, 42, 0),
+    reason="datetime('now', 'subsec') needs SQLite 3.42",
+)
+def test_move_audio_command(tmp_path):
+    import hashlib
+
+    from click.testing import CliRunner
+
+    from datasette_scribe.cli import scribe_cli
+    from datasette_scribe.cli._db import apply_schema, store_transcription
+
+    db_path = tmp_path / "data.db"
+    apply_schema(db_path)
+    store_transcription(db_path, "a.mp3", b"audio bytes", "audio/mpeg", fake_response())
+    conn = sqlite3.connect(db_path)
+    # As left by the migration for audio uploaded before hashes were recorded
+    with conn:
+        conn.execute("update datasette_scribe_transcriptions set audio_sha256 = null")
+    result = CliRunner().invoke(scribe_cli, ["hash-audio", str(db_path)])
+    assert result.exit_code == 0, result.output
+    [(hashed,)] = conn.execute(
+        "select audio_sha256 from datasette_scribe_transcriptions"
+    )
+    assert hashed == hashlib.sha256(b"audio bytes").hexdigest()
+
+    result = CliRunner().invoke(
+        scribe_cli,
+        [
+            "move-audio",
+            str(db_path),
+            "--audio-dir",
+            str(tmp_path / "audio"),
+            "--vacuum",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert conn.execute(
+        "select count(*) from datasette_scribe_audio_blobs"
+    ).fetchone() == (0,)
+    sha256, size = conn.execute(
+        "select sha256, size from datasette_scribe_audio_files"
+    ).fetchone()
+    assert size == len(b"audio bytes")
+    assert (
+        tmp_path / "audio" / sha256[:2] / sha256[2:4] / sha256
+    ).read_bytes() == b"audio bytes"
+
+
+@pytest.mark.skipif(
+    sqlite3.sqlite_version_info < (3, 42, 0),
+    reason="datetime('now', 'subsec') needs SQLite 3.42",
+)
+def test_add_command_batches_and_resumes(tmp_path, monkeypatch):
+    from click.testing import CliRunner
+
+    from datasette_scribe.cli import scribe_cli
+
+    calls = []
+
+    async def fake(file_data, filename, **kwargs):
+        calls.append(filename)
+        return fake_response()
+
+    patch_transcribe(monkeypatch, fake)
+    audio = tmp_path / "audio"
+    (audio / "nested").mkdir(parents=True)
+    (audio / "a.mp3").write_bytes(b"first")
+    (audio / "nested" / "b.wav").write_bytes(b"second")
+    (audio / "copy.mp3").write_bytes(b"first")
+    (audio / "notes.txt").write_text("not audio")
+    db_path = tmp_path / "data.db"
+
+    args = ["add", str(audio), "-d", str(db_path), "--batch-size", "2"]
+    result = CliRunner().invoke(scribe_cli, args)
+    assert result.exit_code == 0, result.output
+    # The copy has the same audio, so it's only transcribed once
+    assert len(calls) == 2
+    conn = sqlite3.connect(db_path)
+    assert conn.execute(
+        "select count(*) from datasette_scribe_transcriptions"
+    ).fetchone() == (2,)
+
+    result = CliRunner().invoke(scribe_cli, args)
+    assert result.exit_code == 0, result.output
+    assert "Skipped 3" in result.output
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_chunked_upload(tmp_path, monkeypatch):
+    path = tmp_path / "data.db"
+    sqlite3.connect(path).close()
+    datasette = Datasette(
+        [str(path)],
+        config={
+            "permissions": {SCRIBE_ACCESS_NAME: True},
+            "plugins": {
+                "datasette-scribe": {
+                    "upload_dir": str(tmp_path / "uploads"),
+                    "max_upload_size": 1000,
+                }
+            },
+        },
+    )
+    received = []
+
+    async def fake_transcribe(*args, file_data=None, **kwargs):
+        received.append(file_data)
+        return fake_response()
+
+    patch_transcribe(monkeypatch, fake_transcribe)
+    audio = bytes(range(256)) * 3
+
+    too_big = await datasette.client.post(
+        "/-/api/scribe/uploads",
+        json={"database": "data", "filename": "a.mp3", "size": 1001},
+    )
+    assert too_big.status_code == 413
+
+    start = await datasette.client.post(
+        "/-/api/scribe/uploads",
+        json={"database": "data", "filename": "a.mp3", "size": len(audio)},
+    )
+    upload_id = start.json()["upload_id"]
+    base = f"/-/api/scribe/uploads/{upload_id}"
+
+    first = await datasette.client.post(
+        base + "/chunk", content=audio[:500], headers={"Upload-Offset": "0"}
+    )
+    assert first.json()["offset"] == 500
+    # A retried chunk at a stale offset is rejected with the current offset
+    stale = await datasette.client.post(
+        base + "/chunk", content=audio[:500], headers={"Upload-Offset": "0"}
+    )
+    assert stale.status_code == 409
+    assert stale.json()["offset"] == 500
+
+    early = await datasette.client.post(base + "/finish", json={})
+    assert early.status_code == 409
+
+    await datasette.client.post(
+        base + "/chunk", content=audio[500:], headers={"Upload-Offset": "500"}
+    )
+    assert (await datasette.client.get(base)).json()["offset"] == len(audio)
+
+    finished = await datasette.client.post(base + "/finish", json={})
+    assert finished.json()["status"] == "queued"
+    await jobs.get_job_queue(datasette).join()
+    assert received == [audio]
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_chunk_windows_and_stitching():
+    from datasette_scribe.chunking import plan_windows, stitch
+
+    # Cut at the silence closest before each 600s mark
+    windows = plan_windows(1300, [(580, 590), (1150, 1160)], window=600, overlap=5)
+    assert [(w.start, w.end) for w in windows] == [(0, 585), (585, 1155), (1155, 1300)]
+    assert (windows[1].audio_start, windows[1].audio_end) == (580, 1160)
+
+    def segment(text, start, end, speaker):
+        return TranscriptionSegment(text=text, start=start, end=end, speaker_id=speaker)
+
+    first = TranscriptionResponse(
+        model="m",
+        text="",
+        segments=[
+            segment("Hello there.", 0, 10, "speaker_0"),
+            segment("Welcome to the show.", 576, 582.5, "speaker_1"),
+            segment("Thanks for having me.", 583, 586.5, "speaker_0"),
+        ],
+    )
+    # Times relative to 580; this piece numbers the same two people the other way
+    second = TranscriptionResponse(
+        model="m",
+        text="",
+        segments=[
+            segment("show.", 0, 2.4, "speaker_0"),
+            # Heard by both pieces; the overlap keeps one copy
+            segment("Thanks for having me!", 3.5, 7, "speaker_1"),
+            segment("So, tell us about it.", 10, 20, "speaker_0"),
+        ],
+    )
+    third = TranscriptionResponse(
+        model="m", text="", segments=[segment("Bye.", 100, 101, "speaker_0")]
+    )
+
+    result = stitch(windows, [first, second, third])
+    assert [(s.text, s.start, s.speaker_id) for s in result.segments] == [
+        ("Hello there.", 0, "speaker_0"),
+        ("Welcome to the show.", 576, "speaker_1"),
+        ("Thanks for having me.", 583, "speaker_0"),
+        ("So, tell us about it.", 590, "speaker_1"),
+        ("Bye.", 1250, "speaker_2"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_voxtral_client_retries():
+    import httpx
+
+    from datasette_scribe.voxtral_api import VoxtralClient
+
+    statuses = [429, 503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        if status != 200:
+            return httpx.Response(status, headers={"Retry-After": "0"})
+        return httpx.Response(200, json=fake_response().model_dump())
+
+    async with VoxtralClient(
+        api_key="test", backoff=0, transport=httpx.MockTransport(handler)
+    ) as client:
+        response = await client.transcribe("https://example.com/a.mp3")
+        assert len(response.segments) == 2
+        assert (
+            client.stats.requests,
+            client.stats.retries,
+            client.stats.throttled,
+        ) == (3, 2, 1)
+
+        statuses[:] = [400]
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.transcribe("https://example.com/a.mp3")
+        assert client.stats.failures == 1
+
+    from datasette_scribe.voxtral_api import (
+        TranscriptionUsage,
+        voxtral_client_from_config,
+    )
+
+    def long_audio(request):
+        response = fake_response()
+        # 10 seconds over the whole minute's allowance
+        response.usage = TranscriptionUsage(prompt_audio_seconds=6010)
+        return httpx.Response(200, json=response.model_dump())
+
+    async with voxtral_client_from_config(
+        {"audio_seconds_per_minute": "6000"}
+    ) as client:
+        assert client.audio_limit is not None and client.audio_limit.capacity == 6000.0
+    async with VoxtralClient(
+        api_key="test",
+        audio_seconds_per_minute=6000,
+        transport=httpx.MockTransport(long_audio),
+    ) as client:
+        await client.transcribe("https://example.com/a.mp3")
+        assert client.stats.rate_limit_waits == 0
+        # No estimate this time, but the debt is still waited out first
+        await client.transcribe("https://example.com/a.mp3")
+        assert client.stats.rate_limit_waits == 1
+        assert client.stats.rate_limit_wait_seconds == pytest.approx(0.1, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_search(datasette):
+    from datasette_scribe.ingest import insert_transcription, store_response
+    from datasette_scribe.search import build_search_index
+
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        tid = insert_transcription(
+            conn,
+            url=None,
+            input_type="file",
+            filename="a.mp3",
+            model="m",
+            granularity="segment",
+        )
+        response = fake_response(3)
+        response.segments[1].text = "We <b>measured</b> the latency"
+        store_response(conn, tid, response)
+
+    # Entries written before search existed are indexed in batches
+    def forget_index(conn):
+        conn.execute("delete from datasette_scribe_entries_fts")
+        conn.execute(
+            "update datasette_scribe_search_state set indexed_through = 0, backfill_until = 3"
+        )
+
+    await ensure_schema(datasette, "data")
+    await db.execute_write_fn(populate)
+    await db.execute_write_fn(forget_index)
+    await build_search_index(db, batch_size=2)
+
+    response = await datasette.client.get("/data/-/api/scribe/search?q=measure")
+    data = response.json()
+    assert data["ok"] and data["index_ready"]
+    [hit] = data["hits"]
+    assert hit["transcription_title"] == "a.mp3"
+    assert hit["start"] == 1.0
+    # Porter stemming, and the entry text is escaped around the <mark>
+    assert (
+        hit["snippet_html"] == "We &lt;b&gt;<mark>measured</mark>&lt;/b&gt; the latency"
+    )
+
+    # Edits reach the index through the triggers
+    await datasette.client.post(
+        f"/-/api/scribe/entry/{hit['entry_id']}/edit",
+        json={"database": "data", "text": "Throughput instead"},
+    )
+    hits = (await datasette.client.get("/data/-/api/scribe/search?q=latency")).json()[
+        "hits"
+    ]
+    assert hits == []
+    hits = (
+        await datasette.client.get("/data/-/api/scribe/search?q=throughput")
+    ).json()["hits"]
+    assert [h["entry_id"] for h in hits] == [hit["entry_id"]]
+
+    # Quoting keeps FTS5 syntax from reaching the query
+    params = {"q": 'segment "NEAR(" OR', "speaker": "t1_speaker_0"}
+    response = await datasette.client.get("/data/-/api/scribe/search", params=params)
+    assert response.json() == {
+        "ok": True,
+        "hits": [],
+        "has_more": False,
+        "ranked": True,
+        "index_ready": True,
+        "error": None,
+    }
+    hits = (
+        await datasette.client.get(
+            "/data/-/api/scribe/search",
+            params={"q": "segm*", "speaker": "t1_speaker_0"},
+        )
+    ).json()["hits"]
+    assert sorted(h["start"] for h in hits) == [0.0, 2.0]
+
+
+@pytest.mark.asyncio
+async def test_transcription_entries_windows(datasette):
+    from datasette_scribe.ingest import insert_transcription, store_response
+
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        tid = insert_transcription(
+            conn,
+            url=None,
+            input_type="file",
+            filename="a.mp3",
+            model="m",
+            granularity="segment",
+        )
+        response = fake_response(7)
+        # Entries that start together still page without gaps or repeats
+        response.segments[4].start = response.segments[3].start
+        store_response(conn, tid, response)
+        return tid
+
+    await ensure_schema(datasette, "data")
+    tid = await db.execute_write_fn(populate)
+    url = f"/data/-/api/scribe/transcription/{tid}/entries"
+
+    starts = []
+    cursor = None
+    windows = 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        data = (await datasette.client.get(url, params=params)).json()
+        assert data["ok"]
+        starts.extend((e["start"], e["text"]) for e in data["entries"])
+        windows += 1
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert windows == 4
+    assert [text for _, text in starts] == [f"Segment {i}" for i in range(7)]
+    assert [start for start, _ in starts] == [0.0, 1.0, 2.0, 3.0, 3.0, 5.0, 6.0]
+
+    data = (
+        await datasette.client.get(url, params={"start_time": 2, "end_time": 5})
+    ).json()
+    assert [e["text"] for e in data["entries"]] == [
+        "Segment 2",
+        "Segment 3",
+        "Segment 4",
+    ]
+    assert data["next_cursor"] is None
+
+    response = await datasette.client.get(url, params={"cursor": "nonsense"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_transcription_stats(datasette):
+    from datasette_scribe.ingest import insert_transcription, store_response
+    from datasette_scribe.stats import refresh_all_stats
+
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        tid = insert_transcription(
+            conn,
+            url=None,
+            input_type="file",
+            filename="a.mp3",
+            model="m",
+            granularity="segment",
+        )
+        store_response(conn, tid, fake_response(4))
+        return tid
+
+    async def stats(tid):
+        row = (
+            await db.execute(
+                "select entries_count, duration, speakers_count"
+                " from datasette_scribe_transcription_stats where transcription_id = ?",
+                [tid],
+            )
+        ).first()
+        return tuple(row)
+
+    await ensure_schema(datasette, "data")
+    tid = await db.execute_write_fn(populate)
+    assert await stats(tid) == (4, 4.0, 2)
+
+    await datasette.client.post(
+        f"/-/api/scribe/transcription/{tid}/speakers/combine",
+        json={
+            "database": "data",
+            "from_speaker": f"t{tid}_speaker_1",
+            "to_speaker": f"t{tid}_speaker_0",
+        },
+    )
+    assert await stats(tid) == (4, 4.0, 1)
+    usage = await db.execute(
+        "select s.name, u.entries_count from datasette_scribe_speaker_usage u"
+        " join datasette_scribe_speakers s on s.id = u.speaker_ref where u.transcription_id = ?",
+        [tid],
+    )
+    assert [tuple(r) for r in usage.rows] == [(f"t{tid}_speaker_0", 4)]
+    await datasette.client.post(
+        f"/-/api/scribe/transcription/{tid}/speakers/delete",
+        json={"database": "data", "speaker_name": f"t{tid}_speaker_0"},
+    )
+    assert await stats(tid) == (4, 4.0, 0)
+    await datasette.client.post(
+        "/-/api/scribe/entry/1/edit", json={"database": "data", "speaker_id": "Alice"}
+    )
+    assert await stats(tid) == (4, 4.0, 1)
+
+    # The backfill rebuilds stats for rows written without them
+    await db.execute_write("delete from datasette_scribe_transcription_stats")
+    await db.execute_write("delete from datasette_scribe_speaker_usage")
+    assert await db.execute_write_fn(refresh_all_stats) == 1
+    assert await stats(tid) == (4, 4.0, 1)
+    usage = await db.execute(
+        "select s.name, u.transcription_id, u.entries_count from datasette_scribe_speaker_usage u"
+        " join datasette_scribe_speakers s on s.id = u.speaker_ref"
+    )
+    assert [tuple(r) for r in usage.rows] == [("Alice", tid, 1)]
+
+
+@pytest.mark.asyncio
+async def test_listing_is_paginated(datasette, monkeypatch):
+    import json
+    import re
+
+    from datasette_scribe.ingest import insert_transcription
+
+    monkeypatch.setenv("DATASETTE_SCRIBE_VITE_PATH", "http://localhost:5178/")
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        conn.execute(
+            "insert into datasette_scribe_collections (name) values ('Podcast')"
+        )
+        for i in range(15):
+            tid = insert_transcription(
+                conn,
+                url=None,
+                input_type="file",
+                filename=f"{i}.mp3",
+                model="m",
+                granularity="segment",
+            )
+            if i < 12:
+                conn.execute(
+                    "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (1, ?)",
+                    [tid],
+                )
+
+    await ensure_schema(datasette, "data")
+    await db.execute_write_fn(populate)
+
+    html = (await datasette.client.get("/data/-/scribe")).text
+    match = re.search(
+        r'<script type="application/json" id="pageData">(.*?)</script>', html
+    )
+    assert match is not None
+    page_data = json.loads(match.group(1))
+    [collection] = page_data["collections"]
+    assert [t["id"] for t in collection["transcriptions"]] == list(range(12, 2, -1))
+    assert collection["transcriptions_count"] == 12
+    assert [t["id"] for t in page_data["uncollected_transcriptions"]] == [15, 14, 13]
+    assert page_data["uncollected_count"] == 3
+    assert page_data["uncollected_next_cursor"] is None
+
+    data = (
+        await datasette.client.get(
+            "/data/-/api/scribe/transcriptions",
+            params={
+                "collection_id": 1,
+                "cursor": collection["transcriptions_next_cursor"],
+            },
+        )
+    ).json()
+    assert [t["id"] for t in data["transcriptions"]] == [2, 1]
+    assert data["next_cursor"] is None
+
+    data = (
+        await datasette.client.get(
+            "/data/-/api/scribe/transcriptions", params={"limit": 2}
+        )
+    ).json()
+    assert [t["id"] for t in data["transcriptions"]] == [15, 14]
+    data = (
+        await datasette.client.get(
+            "/data/-/api/scribe/transcriptions",
+            params={"limit": 2, "cursor": data["next_cursor"]},
+        )
+    ).json()
+    assert [t["id"] for t in data["transcriptions"]] == [13]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_speaker_refs_migration(datasette):
+    from datasette_scribe import migrations
+
+    db = datasette.get_database("data")
+
+    def before_speaker_refs(conn):
+        saved = migrations.MIGRATIONS[:]
+        migrations.MIGRATIONS[:] = [fn for fn in saved if fn.__name__ < "m008"]
+        try:
+            migrations.migrate(conn)
+        finally:
+            migrations.MIGRATIONS[:] = saved
+        conn.execute(
+            "insert into datasette_scribe_transcriptions (id, input_type, model, granularity, submitted_at)"
+            " values (1, 'file', 'm', 'segment', '2024-01-01')"
+        )
+        conn.execute(
+            "insert into datasette_scribe_speakers (name) values ('t1_speaker_0')"
+        )
+        # Entries could name speakers missing from the speakers table, and
+        # unassigning stored an empty name
+        conn.executemany(
+            "insert into datasette_scribe_transcription_entries (transcription_id, start, end, speaker_id, text)"
+            " values (1, ?, ?, ?, 'Hi')",
+            [(0, 1, "t1_speaker_0"), (1, 2, "Alice"), (2, 3, ""), (3, 4, None)],
+        )
+
+    await db.execute_write_fn(before_speaker_refs)
+    await ensure_schema(datasette, "data")
+
+    data = (
+        await datasette.client.get("/data/-/api/scribe/transcription/1/entries")
+    ).json()
+    assert [e["speaker_id"] for e in data["entries"]] == [
+        "t1_speaker_0",
+        "Alice",
+        None,
+        None,
+    ]
+
+    # Renaming touches the speaker row only, and shows through every entry
+    alice = (
+        await db.execute(
+            "select id, is_original from datasette_scribe_speakers where name = 'Alice'"
+        )
+    ).first()
+    assert alice["is_original"] == 0
+    response = await datasette.client.post(
+        f"/-/api/scribe/speakers/{alice['id']}/rename",
+        json={"database": "data", "new_name": "Alicia"},
+    )
+    assert response.json()["ok"]
+    data = (
+        await datasette.client.get("/data/-/api/scribe/transcription/1/entries")
+    ).json()
+    assert [e["speaker_id"] for e in data["entries"]] == [
+        "t1_speaker_0",
+        "Alicia",
+        None,
+        None,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_edits(datasette):
+    from datasette_scribe.ingest import insert_transcription, store_response
+
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        tid = insert_transcription(
+            conn,
+            url=None,
+            input_type="file",
+            filename="a.mp3",
+            model="m",
+            granularity="segment",
+        )
+        store_response(conn, tid, fake_response(4))
+        return tid
+
+    await ensure_schema(datasette, "data")
+    tid = await db.execute_write_fn(populate)
+    entry_ids = [
+        r[0]
+        for r in await db.execute(
+            "select id from datasette_scribe_transcription_entries where transcription_id = ? order by start",
+            [tid],
+        )
+    ]
+
+    async def post(operations):
+        return await datasette.client.post(
+            f"/-/api/scribe/transcription/{tid}/edits",
+            json={"database": "data", "operations": operations},
+        )
+
+    async def snapshot():
+        entries = await db.execute(
+            "select e.text, s.name from datasette_scribe_transcription_entries e"
+            " left join datasette_scribe_speakers s on s.id = e.speaker_ref"
+            " where e.transcription_id = ? order by e.start",
+            [tid],
+        )
+        edits = (
+            await db.execute(
+                "select count(*) from datasette_scribe_transcription_edits"
+            )
+        ).single_value()
+        return [tuple(r) for r in entries], edits
+
+    response = await post(
+        [
+            {"op": "edit_text", "entry_id": entry_ids[0], "text": "Hello"},
+            # Unchanged text isn't logged
+            {"op": "edit_text", "entry_id": entry_ids[1], "text": "Segment 1"},
+            {"op": "create_speaker", "name": "Alice"},
+            {"op": "reassign_speaker", "entry_id": entry_ids[0], "speaker_id": "Alice"},
+            {
+                "op": "combine_speakers",
+                "from_speaker": f"t{tid}_speaker_1",
+                "to_speaker": "Alice",
+            },
+        ]
+    )
+    data = response.json()
+    assert response.status_code == 200, data
+    assert [r["ok"] for r in data["results"]] == [True] * 5
+    alice_id = data["results"][2]["speaker_id"]
+    assert alice_id is not None
+    assert data["results"][4]["affected_entries"] == 2
+    before = await snapshot()
+    assert before == (
+        [
+            ("Hello", "Alice"),
+            ("Segment 1", "Alice"),
+            ("Segment 2", f"t{tid}_speaker_0"),
+            ("Segment 3", "Alice"),
+        ],
+        4,
+    )
+    speakers_count = (
+        await db.execute(
+            "select speakers_count from datasette_scribe_transcription_stats where transcription_id = ?",
+            [tid],
+        )
+    ).single_value()
+    assert speakers_count == 2
+
+    # A failing operation rolls back the ones before it
+    response = await post(
+        [
+            {"op": "edit_text", "entry_id": entry_ids[2], "text": "Changed"},
+            {"op": "delete_speaker", "name": "Alice"},
+            {"op": "create_speaker", "name": f"t{tid}_speaker_0"},
+        ]
+    )
+    data = response.json()
+    assert response.status_code == 400
+    assert data["results"][2]["error"] == "Speaker already exists"
+    assert [r["ok"] for r in data["results"]] == [False] * 3
+    assert await snapshot() == before
+
+    # Entries of other transcriptions can't be edited through this one
+    response = await post([{"op": "edit_text", "entry_id": 999999, "text": "x"}])
+    assert response.json()["results"][0]["error"] == "Entry not found"
+
+    # Another client catches up from the version its page was built at
+    async def changes(since):
+        response = await datasette.client.get(
+            f"/data/-/api/scribe/transcription/{tid}/changes?since={since}"
+        )
+        return response.json()
+
+    data = await changes(0)
+    assert [e["operation"] for e in data["edits"]] == [
+        "edit_text",
+        "create_speaker",
+        "reassign_speaker",
+        "combine_speakers",
+    ]
+    assert json.loads(data["edits"][1]["detail"]) == {
+        "name": "Alice",
+        "speaker_id": alice_id,
+    }
+    assert [(e["id"], e["text"], e["speaker_id"]) for e in data["entries"]] == [
+        (entry_ids[0], "Hello", "Alice")
+    ]
+    assert [s["name"] for s in data["speakers"]] == ["Alice", f"t{tid}_speaker_0"]
+    assert data["version"] == data["edits"][-1]["id"]
+    assert await changes(data["version"]) == {
+        **data,
+        "edits": [],
+        "entries": [],
+        "speakers": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_speaker_edits(datasette):
+    # Reassigning entries to a speaker while it's combined away used to
+    # leave entries pointing at a deleted speaker, because the combine read
+    # and wrote in separate steps
+    from datasette_scribe.ingest import insert_transcription, store_response
+
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        tids = []
+        for n in range(2):
+            tid = insert_transcription(
+                conn,
+                url=None,
+                input_type="file",
+                filename=f"{n}.mp3",
+                model="m",
+                granularity="segment",
+            )
+            store_response(conn, tid, fake_response(20))
+            tids.append(tid)
+        return tids
+
+    await ensure_schema(datasette, "data")
+    tids = await db.execute_write_fn(populate)
+    entries = (
+        await db.execute(
+            "select id, transcription_id from datasette_scribe_transcription_entries order by id"
+        )
+    ).rows
+
+    def post(path, **body):
+        return datasette.client.post(path, json={"database": "data", **body})
+
+    requests = []
+    for round in range(10):
+        for entry_id, tid in entries[round::5]:
+            requests.append(
+                post(
+                    f"/-/api/scribe/entry/{entry_id}/edit",
+                    speaker_id=f"Guest {round % 3}",
+                )
+            )
+        for tid in tids:
+            requests.append(
+                post(
+                    f"/-/api/scribe/transcription/{tid}/speakers/combine",
+                    from_speaker=f"Guest {round % 3}",
+                    to_speaker=f"Guest {(round + 1) % 3}",
+                )
+            )
+            requests.append(
+                post(
+                    f"/-/api/scribe/transcription/{tid}/speakers/delete",
+                    speaker_name=f"Guest {(round + 2) % 3}",
+                )
+            )
+    responses = await asyncio.gather(*requests)
+    assert all(r.status_code in (200, 400) for r in responses)
+
+    orphans = (
+        await db.execute(
+            "select count(*) from datasette_scribe_transcription_entries"
+            " where speaker_ref is not null and speaker_ref not in (select id from datasette_scribe_speakers)"
+        )
+    ).single_value()
+    assert orphans == 0
+    stale = await db.execute(
+        "select speaker_ref, transcription_id, count(*) from datasette_scribe_transcription_entries"
+        " where speaker_ref is not null group by 1, 2"
+        " except select speaker_ref, transcription_id, entries_count from datasette_scribe_speaker_usage"
+    )
+    assert stale.rows == []
+
+
+@pytest.mark.asyncio
+async def test_exports(datasette):
+    import io
+    import json
+    import zipfile
+
+    from datasette_scribe.ingest import insert_transcription, store_response
+    from datasette_scribe.mutations import edit_entry
+
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        conn.execute(
+            "insert into datasette_scribe_collections (name) values ('Podcast')"
+        )
+        for filename in ("a.mp3", "b.mp3"):
+            tid = insert_transcription(
+                conn,
+                url=None,
+                input_type="file",
+                filename=filename,
+                model="m",
+                granularity="segment",
+            )
+            store_response(conn, tid, fake_response(3))
+            conn.execute(
+                "insert into datasette_scribe_collection_transcriptions (collection_id, transcription_id) values (1, ?)",
+                [tid],
+            )
+        edit_entry(conn, 1, text="Hello <world>", speaker_id="Alice")
+
+    await ensure_schema(datasette, "data")
+    await db.execute_write_fn(populate)
+
+    async def export(path, **params):
+        response = await datasette.client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        return response
+
+    response = await export("/data/-/api/scribe/transcription/1/export", format="srt")
+    assert response.headers["content-disposition"] == 'attachment; filename="1-a.srt"'
+    assert response.text.startswith(
+        "1\n00:00:00,000 --> 00:00:01,000\nAlice: Hello <world>\n\n2\n"
+    )
+    response = await export("/data/-/api/scribe/transcription/1/export", format="vtt")
+    assert response.text.startswith(
+        "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\n<v Alice>Hello &lt;world&gt;\n\n"
+    )
+    response = await export(
+        "/data/-/api/scribe/transcription/1/export", format="txt", original="1"
+    )
+    assert (
+        response.text
+        == "speaker_0: Segment 0\nspeaker_1: Segment 1\nspeaker_0: Segment 2\n"
+    )
+
+    response = await export("/data/-/api/scribe/collections/1/export", format="jsonl")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["transcription_id"], line["text"]) for line in lines[:4]] == [
+        (1, "Hello <world>"),
+        (1, "Segment 1"),
+        (1, "Segment 2"),
+        (2, "Segment 0"),
+    ]
+    response = await export("/data/-/api/scribe/collections/1/export", format="txt")
+    assert response.text.startswith("# a.mp3\n\nAlice: Hello <world>\n")
+    assert "\n\n# b.mp3\n\n" in response.text
+    response = await export("/data/-/api/scribe/collections/1/export", format="vtt")
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == ["1-a.vtt", "2-b.vtt"]
+    assert archive.read("2-b.vtt").decode().count(" --> ") == 3
+
+    response = await datasette.client.get(
+        "/data/-/api/scribe/transcription/1/export?format=doc"
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.skipif(
+    sqlite3.sqlite_version_info < (3, 42, 0),
+    reason="datetime('now', 'subsec') needs SQLite 3.42",
+)
+def test_export_command(tmp_path):
+    from click.testing import CliRunner
+
+    from datasette_scribe.cli import scribe_cli
+    from datasette_scribe.cli._db import apply_schema, store_transcription
+
+    db_path = tmp_path / "data.db"
+    apply_schema(db_path)
+    store_transcription(db_path, "a.mp3", b"first", "audio/mpeg", fake_response(2))
+    store_transcription(db_path, "b.mp3", b"second", "audio/mpeg", fake_response(2))
+
+    result = CliRunner().invoke(scribe_cli, ["export", str(db_path), "-t", "1"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "t1_speaker_0: Segment 0\nt1_speaker_1: Segment 1\n"
+
+    out = tmp_path / "srt"
+    result = CliRunner().invoke(
+        scribe_cli, ["export", str(db_path), "-f", "srt", "-o", str(out)]
+    )
+    assert result.exit_code == 0, result.output
+    assert sorted(p.name for p in out.iterdir()) == ["1-a.srt", "2-b.srt"]
+
+
+@pytest.mark.asyncio
+async def test_waveform_peaks(datasette, monkeypatch):
+    np = pytest.importorskip("numpy")
+    from datasette_scribe.ingest import insert_transcription
+    from datasette_scribe.waveform import (
+        MIN_PEAKS,
+        PeakReducer,
+        pack_peaks,
+        store_peaks,
+        unpack_peaks,
+    )
+
+    # A rising ramp, fed in uneven pieces as ffmpeg's pipe would deliver it
+    samples = np.arange(-32768, 32768, 64, dtype="<i2").repeat(300)
+    pcm = samples.tobytes()
+    reducer = PeakReducer(samples_per_peak=256)
+    for start in range(0, len(pcm), 999):
+        reducer.feed(pcm[start : start + 999])
+    levels = reducer.levels()
+    data = pack_peaks(levels, samples=reducer.samples)
+
+    peaks = unpack_peaks(data)
+    assert peaks["samples"] == len(samples)
+    finest = peaks["levels"][0]
+    assert finest["samples_per_peak"] == 256
+    assert len(finest["peaks"]) == -(-len(samples) // 256)
+    assert finest["peaks"][0] == (-128, -128)
+    assert finest["peaks"][-1] == (127, 127)
+    assert len(peaks["levels"][-1]["peaks"]) <= MIN_PEAKS
+    assert peaks["levels"][1]["peaks"][0] == (
+        -128,
+        min(p[1] for p in finest["peaks"][:4]),
+    )
+
+    monkeypatch.setenv("DATASETTE_SCRIBE_VITE_PATH", "http://localhost:5178/")
+    await ensure_schema(datasette, "data")
+    db = datasette.get_database("data")
+
+    def populate(conn):
+        tid = insert_transcription(
+            conn,
+            url="https://example.com/a.mp3",
+            input_type="url",
+            filename=None,
+            model="m",
+            granularity="segment",
+        )
+        store_peaks(conn, tid, data)
+
+    await db.execute_write_fn(populate)
+    url = "/data/-/api/scribe/transcription/1/waveform"
+    response = await datasette.client.get(url)
+    assert response.status_code == 200
+    assert response.content == data
+    assert "immutable" in response.headers["cache-control"]
+    cached = await datasette.client.get(
+        url, headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert cached.status_code == 304
+    assert (
+        await datasette.client.get("/data/-/api/scribe/transcription/2/waveform")
+    ).status_code == 404
+
+    page = await datasette.client.get("/data/-/scribe/transcription/1")
+    assert url + "?v=" in page.text
+
+
+@pytest.mark.asyncio
+async def test_playback_copy(tmp_path):
+    from datasette_scribe.ingest import insert_transcription
+    from datasette_scribe.storage import LocalAudioStore, StoredAudio, audio_file
+    from datasette_scribe.transcode import DATABASE_STORAGE, save_playback
+
+    store = LocalAudioStore(tmp_path / "audio")
+    path = tmp_path / "data.db"
+    sqlite3.connect(path).close()
+    datasette = Datasette(
+        [str(path)],
+        config={
+            "permissions": {SCRIBE_ACCESS_NAME: True},
+            "plugins": {
+                "datasette-scribe": {
+                    "audio_storage": {"type": "local", "path": str(store.root)}
+                }
+            },
+        },
+    )
+    await ensure_schema(datasette, "data")
+    db = datasette.get_database("data")
+    original = store.put(b"original wav" * 100, "audio/wav")
+    playback = StoredAudio(
+        sha256="ab" * 32, size=8, content_type="audio/ogg", storage=DATABASE_STORAGE
+    )
+
+    def populate(conn, keep_original):
+        tid = insert_transcription(
+            conn,
+            url=None,
+            input_type="file",
+            filename="a.wav",
+            model="m",
+            granularity="segment",
+            audio=original,
+        )
+        return save_playback(
+            conn,
+            tid,
+            playback,
+            b"opusdata",
+            original_size=original.size,
+            keep_original=keep_original,
+        )
+
+    assert await db.execute_write_fn(lambda conn: populate(conn, True)) is None
+    # A second upload of the same file shares it, so dropping one original keeps the file
+    assert await db.execute_write_fn(lambda conn: populate(conn, False)) is None
+    assert store.exists(original.sha256)
+
+    response = await datasette.client.get("/data/-/api/scribe/transcription/2/audio")
+    assert response.status_code == 200
+    assert response.content == b"opusdata"
+    assert response.headers["content-type"] == "audio/ogg"
+    async with audio_file(datasette, db, 1) as audio_path:
+        assert audio_path == str(store.path(original.sha256))
+    # With the original gone, re-transcribing uses the playback copy
+    async with audio_file(datasette, db, 2) as audio_path:
+        with open(audio_path, "rb") as f:
+            assert f.read() == b"opusdata"
+
+    unreferenced = await db.execute_write_fn(
+        lambda conn: save_playback(
+            conn,
+            1,
+            playback,
+            b"opusdata",
+            original_size=original.size,
+            keep_original=False,
+        )
+    )
+    assert unreferenced == original.sha256
+
+
+@pytest.mark.asyncio
+async def test_preprocess_before_upload(tmp_path, monkeypatch):
+    import os
+    import sys
+
+    import httpx
+
+    from datasette_scribe.preprocess import (
+        PreprocessStats,
+        compact_audio,
+        preprocess_options,
+    )
+    from datasette_scribe.voxtral_api import VoxtralClient
+
+    # Stands in for ffmpeg, streaming a fixed 1000 byte "encoding" to stdout
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "ffmpeg").write_text(
+        f"#!{sys.executable}\nimport sys\nsys.stdout.buffer.write(b'm' * 1000)\n"
+    )
+    (bin_dir / "ffmpeg").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    options = preprocess_options(None)
+    assert options is not None and preprocess_options(False) is None
+
+    large, small = tmp_path / "large.wav", tmp_path / "small.mp3"
+    large.write_bytes(b"w" * 50_000)
+    small.write_bytes(b"s" * 500)
+    stats = PreprocessStats()
+    assert await compact_audio(str(large), "large.wav", options, stats) == (
+        b"m" * 1000,
+        "large.mp3",
+    )
+    assert await compact_audio(str(small), "small.mp3", options, stats) is None
+    assert (stats.files, stats.unchanged, stats.input_bytes, stats.output_bytes) == (
+        2,
+        1,
+        50_500,
+        1500,
+    )
+    assert stats.bytes_saved == 49_000
+
+    async def handler(request):
+        await request.aread()
+        return httpx.Response(200, json=fake_response().model_dump())
+
+    async with VoxtralClient(
+        api_key="key", transport=httpx.MockTransport(handler)
+    ) as client:
+        await client.transcribe(file_data=b"m" * 1000, filename="large.mp3")
+    assert client.stats.upload_bytes == 1000
+    assert client.stats.upload_seconds > 0
+    assert stats.upload_seconds_saved(0, 0) is None
+    assert stats.upload_seconds_saved(1000, 1.0) == pytest.approx(49 - stats.seconds)
+
+
+@pytest.mark.asyncio
+async def test_metrics(datasette, tmp_path):
+    import httpx
+
+    from datasette_scribe import metrics
+    from datasette_scribe.voxtral_api import TranscriptionUsage, VoxtralClient
+
+    def sample(text, name):
+        for line in text.splitlines():
+            if line.rsplit(" ", 1)[0] == name:
+                return float(line.rsplit(" ", 1)[1])
+        return 0.0
+
+    before = metrics.render()
+    assert (await datasette.client.get("/-/api/scribe/status")).status_code == 200
+    assert (
+        await datasette.client.get("/data/-/api/scribe/transcriptions")
+    ).status_code == 200
+
+    def handler(request):
+        response = fake_response()
+        response.usage = TranscriptionUsage(
+            prompt_audio_seconds=90, prompt_tokens=40, completion_tokens=10
+        )
+        return httpx.Response(200, json=response.model_dump())
+
+    async with VoxtralClient(
+        api_key="key", transport=httpx.MockTransport(handler)
+    ) as client:
+        await client.transcribe("https://example.com/a.mp3")
+
+    response = await datasette.client.get("/-/api/scribe/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    status = 'scribe_http_requests_total{route="/-/api/scribe/status",method="GET",status="200"}'
+    assert sample(after, status) == sample(before, status) + 1
+    listing = (
+        'scribe_sql_queries_total{route="/{database}/-/api/scribe/transcriptions"}'
+    )
+    assert sample(after, listing) > sample(before, listing)
+    assert (
+        'scribe_http_request_duration_seconds_bucket{route="/-/api/scribe/status",le="+Inf"}'
+        in after
+    )
+    audio = 'scribe_transcribed_audio_seconds_total{model="voxtral-mini-2602"}'
+    assert sample(after, audio) == sample(before, audio) + 90
+    tokens = (
+        'scribe_transcribe_tokens_total{model="voxtral-mini-2602",kind="completion"}'
+    )
+    assert sample(after, tokens) == sample(before, tokens) + 10
+    assert sample(after, "scribe_transcribe_in_flight") == 0
+
+    path = tmp_path / "private.db"
+    sqlite3.connect(path).close()
+    private = Datasette([str(path)])
+    assert (await private.client.get("/-/api/scribe/metrics")).status_code == 403